@@ -3,21 +3,62 @@
 __version__ = "1.0.9"
 
 from b3.datatypes import *
-from b3.composite_dynamic import pack, unpack, unpack_into
-from b3.composite_schema import schema_pack, schema_unpack
-from b3.type_varint import encode_uvarint, decode_uvarint
-from b3.item import encode_item, encode_item_joined, decode_header, decode_value
+from b3.composite_dynamic import pack, unpack, unpack_into, pack_into, packed_size
+from b3.guess_type import MODES
+from b3.composite_schema import schema_pack, schema_unpack, schema_pack_into, Schema, compile_schema
+from b3.schema_codegen import make_schema_pack, make_schema_unpack
+from b3.composite_reverse import pack_reverse, schema_pack_reverse
+from b3.composite_lazy import view, LazyDict, LazyList
+from b3.composite_path import get, get_many
+from b3.composite_stream import Decoder, iter_unpack
+from b3.registry import register_type, unregister_type
+from b3 import tznames  # b3.tznames.enable(), harmless to import without zoneinfo
+from b3.scanner import scan, index_container, ContainerIndex
+from b3.type_varint import (
+    encode_uvarint,
+    decode_uvarint,
+    encode_uvarint_into,
+    uvarint_size,
+    svarint_size,
+)
+from b3.item import encode_item, encode_item_joined, encode_item_into, decode_header, decode_value
 
 __all__ = [
     "pack",
     "unpack",
     "unpack_into",
+    "pack_into",
+    "packed_size",
+    "MODES",
     "schema_pack",
     "schema_unpack",
+    "schema_pack_into",
+    "Schema",
+    "compile_schema",
+    "make_schema_pack",
+    "make_schema_unpack",
+    "pack_reverse",
+    "schema_pack_reverse",
+    "view",
+    "LazyDict",
+    "LazyList",
+    "get",
+    "get_many",
+    "Decoder",
+    "iter_unpack",
+    "register_type",
+    "unregister_type",
+    "scan",
+    "index_container",
+    "ContainerIndex",
     "encode_uvarint",
     "decode_uvarint",
+    "encode_uvarint_into",
+    "uvarint_size",
+    "svarint_size",
     "encode_item",
     "encode_item_joined",
+    "encode_item_into",
     "BYTES",
     "UTF8",
     "BOOL",
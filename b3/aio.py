@@ -0,0 +1,184 @@
+# asyncio integration - reading and writing framed B3 items on streams.  (python 3 only)
+
+import asyncio
+import collections
+import functools
+
+from b3.datatypes import BOOL
+from b3.composite_dynamic import pack
+from b3.composite_stream import Decoder, unpack_item, find_header, check_size
+
+# Method: every B3 item carries its own framing - the header says how long the value is. read_message() reads the
+#         header parts (control byte, extended type, key, data length) off the stream as it goes, then readexactly()s
+#         the value. Nothing needs an extra length prefix, so any pack()ed item can be sent as-is.
+# Method: once the control byte is in, the rest of the header is usually already in the StreamReader's buffer.
+#         It is parsed from there with find_header() (a peek at the private _buffer, there is no public peek),
+#         falling back to reading it a part at a time for other readers, and for headers that aren't all in yet.
+# Method: items of executor_threshold bytes or more are decoded in an executor (the loop's default thread pool
+#         unless one is given), so large messages don't stall the event loop.
+# Policy: this module is not imported by b3/__init__.py, as it needs python 3. Use "import b3.aio".
+
+EXECUTOR_THRESHOLD = 256 * 1024
+HEADER_PEEK = 1024  # how much of the reader's buffer to look for the rest of a header in
+
+
+async def read_message(
+    reader,
+    executor_threshold=EXECUTOR_THRESHOLD,
+    executor=None,
+    max_depth=None,
+    max_items=None,
+    max_total_bytes=None,
+):
+    """Reads one item from an asyncio StreamReader, returns its value.
+    reader             - asyncio.StreamReader (or anything with an async readexactly()),
+    executor_threshold - items this many bytes or bigger are decoded in an executor, None to never do that,
+    executor           - concurrent.futures executor to use, None for the loop's default,
+    max_depth, max_items, max_total_bytes - optional limits for untrusted input, see unpack_into().
+    - raises asyncio.IncompleteReadError if the stream ends before a whole item is read.
+      Its partial attribute is b"" if the stream ended cleanly between items."""
+    header, data_len = await read_header(reader, max_total_bytes)
+    data = bytes(header) + await reader.readexactly(data_len)
+
+    if executor_threshold is None or len(data) < executor_threshold:
+        return unpack_item(data, max_depth, max_items)
+    loop = asyncio.get_event_loop()
+    decode = functools.partial(unpack_item, data, max_depth, max_items)
+    return await loop.run_in_executor(executor, decode)
+
+
+async def write_message(writer, obj, key=None, mode="fixed"):
+    """Packs obj and writes it to an asyncio StreamWriter, then waits for the writer to drain.
+    key, mode - as for pack()."""
+    writer.write(pack(obj, key, mode=mode))
+    await writer.drain()
+
+
+async def read_header(reader, max_total_bytes=None):
+    """Reads an item header from reader, returns its bytes (as a bytearray) and the item's data length.
+    max_total_bytes - optional limit on the item's key and data bytes, ValueError if exceeded."""
+    header = bytearray(await reader.readexactly(1))
+    buffered = getattr(reader, "_buffer", None)
+    if buffered is not None:
+        found = find_header(header + buffered[:HEADER_PEEK], 0, max_total_bytes)
+        if found is not None:
+            data_type, index, data_len = found
+            header += await reader.readexactly(index - 1)  # already buffered, so no waiting
+            return header, data_len
+
+    cbyte = header[0]
+    if cbyte >> 4 == 15:  # 'extended' data types 15 and up follow the control byte
+        await read_uvarint(reader, header)
+    key_type_bits = cbyte & 0x03
+    if key_type_bits == 0x01:  # number key
+        await read_uvarint(reader, header)
+    elif key_type_bits:  # string or bytes key
+        key_len = await read_uvarint(reader, header)
+        check_size("item key", key_len, max_total_bytes)  # before reading the key
+        header += await reader.readexactly(key_len)
+    else:
+        key_len = 0
+
+    data_len = 0
+    if cbyte & 0x08 and cbyte >> 4 != BOOL:
+        data_len = await read_uvarint(reader, header)
+        check_size("item data", data_len, max_total_bytes)
+        check_size("item key and data", key_len + data_len, max_total_bytes)
+    return header, data_len
+
+
+async def read_uvarint(reader, out):
+    """Reads a uvarint from reader, appending its bytes to out. Returns its value."""
+    result = 0
+    shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        out.append(byte)
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result
+        shift += 7
+
+
+class B3Protocol(asyncio.Protocol):
+    """asyncio Protocol that receives B3 items. Subclass it and override message_received().
+    executor_threshold, executor, max_depth, max_items, max_total_bytes - as for read_message().
+    - messages are always delivered in the order they arrived, including ones decoded in an executor.
+    """
+
+    def __init__(
+        self,
+        executor_threshold=EXECUTOR_THRESHOLD,
+        executor=None,
+        max_depth=None,
+        max_items=None,
+        max_total_bytes=None,
+    ):
+        self.executor_threshold = executor_threshold
+        self.executor = executor
+        self.transport = None
+        self._decoder = Decoder(max_depth, max_items, max_total_bytes)
+        self._waiting = collections.deque()  # decoded values and executor futures, in arrival order
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        decoder = self._decoder
+        try:
+            decoder.feed(data)
+            item = decoder.next_bytes()
+            while item is not None:
+                self._add(item)
+                item = decoder.next_bytes()
+        except Exception as exc:
+            self._deliver()  # the items before the bad one that are ready
+            self._fail(exc)
+            return
+        self._deliver()
+
+    def send_message(self, obj, key=None, mode="fixed"):
+        """Packs obj and writes it to the transport. key, mode - as for pack()."""
+        self.transport.write(pack(obj, key, mode=mode))
+
+    def message_received(self, obj):
+        """Called with each item's value. Override this."""
+
+    def decode_failed(self, exc):
+        """Called if received data can't be decoded. The default closes the connection."""
+        self.transport.close()
+
+    def _add(self, item):
+        decode = functools.partial(
+            unpack_item, item, self._decoder.max_depth, self._decoder.max_items
+        )
+        if self.executor_threshold is not None and len(item) >= self.executor_threshold:
+            loop = asyncio.get_event_loop()
+            future = loop.run_in_executor(self.executor, decode)
+            future.add_done_callback(lambda _: self._deliver())
+            self._waiting.append(future)
+        else:
+            self._waiting.append(decode())
+
+    def _deliver(self):
+        waiting = self._waiting
+        while waiting:
+            value = waiting[0]
+            if isinstance(value, asyncio.Future):
+                if not value.done():
+                    return
+                try:
+                    value = value.result()
+                except Exception as exc:
+                    self._fail(exc)
+                    return
+            waiting.popleft()
+            self.message_received(value)
+
+    def _fail(self, exc):
+        # Note: nothing more is delivered after a failure, including items still decoding in an executor.
+        for value in self._waiting:
+            if isinstance(value, asyncio.Future):
+                value.cancel()
+        self._waiting.clear()
+        self.decode_failed(exc)
@@ -1,40 +1,147 @@
 # Dynamic-recursive composite pack/unpack  (like json.dumps/loads)
 
-from b3.datatypes import LIST, DICT, b3_type_name
-from b3.guess_type import guess_type
-from b3.item import encode_item, decode_header, decode_value
+import sys
+from array import array
+
+from b3.datatypes import LIST, DICT, UTF8, UVARINT, SVARINT, U64, S64, FLOAT64, COMPLEX, b3_type_name
+from b3.guess_type import type_dispatch, check_mode, INT_MODES
+from b3.utils import write_chunks_into
+from b3.type_varint import decode_uvarint, uvarint_size, svarint_size, UINT64_TYPECODE, INT64_TYPECODE
+from b3.item import encode_item, encode_header, header_size, decode_header, decode_value
+from b3.item import CONTROL_TABLE, VALUE_DECODERS
 
 # See bottom of file for design policy notes.
 
 
-def pack(item, key=None, with_header=True, rlimit=20):
+def pack(item, key=None, with_header=True, rlimit=20, mode="fixed"):
     """Packs a list or dict to bytes.
     item        - the list or dict to pack
     with_header - returned bytes include a header. unpack() needs this on,
                   unpack_into() and embedding into schema fields needs it off.
     key         - key value for the top-level header (optional, typically not needed)
     rlimit      - recurse limit. Raises ValueError if limit exceeded.
+    mode        - how B3 types are chosen for ints: "fixed" (default, always SVARINT),
+                  "compact" (UVARINT unless negative) or "fast" (64-bit S64/U64 where they fit).
     - see guess_type.py for the B3 types chosen, given certain Python types."""
+    check_mode(mode)
+    out = []
+    pack_chunks(out, item, key, rlimit, mode)
+    if not with_header:
+        del out[0]  # the item's header is always the first chunk
+    return b"".join(out)
+
+
+def pack_into(buf, offset, item, key=None, with_header=True, rlimit=20, mode="fixed"):
+    """Packs a list or dict straight into a writable buffer, returns the end offset of the packed data.
+    buf         - writable buffer (bytearray, mmap, memoryview, shared_memory.buf etc),
+    offset      - where to start writing in buf,
+    item, key, with_header, rlimit, mode - as for pack().
+    - raises ValueError (without writing anything) if the data doesn't fit. See packed_size()."""
+    check_mode(mode)
+    out = []
+    size = pack_chunks(out, item, key, rlimit, mode)
+    chunks = iter(out)
+    if not with_header:
+        size -= len(next(chunks))  # the item's header is always the first chunk
+    return write_chunks_into(buf, offset, chunks, size)
+
+
+def packed_size(item, key=None, with_header=True, rlimit=20, mode="fixed"):
+    """Returns the number of bytes pack() would produce for the same arguments.
+    - use it to size the buffer for pack_into()."""
+    check_mode(mode)
+    header_len, data_len = packed_sizes(item, key, rlimit, mode)
+    return header_len + data_len if with_header else data_len
+
+
+# Method: packed_sizes follows pack_chunks' decisions, but adds up header and value sizes instead of making the
+#         bytes. Fixed-size and varint values are sized arithmetically, other types (bar UTF8) are encoded to measure.
+FIXED_VALUE_SIZES = {FLOAT64: 8, U64: 8, S64: 8, COMPLEX: 16}
+
+
+def packed_sizes(item, key=None, rlimit=20, mode="fixed"):
+    """Returns the sizes of item's header and value (data), as pack_chunks() would make them."""
     if rlimit < 1:
         raise ValueError("Recurse limit exceeded")
 
-    if isinstance(item, list):  # transform item to bytes, note recursive call
-        item = b"".join([pack(item=i, rlimit=rlimit - 1) for i in item])
+    if isinstance(item, list):
         data_type = LIST
+        children = ((None, i) for i in item)
 
-    elif isinstance(item, dict):  # transform item to bytes, note recursive call
-        item = b"".join([pack(item=v, key=k, rlimit=rlimit - 1) for k, v in item.items()])
+    elif isinstance(item, dict):
         data_type = DICT
+        children = item.items()
 
     else:
-        data_type = guess_type(item)  # may blow up here encountering unknown types
+        # may blow up here encountering unknown types
+        data_type, encoder, zero_value = type_dispatch(item)
+        if data_type == SVARINT and mode != "fixed":
+            data_type, encoder, zero_value = INT_MODES[mode](item)
+        if item is None:
+            return header_size(key, data_type, False, 0), 0
+        if encoder is None:  # bool
+            return header_size(key, data_type, True, 0), 0
+        if item == zero_value:
+            return header_size(key, data_type, False, 0), 0
+        if data_type in FIXED_VALUE_SIZES:
+            data_len = FIXED_VALUE_SIZES[data_type]
+        elif data_type == UVARINT:
+            data_len = uvarint_size(item)
+        elif data_type == SVARINT:
+            data_len = svarint_size(item)
+        elif data_type == UTF8:
+            data_len = len(item.encode("utf8"))
+        else:
+            data_len = len(encoder(item))
+        return header_size(key, data_type, True, data_len), data_len
+
+    data_len = 0
+    for k, v in children:  # note recursive call
+        header_len, value_len = packed_sizes(v, k, rlimit - 1, mode)
+        data_len += header_len + value_len
+    return header_size(key, data_type, True, data_len), data_len
 
-    header_bytes, value_bytes = encode_item(key, data_type, item)
 
-    if with_header:
-        return b"".join([header_bytes, value_bytes])
+def pack_chunks(out, item, key=None, rlimit=20, mode="fixed"):
+    """Appends the header and value byte chunks for item to the list out, returns the number of bytes added.
+    - containers get a placeholder header chunk which is filled in once their size is known,
+      so every byte is copied just once, by the final b"".join() of out."""
+    if rlimit < 1:
+        raise ValueError("Recurse limit exceeded")
+
+    if isinstance(item, list):
+        data_type = LIST
+        children = ((None, i) for i in item)
+
+    elif isinstance(item, dict):
+        data_type = DICT
+        children = item.items()
+
     else:
-        return value_bytes
+        # may blow up here encountering unknown types
+        data_type, encoder, zero_value = type_dispatch(item)
+        if data_type == SVARINT and mode != "fixed":
+            data_type, encoder, zero_value = INT_MODES[mode](item)
+        if encoder is None or item is None:  # None, bool etc
+            header_bytes, value_bytes = encode_item(key, data_type, item)
+        elif item == zero_value:
+            header_bytes, value_bytes = encode_header(key, data_type, False, False, 0), b""
+        else:  # Note: same as encode_item, without its dispatching on data_type
+            value_bytes = encoder(item)
+            header_bytes = encode_header(key, data_type, True, False, len(value_bytes))
+        out.append(header_bytes)
+        out.append(value_bytes)
+        return len(header_bytes) + len(value_bytes)
+
+    header_index = len(out)
+    out.append(None)  # placeholder for the header
+    data_len = 0
+    for k, v in children:  # note recursive call
+        data_len += pack_chunks(out, v, k, rlimit - 1, mode)
+
+    header_bytes = encode_header(key, data_type, True, False, data_len)
+    out[header_index] = header_bytes
+    return len(header_bytes) + data_len
 
 
 def new_container(data_type):
@@ -42,12 +149,165 @@ def new_container(data_type):
     return out
 
 
-def unpack(buf, index=0):
+# --- Runs of fixed-width values ---
+# Method: a list of FLOAT64s (or S64s, U64s, COMPLEXs) is a run of items with identical headers (e.g. 78 08 for a
+#         FLOAT64), each followed by the same number of value bytes. unpack_run finds how long the run is by
+#         comparing each header byte 'column' of the data (bytes at the same offset in every item) in one go,
+#         deletes the header columns, and reads what's left straight into an array.array. All in C, no per-item work.
+# Method: zero values (e.g. 0.0) are just a header with no data (e.g. 70), so a run is made of stretches of
+#         has-data items and stretches of zero items. Zero items are counted the same way and filled in with zero
+#         bytes. Columns are compared in windows that double in size, so many short stretches don't go quadratic,
+#         and where the stretches are short, the next few items are stepped through one at a time instead.
+# Policy: runs are only looked for at the start of a list, which covers lists that are all one fixed-width type.
+#         The rest of the list (if any) is unpacked the usual way. None values and other types end a run.
+# Policy: with arrays=True, whether a list becomes an array depends only on its item types, never on the values.
+# Note: array.array is native-endian, b3 is little-endian, so big-endian machines byteswap the array.
+
+MIN_RUN = 16  # below this many items, the usual per-item decode is as quick
+MIN_STRETCH = 8  # below this many items, stretches are quicker to step through one item at a time
+BIG_ENDIAN = sys.byteorder == "big"
+
+# (header, zero header, item size, data type, array typecode) by the control byte (and extended type byte)
+# of the has-data header, for the fixed-width types.
+RUN_SPECS = {}
+RUN_TYPES = (
+    (FLOAT64, 8, "d"),
+    (COMPLEX, 16, "d"),
+    (U64, 8, UINT64_TYPECODE),
+    (S64, 8, INT64_TYPECODE),
+)
+for _data_type, _size, _typecode in RUN_TYPES:
+    if array(_typecode).itemsize == 8:  # py2 on windows has no 64-bit int typecode
+        _header = encode_header(None, _data_type, True, False, _size)
+        _zero = encode_header(None, _data_type, False, False, 0)
+        RUN_SPECS[_header[:-1]] = (_header, _zero, len(_header) + _size, _data_type, _typecode)
+
+MIN_RUN_BYTES = MIN_RUN * min(len(spec[1]) for spec in RUN_SPECS.values())
+
+
+def run_spec(buf, index, end):
+    """Returns the RUN_SPECS entry for the item header at index in buf, or None. Never looks past end."""
+    prefix = bytearray(buf[index : min(index + 2, end)])
+    if not prefix:
+        return None
+    prefix[0] |= 0x08  # zero items have the same header, without the has_data bit
+    return RUN_SPECS.get(bytes(prefix[: 2 if prefix[0] >> 4 == 15 else 1]))
+
+
+def unpack_run(buf, index, end, arrays=False):
+    """Unpacks the run of fixed-width items (and zero items) of one type at the start of the list data in
+    buf[index:end]. Returns the values and the index after the run, or (None, index) if there's no run worth doing.
+    - the values are an array.array if arrays is True and the run is the whole list (except for COMPLEX),
+      otherwise a list."""
+    spec = run_spec(buf, index, end)
+    if spec is None:
+        return None, index
+    header, zero, size, data_type, typecode = spec
+    zero_data = b"\x00" * (size - len(header))
+
+    start = index
+    data = bytearray()
+    count = 0
+    while True:
+        found = count_items(buf, index, end, header, size)
+        if found:
+            stretch = bytearray(buf[index : index + found * size])
+            for i in range(len(header)):  # remove the header columns, leaving just the values
+                del stretch[:: size - i]
+            data += stretch
+            index += found * size
+        zeros = count_items(buf, index, end, zero, len(zero))
+        if not found and not zeros:
+            break
+        data += zero_data * zeros
+        index += zeros * len(zero)
+        count += found + zeros
+        # short stretches, stepping through the next few items is quicker
+        if found + zeros < MIN_STRETCH:
+            index, stepped = step_items(buf, index, end, header, zero, size, data, zero_data)
+            count += stepped
+
+    whole = index == end
+    if count < MIN_RUN and not (arrays and whole):
+        return None, start
+
+    values = array(typecode, bytes(data))
+    if BIG_ENDIAN:
+        values.byteswap()
+
+    if data_type == COMPLEX:
+        parts = iter(values)
+        values = [complex(real, imag) for real, imag in zip(parts, parts)]
+    elif not (arrays and whole):
+        values = values.tolist()
+    return values, index
+
+
+def step_items(buf, index, end, header, zero, size, data, zero_data, limit=64):
+    """Adds the values of up to limit run items at index in buf to data, one at a time.
+    Returns the index after them and how many there were."""
+    count = 0
+    value_offset = len(header)
+    while count < limit and index < end:
+        if buf[index : index + value_offset] == header and index + size <= end:
+            data += buf[index + value_offset : index + size]
+            index += size
+        elif buf[index : index + len(zero)] == zero:
+            data += zero_data
+            index += len(zero)
+        else:
+            break
+        count += 1
+    return index, count
+
+
+def count_items(buf, index, end, header, size):
+    """Counts the items of size bytes that start with header in buf[index:end], up to the first that doesn't.
+    - a truncated buf leaves its partial last item uncounted, for the usual decode to refuse."""
+    if buf[index : index + 1] != header[:1]:  # quick no, which is common when stretches alternate
+        return 0
+    total = 0
+    window = 4
+    while True:
+        count = min(window, (end - index) // size)
+        if not count:
+            return total
+        data = bytearray(buf[index : index + count * size])
+        wanted = count
+        for i in range(len(header)):
+            column = data[i::size]
+            count = min(count, len(column) - len(column.lstrip(header[i : i + 1])))
+        total += count
+        if count < wanted:
+            return total
+        index += count * size
+        window *= 2
+
+
+def count_run_items(items_left, run, max_items):
+    """unpack_into's items_left countdown, after the items of a run."""
+    if items_left < 0:  # no limit
+        return items_left
+    if items_left <= len(run):
+        raise ValueError("message has more than %d items" % max_items)
+    return items_left - len(run)
+
+
+def unpack(
+    buf, index=0, zero_copy=False, max_depth=None, max_items=None, max_total_bytes=None, arrays=False
+):
     """Unpacks byte data to a new filled container object (list or dict).
-    buf    - bytes data,
-    index  - where to start in buf (defaults to 0)
+    buf       - bytes data (or bytearray, mmap, memoryview etc),
+    index     - where to start in buf (defaults to 0)
+    zero_copy - if True, BYTES values (and unknown types) are memoryview slices of buf instead of copies.
+    max_depth, max_items, max_total_bytes - optional limits for untrusted input, see unpack_into().
+    arrays    - if True, lists whose items are all FLOAT64, all S64 or all U64 come back as array.array
+                (typecode d, q or Q) instead of list. See unpack_into().
     - as unpack expects a header which has container object type
-      and data length, it doesn't need an end argument."""
+      and data length, it doesn't need an end argument.
+    - see the zero-copy policy notes at the bottom of this file before using zero_copy."""
+    if zero_copy:
+        buf = memoryview(buf)
 
     dkey, data_type, has_data, is_null, data_len, index = decode_header(buf, index)
 
@@ -55,45 +315,148 @@ def unpack(buf, index=0):
         emsg = "Expecting list or dict first, but got %s" % (b3_type_name(data_type))
         raise TypeError(emsg)
 
+    spec = run_spec(buf, index, index + data_len) if arrays and data_type == LIST else None
+    if spec is not None and spec[3] != COMPLEX:
+        if max_total_bytes is not None and data_len > max_total_bytes:
+            raise ValueError("message data is %d bytes, limit is %d" % (data_len, max_total_bytes))
+        items_left = max_items + 1 if max_items is not None else -1
+        run, run_end = unpack_run(buf, index, index + data_len, True)
+        if run is not None:
+            items_left = count_run_items(items_left, run, max_items)
+            if isinstance(run, array):  # the whole list is one run
+                return run
+        # the rest of the list after the run (if any), without decoding the run again
+        out = run or []
+        args = (zero_copy, max_depth, max_items, arrays, items_left)
+        return unpack_items(out, True, buf, run_end, index + data_len, *args)
+
     out = new_container(data_type)
-    unpack_into(out, buf, index, index + data_len)
+    unpack_into(
+        out, buf, index, index + data_len, zero_copy, max_depth, max_items, max_total_bytes, arrays
+    )
     return out
 
 
-def unpack_into(out, buf, index, end):
+def unpack_into(
+    out,
+    buf,
+    index,
+    end,
+    zero_copy=False,
+    max_depth=None,
+    max_items=None,
+    max_total_bytes=None,
+    arrays=False,
+):
     """Unpacks bytes data to a given container object.
-    out   - container (list or dict) to fill with data,
-    buf   - bytes data,
-    index - where to start in buf,
-    end   - where to stop in buf
+    out             - container (list or dict) to fill with data,
+    buf             - bytes data (or bytearray, mmap, memoryview etc),
+    index           - where to start in buf,
+    end             - where to stop in buf
+    zero_copy       - if True, BYTES values (and unknown types) are memoryview slices of buf instead of copies.
+    max_depth       - max container nesting depth (out is depth 1), ValueError if exceeded. Default no limit.
+    max_items       - max number of items (at all depths), ValueError if exceeded. Default no limit.
+    max_total_bytes - max size of the data (end - index), ValueError if exceeded. Default no limit.
+    arrays          - if True, lists in the data whose items are all FLOAT64, all S64 or all U64 are unpacked
+                      as array.array (typecode d, q or Q) instead of list. out itself is always filled as given.
     - use this function directly if you already have a container to put things into.
     - or if you want to specify start and end explicitly."""
+    if zero_copy and not isinstance(buf, memoryview):
+        buf = memoryview(buf)
+
+    is_list = isinstance(out, list)
+    if not is_list and not isinstance(out, dict):
+        raise TypeError("unpack_into only supports list or dict container objects")
+
+    if max_total_bytes is not None and end - index > max_total_bytes:
+        raise ValueError("message data is %d bytes, limit is %d" % (end - index, max_total_bytes))
+    # counts down to 0, never gets there if -1
+    items_left = max_items + 1 if max_items is not None else -1
+
+    if is_list and end - index >= MIN_RUN_BYTES:
+        run, index = unpack_run(buf, index, end)
+        if run is not None:
+            items_left = count_run_items(items_left, run, max_items)
+            out.extend(run)
+    return unpack_items(
+        out, is_list, buf, index, end, zero_copy, max_depth, max_items, arrays, items_left
+    )
+
+
+def unpack_items(out, is_list, buf, index, end, zero_copy, max_depth, max_items, arrays, items_left):
+    """unpack_into's decode loop, once the arguments are checked. items_left is the max_items countdown."""
+    depth = 1
+    stack = []  # (container, is_list, end) of the containers enclosing the one being filled
+
+    while True:
+        if index >= end:
+            if not stack:
+                break
+            out, is_list, end = stack.pop()  # this container's done, carry on with its parent
+            depth -= 1
+            continue
 
-    while index < end:
-        # --- do header ---
-        key, data_type, has_data, is_null, data_len, index = decode_header(buf, index)
+        # --- do header (see item.decode_header, inlined here because this is the hottest loop) ---
+        data_type, key_decoder, has_data, is_null, has_len, value = CONTROL_TABLE[buf[index]]
+        index += 1
+        if data_type == 15:  # 'extended' data types 15 and up follow the control byte
+            data_type, index = decode_uvarint(buf, index)
+        key, index = key_decoder(buf, index)
+        data_len = 0
+        if has_len:
+            data_len, index = decode_uvarint(buf, index)
 
+        items_left -= 1
+        if items_left == 0:
+            raise ValueError("message has more than %d items" % max_items)
+
+        # --- do value ---
         if data_type in (LIST, DICT):
             value = new_container(data_type)
-            unpack_into(value, buf, index, index + data_len)  # note recursive
-        else:
-            value = decode_value(data_type, has_data, is_null, data_len, buf, index)
+            if max_depth is not None and depth >= max_depth:
+                raise ValueError("message nesting is deeper than %d" % max_depth)
+            value_end = index + data_len
+            if value_end > end:
+                raise ValueError("container data runs past the end of its parent")
+            if data_type == LIST and (arrays or data_len >= MIN_RUN_BYTES):
+                run, index = unpack_run(buf, index, value_end, arrays)
+                if run is not None:
+                    items_left = count_run_items(items_left, run, max_items)
+                    value = run
+            if is_list:
+                out.append(value)
+            else:
+                out[key] = value
+            if index < value_end:  # fill the new container next, then come back to this one
+                stack.append((out, is_list, end))
+                out, is_list, end = value, data_type == LIST, value_end
+                depth += 1
+            continue
+
+        elif has_len:
+            if data_type < len(VALUE_DECODERS) and VALUE_DECODERS[data_type] is not None:
+                value = VALUE_DECODERS[data_type](buf, index, index + data_len)
+            else:
+                value = decode_value(data_type, True, is_null, data_len, buf, index, zero_copy)
+        elif data_type > 14:  # no precomputed no-data value for extended types
+            value = decode_value(data_type, has_data, is_null, 0, buf, index, zero_copy)
+        # else value is the precomputed None, zero value, or bool from the table.
 
         # --- Put data value into container ---
-        if isinstance(out, list):
+        if is_list:
             out.append(value)
-        elif isinstance(out, dict):
-            out[key] = value
         else:
-            raise TypeError("unpack_into only supports list or dict container objects")
+            out[key] = value
 
         # --- Advance index ---
-        index += data_len  # decode_header sets data_len=0 for us if is_null is on
+        index += data_len  # data_len is 0 if there is no data
 
     return out
 
 
 # Policy: Unlike the schema encoder we DO recurse. We also treat the incoming message as authoritative and do less validation.
+# Method: pack collects every header and value chunk of the whole structure into one flat list which is joined once,
+#         rather than joining at every level of nesting (which copied each byte once per level of depth).
 
 # --- Encoder/Pack policies ---
 # policy: because there's no schema backing us, we dont know what incoming-to-pack missing data types SHOULD be!
@@ -101,8 +464,23 @@ def unpack_into(out, buf, index, end):
 # policy: in practice None supercedes data-type checking here and in the schema packer, so this should be ok.
 
 # --- Decoder/Unpack policies ---
+# Method: unpack_into doesn't recurse, it keeps an explicit stack of the containers it is part-way through filling.
+#         So there's no python call per container, and no RecursionError (or C stack overflow) on deep nesting.
+# Policy: the limits (max_depth, max_items, max_total_bytes) are off by default, pack's output is trusted as before.
+#         Gateways and other decoders of untrusted input should set them. Over-limit input raises ValueError.
+# Policy: a container whose data length runs past the end of its parent's data always raises ValueError.
 # Policy: we're not hardwiring top-level it to a list like the old version did, so we HAVE to have a top-level header at the front anyway
 #         the users just want list in list out, dict in dict out, etc.i
 #         AND this actually makes the code a LOT simpler.
 # Note:   The recursive unpack function takes a given container object (list, dict) as an argument, so if users already
 #         have a container object of their own, they can call the recursive unpacker function directly.
+
+# --- Zero-copy policies ---
+# Policy: zero_copy is off by default, unpack always hands out independent bytes objects unless asked otherwise.
+# Note:   with zero_copy=True, BYTES (and unknown-type) values are memoryview slices of the buffer given to unpack.
+#         - they stay valid only as long as the buffer's contents do. If the buffer is later changed, so are they.
+#         - they keep the buffer alive. A bytearray can't be resized, and an mmap can't be closed (BufferError),
+#           while any of them exist. Call .release() on them, or copy what you want to keep with bytes(value).
+#         - memoryviews of a bytearray or writable mmap are writable, and writes go to the buffer.
+#         - they compare equal to bytes with the same contents, but are not bytes (e.g. no .decode()).
+# Note:   string values and keys are always decoded to new str objects, zero_copy or not.
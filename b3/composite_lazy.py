@@ -0,0 +1,121 @@
+# Lazy read-only views over packed dynamic-composite data  (like unpack, but on demand)
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # py2
+    from collections import Mapping, Sequence
+
+from b3.datatypes import LIST, DICT, b3_type_name
+from b3.item import decode_header, decode_value
+from b3.scanner import ContainerIndex, FLAG_HAS_DATA, FLAG_NULL
+
+# Method: a view does nothing until it is first used. Then it scans the item headers of its own level only
+#         (see scanner.py), skipping over every value using its data length, and remembers where each value is.
+#         Values are decoded when they are read, and cached. Nested lists and dicts become nested views.
+# Policy: views are read-only. Use unpack() if you want ordinary (mutable) lists and dicts.
+# Policy: like unpack(), if a dict key appears more than once the last one wins.
+
+
+def view(buf, index=0, zero_copy=False):
+    """Returns a lazy read-only view (LazyList or LazyDict) of packed byte data.
+    buf       - bytes data (or bytearray, mmap, memoryview etc),
+    index     - where to start in buf (defaults to 0)
+    zero_copy - if True, BYTES values (and unknown types) are memoryview slices of buf instead of copies.
+    - like unpack(), the data must start with a list or dict header (i.e. from pack(with_header=True)).
+    - the buffer must not change while the view is in use."""
+    if zero_copy:
+        buf = memoryview(buf)
+
+    dkey, data_type, has_data, is_null, data_len, index = decode_header(buf, index)
+
+    if data_type not in (DICT, LIST):
+        emsg = "Expecting list or dict first, but got %s" % (b3_type_name(data_type))
+        raise TypeError(emsg)
+
+    return new_view(data_type, buf, index, index + data_len, zero_copy)
+
+
+def new_view(data_type, buf, index, end, zero_copy=False):
+    out = {LIST: LazyList, DICT: LazyDict}[data_type]
+    return out(buf, index, end, zero_copy)
+
+
+class LazyView(object):
+    """Common parts of LazyList and LazyDict."""
+
+    def __init__(self, buf, index, end, zero_copy=False):
+        self._buf = buf
+        self._index = index
+        self._end = end
+        self._zero_copy = zero_copy
+        self._items = None  # ContainerIndex of our items, once scanned
+        self._values = {}  # decoded values, by position
+
+    def _scan(self):
+        if self._items is None:
+            self._items = ContainerIndex(self._buf, self._index, self._end)
+        return self._items
+
+    def _value_at(self, position):
+        if position in self._values:
+            return self._values[position]
+        key, data_type, flags, index, data_len = self._items[position]
+        if data_type in (LIST, DICT):
+            value = new_view(data_type, self._buf, index, index + data_len, self._zero_copy)
+        else:
+            has_data, is_null = flags & FLAG_HAS_DATA, flags & FLAG_NULL
+            value = decode_value(
+                data_type, has_data, is_null, data_len, self._buf, index, self._zero_copy
+            )
+        self._values[position] = value
+        return value
+
+
+class LazyList(LazyView, Sequence):
+    """Read-only list-like view over packed list items, decoded on demand. See view()."""
+
+    def __len__(self):
+        return len(self._scan())
+
+    def __getitem__(self, position):
+        count = len(self)
+        if isinstance(position, slice):
+            return [self._value_at(i) for i in range(*position.indices(count))]
+        if position < 0:
+            position += count
+        if not 0 <= position < count:
+            raise IndexError("LazyList index out of range")
+        return self._value_at(position)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, LazyList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):  # py2 doesn't derive this from __eq__
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "LazyList(%r)" % (list(self),)
+
+
+class LazyDict(LazyView, Mapping):
+    """Read-only dict-like view over packed dict items, decoded on demand. See view()."""
+
+    def __len__(self):
+        return len(self._scan().positions())
+
+    def __iter__(self):
+        return iter(self._scan().positions())
+
+    def __contains__(self, key):
+        return key in self._scan().positions()
+
+    def __getitem__(self, key):
+        return self._value_at(self._scan().positions()[key])
+
+    def __repr__(self):
+        return "LazyDict(%r)" % (dict(self.items()),)
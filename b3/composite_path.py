@@ -0,0 +1,95 @@
+# Path-based value extraction from packed dynamic-composite data, without unpacking the whole thing.
+
+from b3.datatypes import LIST, DICT
+from b3.item import decode_value
+from b3.scanner import scan, FLAG_HAS_DATA, FLAG_NULL
+from b3.composite_dynamic import new_container, unpack_into
+
+# Method: walk the item headers with scan(), skipping every item that isn't on a wanted path using its
+#         data length, and only decode the values at the ends of the paths.
+# Method: get_many() merges its paths into a tree, so each container on the way is only scanned once,
+#         no matter how many of the paths go through it.
+# Policy: path parts are dict keys for dicts, and positions (0, 1, 2..) for lists.
+# Policy: like unpack(), if a dict key appears more than once the last one wins. This means the whole of each
+#         container on a path gets its headers scanned, but get() can never disagree with unpack() about a value.
+
+_MISSING = object()
+
+
+def get(buf, path, default=_MISSING, index=0, zero_copy=False):
+    """Returns the value at path in packed byte data, decoding nothing else.
+    buf       - bytes data (or bytearray, mmap, memoryview etc), as made by pack(),
+    path      - sequence of dict keys and/or list positions, e.g. ("meta", "tenant") or ("items", 0),
+    default   - returned if the path isn't in the data. If not given, KeyError is raised instead,
+    index     - where to start in buf (defaults to 0),
+    zero_copy - if True, BYTES values (and unknown types) are memoryview slices of buf instead of copies.
+    - lists and dicts at the end of the path are fully unpacked.
+    - raises ValueError if there is no item at index (e.g. buf is empty)."""
+    value = get_many(buf, [path], _MISSING, index, zero_copy)[0]
+    if value is _MISSING:
+        if default is _MISSING:
+            raise KeyError(path)
+        return default
+    return value
+
+
+def get_many(buf, paths, default=None, index=0, zero_copy=False):
+    """Returns a list of the values at each of the paths, in one pass over buf.
+    buf       - bytes data (or bytearray, mmap, memoryview etc), as made by pack(),
+    paths     - sequence of paths, see get(),
+    default   - value given for paths that aren't in the data,
+    index     - where to start in buf (defaults to 0),
+    zero_copy - if True, BYTES values (and unknown types) are memoryview slices of buf instead of copies.
+    """
+    if zero_copy:
+        buf = memoryview(buf)
+
+    results = [default] * len(paths)
+    root = PathNode()
+    for n, path in enumerate(paths):
+        node = root
+        for part in path:
+            node = node.children.setdefault(part, PathNode())
+        node.wanted.append(n)
+
+    record = next(scan(buf, index), None)
+    # Note: not StopIteration, which would quietly end a caller's loop or generator
+    if record is None:
+        raise ValueError("no item at index %d, the buffer is %d bytes" % (index, len(buf)))
+    extract(root, record, buf, results, zero_copy)
+    return results
+
+
+class PathNode(object):
+    """One level of a tree of paths. wanted holds the indexes of the paths that end here."""
+
+    def __init__(self):
+        self.children = {}
+        self.wanted = []
+
+
+def extract(node, record, buf, results, zero_copy=False):
+    key, data_type, flags, index, data_len = record
+
+    if node.wanted:
+        if data_type in (LIST, DICT):
+            value = new_container(data_type)
+            unpack_into(value, buf, index, index + data_len, zero_copy)
+        else:
+            has_data, is_null = flags & FLAG_HAS_DATA, flags & FLAG_NULL
+            value = decode_value(data_type, has_data, is_null, data_len, buf, index, zero_copy)
+        for n in node.wanted:
+            results[n] = value
+
+    if not node.children or data_type not in (LIST, DICT):
+        return
+
+    # --- Scan this container's item headers, skipping the values ---
+    found = {}
+    for position, record in enumerate(scan(buf, index, index + data_len)):
+        part = position if data_type == LIST else record[0]
+        if part in node.children:
+            found[part] = record  # note last one wins
+
+    for part, record in found.items():  # note recursive
+        extract(node.children[part], record, buf, results, zero_copy)
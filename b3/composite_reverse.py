@@ -0,0 +1,244 @@
+# Back-to-front composite encoders (like the protobuf/flatbuffers builders).
+
+import struct
+
+from b3.datatypes import (
+    BOOL,
+    UVARINT,
+    SVARINT,
+    U64,
+    S64,
+    FLOAT64,
+    COMPLEX,
+    BYTES,
+    DICT,
+    LIST,
+    DATATYPE_NAMES,
+)
+from b3.guess_type import guess_type, check_mode
+from b3.type_varint import uvarint_size
+from b3.utils import VALID_INT_TYPES, VALID_STR_TYPES
+from b3.type_codecs import ENCODERS, ZERO_VALUE_TABLE
+from b3 import composite_schema  # for strict_mode
+
+# Method: B3 is bottom-up, an item's header holds the size of its value. Writing from the end of the buffer toward
+#         the front means the value (and for containers, all the children) is always written before its header,
+#         so the size is known when the header is written, and nothing needs joining or back-patching.
+# Method: containers write their children last-to-first, so the finished buffer reads first-to-last as normal.
+# Method: fixed-size and varint values are written straight into the buffer. Other types use their codec's bytes.
+
+# Policy: output is byte-identical to pack() and schema_pack(), the tests hold us to this.
+
+
+class ReverseWriter(object):
+    """A growable buffer that is written from the end toward the front.
+    - the written data is always buf[pos:]."""
+
+    def __init__(self, size_hint=256):
+        self.buf = bytearray(size_hint)
+        self.pos = size_hint
+
+    def __len__(self):
+        return len(self.buf) - self.pos
+
+    def getvalue(self):
+        return bytes(self.buf[self.pos :])
+
+    def reserve(self, size):
+        """Makes room for size more bytes in front of pos, returns the new pos."""
+        if size > self.pos:
+            grow = max(len(self.buf), size)
+            self.buf = bytearray(grow) + self.buf  # amortized doubling, like list appends
+            self.pos += grow
+        self.pos -= size
+        return self.pos
+
+    def write(self, data):
+        pos = self.reserve(len(data))
+        self.buf[pos : pos + len(data)] = data
+
+    def write_byte(self, value):
+        pos = self.reserve(1)
+        self.buf[pos] = value
+
+    def write_uvarint(self, num):
+        if num < 0:
+            raise ValueError("encode_uvarint called with negative number")
+        size = uvarint_size(num)
+        pos = self.reserve(size)
+        buf = self.buf
+        for i in range(pos, pos + size - 1):
+            buf[i] = (num & 127) | 128
+            num >>= 7
+        buf[pos + size - 1] = num
+
+    def write_svarint(self, num):
+        num = num << 1
+        if num < 0:
+            num = -1 ^ num
+        self.write_uvarint(num)
+
+    def write_struct(self, fmt, size, *values):
+        pos = self.reserve(size)
+        struct.pack_into(fmt, self.buf, pos, *values)
+
+    # --- Item parts ---
+
+    def write_header(self, key, data_type, has_data, is_null, data_len):
+        """Writes an item header, in front of the item's value which must already be written."""
+        cbyte = 0x00
+        if has_data:
+            cbyte |= 0x08
+            if data_type != BOOL:  # has_data controls if there is a data length (except for BOOL)
+                self.write_uvarint(data_len)
+        if is_null:
+            cbyte |= 0x04
+        cbyte |= self.write_key(key)
+        if data_type > 14:  # 'extended' data types 15 and up are a seperate uvarint
+            self.write_uvarint(data_type)
+            cbyte |= 0xF0
+        else:
+            cbyte |= (data_type << 4) & 0xF0
+        self.write_byte(cbyte)
+
+    def write_key(self, key):
+        """Writes the key bytes, returns the control byte key type bits."""
+        ktype = type(key)
+        if key is None:
+            return 0x00
+        if ktype in VALID_INT_TYPES:
+            self.write_uvarint(key)
+            return 0x01
+        if ktype in VALID_STR_TYPES:
+            key = key.encode("utf8", "replace")
+            self.write(key)
+            self.write_uvarint(len(key))
+            return 0x02
+        if ktype == bytes:
+            self.write(key)
+            self.write_uvarint(len(key))
+            return 0x03
+        raise TypeError("Key type must be None, uint, str or bytes, not %s" % ktype)
+
+    def write_item(self, key, data_type, value):
+        """Writes a whole item, the mirror image of item.encode_item()."""
+        end = len(self)
+        has_data, is_null = self.write_item_value(data_type, value)
+        self.write_header(key, data_type, has_data, is_null, len(self) - end)
+
+    def write_item_value(self, data_type, value):
+        """Writes an item's value bytes (if any), returns the has_data and is_null flags for its header."""
+        # Note that the order of these matters. Null supercedes zero, etc etc.
+        if value is None:
+            return False, True
+        if data_type == BOOL:
+            return True, value  # repurposes the null/zero flag to store its value
+        if data_type in ZERO_VALUE_TABLE and value == ZERO_VALUE_TABLE[data_type]:
+            return False, False
+        self.write_value(data_type, value)
+        return True, False
+
+    def write_value(self, data_type, value):
+        if data_type == BYTES:
+            self.write(bytes(value))
+        elif data_type == UVARINT:
+            self.write_uvarint(value)
+        elif data_type == SVARINT:
+            self.write_svarint(value)
+        elif data_type == FLOAT64:
+            if not isinstance(value, float):
+                raise TypeError("float64 only accepts float values")
+            self.write_struct("<d", 8, value)
+        elif U64 <= data_type <= S64:
+            if not isinstance(value, VALID_INT_TYPES):
+                raise TypeError("%s only accepts integer values" % DATATYPE_NAMES[data_type])
+            self.write_struct("<Q" if data_type == U64 else "<q", 8, value)
+        elif data_type == COMPLEX:
+            if not isinstance(value, complex):
+                raise TypeError("complex only accepts complex types")
+            self.write_struct("<dd", 16, value.real, value.imag)
+        elif data_type in ENCODERS:
+            self.write(ENCODERS[data_type](value))
+        else:
+            self.write(bytes(value))  # bytes value (dict, list, unknown data types)
+
+
+def pack_reverse(item, key=None, with_header=True, rlimit=20, mode="fixed"):
+    """Packs a list or dict to bytes, writing back-to-front. Output is identical to pack().
+    item        - the list or dict to pack
+    with_header - returned bytes include a header. unpack() needs this on,
+                  unpack_into() and embedding into schema fields needs it off.
+    key         - key value for the top-level header (optional, typically not needed)
+    rlimit      - recurse limit. Raises ValueError if limit exceeded.
+    mode        - type selection mode, see pack()."""
+    check_mode(mode)
+    writer = ReverseWriter()
+    write_dynamic(writer, item, key, rlimit, with_header, mode)
+    return writer.getvalue()
+
+
+def write_dynamic(writer, item, key=None, rlimit=20, with_header=True, mode="fixed"):
+    if rlimit < 1:
+        raise ValueError("Recurse limit exceeded")
+
+    if isinstance(item, list):
+        data_type = LIST
+        end = len(writer)
+        for v in reversed(item):  # note recursive call
+            write_dynamic(writer, v, None, rlimit - 1, True, mode)
+
+    elif isinstance(item, dict):
+        data_type = DICT
+        end = len(writer)
+        for k, v in reversed(list(item.items())):  # note recursive call
+            write_dynamic(writer, v, k, rlimit - 1, True, mode)
+
+    elif with_header:
+        # may blow up here encountering unknown types
+        writer.write_item(key, guess_type(item, mode), item)
+        return
+
+    else:
+        # bare value bytes, like pack(with_header=False)
+        writer.write_item_value(guess_type(item, mode), item)
+        return
+
+    if with_header:
+        writer.write_header(key, data_type, True, False, len(writer) - end)
+
+
+def schema_pack_reverse(schema, data):
+    """Packs a dict to bytes using a given schema, writing back-to-front. Output is identical to schema_pack().
+    schema - list/tuple of (type, name, tag-number) values, or a Schema from compile_schema(),
+    data   - dict of data to pack"""
+    if not isinstance(data, dict):
+        raise TypeError("currently only dict input data supported by schema_pack")
+
+    schema = composite_schema.compile_schema(schema)
+    values = {}  # schema field def and value, by schema_key_number
+
+    for key, value in data.items():
+        schema_type, schema_key_name, schema_key_number = schema.lookup_key(key)
+        if schema_type is None:
+            if composite_schema.strict_mode:
+                raise KeyError("Supplied key %r is not in the schema" % (key,))
+            else:
+                continue
+
+        if schema_type in (DICT, LIST) and not isinstance(value, bytes):
+            emsg = "Please pack field #%r ('%s') to bytes first" % (
+                schema_key_number,
+                schema_key_name,
+            )
+            raise TypeError(emsg)
+
+        values[schema_key_number] = (schema_type, value)
+
+    writer = ReverseWriter()
+    for key_number in reversed(schema.numbers):
+        if key_number in values:
+            schema_type, value = values[key_number]
+        else:
+            schema_type, value = schema.by_number[key_number][0], None
+        writer.write_item(key_number, schema_type, value)
+    return writer.getvalue()
@@ -1,7 +1,7 @@
 # Schema-style composite encoder.
 
 from b3.item import encode_item, decode_header, decode_value
-from b3.utils import VALID_INT_TYPES
+from b3.utils import VALID_INT_TYPES, write_chunks_into
 from b3.datatypes import b3_type_name, DICT, LIST
 
 strict_mode = False
@@ -18,28 +18,113 @@ def schema_lookup_key(schema, key):
                 return typ, name, n
         return None, None, None
     else:
-        for field_def in schema:     # ignore additional schema fields
+        for field_def in schema:  # ignore additional schema fields
             typ, name, n = field_def[:3]
             if key == name:
                 return typ, name, n
         return None, None, None
 
 
+NOT_FOUND = (None, None, None)
+
+
+class Schema(object):
+    """A schema compiled once into lookup indexes, for fast repeated schema_pack/schema_unpack calls.
+    schema - list/tuple of (type, name, tag-number) values (additional fields are ignored).
+    - can be given to schema_pack and schema_unpack anywhere a raw schema tuple is accepted.
+    - use compile_schema() rather than creating these directly."""
+
+    def __init__(self, schema):
+        self.fields = tuple(tuple(field_def[:3]) for field_def in schema)
+        self.by_number = {}
+        self.by_name = {}
+        self.null_items = {}  # pre-encoded items for fields missing from outgoing data, by number
+        for typ, name, n in self.fields:
+            # Policy: first matching field wins, same as the linear schema_lookup_key scan.
+            self.by_number.setdefault(n, (typ, name, n))
+            self.by_name.setdefault(name, (typ, name, n))
+            if n not in self.null_items:
+                self.null_items[n] = encode_item(n, typ, None)
+        self.numbers = sorted(self.null_items.keys())  # outgoing message order
+        self.names = frozenset(name for _, name, _ in self.fields)
+
+    def lookup_key(self, key):
+        """return the schema entry given a key value. Try to match field names if non-number provided"""
+        if isinstance(key, VALID_INT_TYPES):
+            return self.by_number.get(key, NOT_FOUND)
+        else:
+            return self.by_name.get(key, NOT_FOUND)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return "Schema(%r)" % (self.fields,)
+
+
+# Method: raw schema tuples (and lists) are compiled once and cached by their contents, so callers that pass the
+#         same raw schema to every schema_pack/schema_unpack call don't pay for compiling it each time.
+# Policy: the cache is bounded. If a program makes more than COMPILED_CACHE_SIZE different schemas, it starts over.
+
+COMPILED_CACHE_SIZE = 256
+_compiled = {}  # Schema by raw schema contents
+
+
+def compile_schema(schema):
+    """Returns a Schema for the given (type, name, tag-number) schema, or schema itself if already compiled."""
+    if isinstance(schema, Schema):
+        return schema
+    try:
+        key = schema if isinstance(schema, tuple) else tuple(tuple(field_def) for field_def in schema)
+        compiled = _compiled.get(key)
+    # unhashable somewhere, e.g. a tuple of lists. Try again with its contents as tuples
+    except TypeError:
+        try:
+            key = tuple(tuple(field_def) for field_def in schema)
+            compiled = _compiled.get(key)
+        except TypeError:  # still unhashable, don't cache it
+            return Schema(schema)
+    if compiled is None:
+        if len(_compiled) >= COMPILED_CACHE_SIZE:
+            _compiled.clear()
+        compiled = _compiled[key] = Schema(schema)
+    return compiled
+
+
 def schema_pack(schema, data):
     """Packs a dict to bytes using a given schema.
-    schema - list/tuple of (type, name, tag-number) values,
+    schema - list/tuple of (type, name, tag-number) values, or a Schema from compile_schema(),
     data   - dict of data to pack
     - dict keys can match to schema using both string name or tag number.
     - nested fields with dicts or lists in them must be packed to bytes first.
     - schema fields that are missing from input data, are still packed but with value None.
     - packed data is always sorted by schema key number ascending"""
+    return b"".join(schema_pack_chunks(schema, data))
+
+
+def schema_pack_into(buf, offset, schema, data):
+    """Packs a dict straight into a writable buffer using a given schema, returns the end offset of the packed data.
+    buf    - writable buffer (bytearray, mmap, memoryview, shared_memory.buf etc),
+    offset - where to start writing in buf,
+    schema, data - as for schema_pack().
+    - raises ValueError (without writing anything) if the data doesn't fit."""
+    out_list = schema_pack_chunks(schema, data)
+    return write_chunks_into(buf, offset, out_list, sum(len(i) for i in out_list))
+
+
+def schema_pack_chunks(schema, data):
+    """schema_pack(), but returns the list of header and value byte chunks instead of joining them."""
     if not isinstance(data, dict):
         raise TypeError("currently only dict input data supported by schema_pack")
 
+    schema = compile_schema(schema)
     out = {}  # header and data items by schema_key_number
 
     for key, value in data.items():
-        schema_type, schema_key_name, schema_key_number = schema_lookup_key(schema, key)
+        schema_type, schema_key_name, schema_key_number = schema.lookup_key(key)
         if schema_type is None:
             if strict_mode:
                 raise KeyError("Supplied key %r is not in the schema" % (key,))
@@ -55,26 +140,22 @@ def schema_pack(schema, data):
 
         out[schema_key_number] = encode_item(schema_key_number, schema_type, value)
 
-    # Check schema fields that are missing from supplied data. Policy: Do it by NUMBER.
-    for field_def in schema:
-        mtyp, mname, mnum = field_def[:3]
-        if mnum not in out:
-            out[mnum] = encode_item(mnum, mtyp, None)
-            # print("schema field %i missing from supplied, adding it with value None" % (mnum,))
-
     # Ensure outgoing message is sorted by key_number
+    # Schema fields that are missing from supplied data are sent null. Policy: Do it by NUMBER.
     out_list = []
-    for key_number in sorted(out.keys()):
-        out_list.extend(out[key_number])
-    return b"".join(out_list)
+    for key_number in schema.numbers:
+        out_list.extend(out.get(key_number) or schema.null_items[key_number])
+    return out_list
 
 
-def schema_unpack(schema, buf, index=0, end=None):
+def schema_unpack(schema, buf, index=0, end=None, zero_copy=False):
     """Unpacks bytes to a dict using the given schema.
-    schema - list/tuple of (type, name, tag-number) values,
-    buf    - bytes data,
-    index  - where to start in buf (if not given, defaults to 0),
-    end    - where to stop in buf (if not given, defaults to len(buf),
+    schema    - list/tuple of (type, name, tag-number) values, or a Schema from compile_schema(),
+    buf       - bytes data (or bytearray, mmap, memoryview etc),
+    index     - where to start in buf (if not given, defaults to 0),
+    end       - where to stop in buf (if not given, defaults to len(buf),
+    zero_copy - if True, bytes-ey fields (BYTES, nested DICT/LIST etc) are memoryview slices of buf, not copies.
+                See the zero-copy notes at the bottom of composite_dynamic.py.
     - if an incoming key is not found in the schema it is ignored.
     - if a schema key is not found in the incoming data it is added with value None.
     - if incoming data has no keys an error will occur (e.g. from pack()ing a list).
@@ -82,10 +163,14 @@ def schema_unpack(schema, buf, index=0, end=None):
     if end is None:
         end = len(buf)
 
+    if zero_copy:
+        buf = memoryview(buf)
+
+    schema = compile_schema(schema)
     out = {}
     while index < end:
         key, data_type, has_data, is_null, data_len, index = decode_header(buf, index)
-        schema_type, schema_key_name, schema_key_number = schema_lookup_key(schema, key)
+        schema_type, schema_key_name, schema_key_number = schema.lookup_key(key)
 
         if schema_type is None:  # key not found in schema, ignore and continue
             index += data_len  # skip over the unwanted data!
@@ -102,12 +187,14 @@ def schema_unpack(schema, buf, index=0, end=None):
                 )
                 raise TypeError(emsg)
 
-        out[schema_key_name] = decode_value(data_type, has_data, is_null, data_len, buf, index)
+        out[schema_key_name] = decode_value(
+            data_type, has_data, is_null, data_len, buf, index, zero_copy
+        )
         index += data_len
 
     # Check if any wanted fields are missing, add them with data=None
     # Policy: do this by whatever key type we are yielding (in this case, COMPUTED key name)
-    for missing_key_name in set(i[1] for i in schema) - set(out.keys()):
+    for missing_key_name in schema.names - set(out.keys()):
         # print("key %r missing from incoming, adding it with value None" % (missing_key_name))
         out[missing_key_name] = None
 
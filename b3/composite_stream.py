@@ -0,0 +1,223 @@
+# Incremental decoding - of a stream of packed items arriving in fragments (e.g. from a socket),
+# and of the elements of a big list one at a time.
+
+import mmap
+
+from b3.datatypes import BOOL, LIST, DICT, b3_type_name
+from b3.scanner import scan, FLAG_HAS_DATA, FLAG_NULL
+from b3.type_varint import decode_uvarint
+from b3.item import decode_header, decode_value
+from b3.composite_dynamic import new_container, unpack_into
+
+# Method: the decoder keeps the bytes it has been fed in a bytearray, and walks just the header of the next item
+#         (varints only, nothing is decoded) to learn where the item ends. That end is remembered, so further
+#         feeds only compare it with the buffered length - nothing is parsed again until the whole item is there.
+# Method: consumed bytes are dropped from the front of the buffer at the next feed(), not after every item.
+# Policy: top-level items are yielded as their values, like unpack() (lists and dicts are unpacked fully).
+#         Their keys, if any, are not yielded.
+# Policy: max_total_bytes limits each item's key and data. Each length is checked as soon as its varint is in,
+#         so an oversized item is refused before its key or data is buffered.
+# Method: iter_unpack() walks a list's element headers with scan() for buffers (incl. mmaps), decoding one
+#         element per step. Files are read a chunk at a time into a Decoder, so either way only one element
+#         (plus the read buffer) is held at once.
+
+
+class Decoder(object):
+    """Decodes packed items fed to it in arbitrary pieces. Iterate it to get the items completed so far.
+    max_depth, max_items, max_total_bytes - optional limits for untrusted input, see unpack_into().
+    e.g.
+        decoder = b3.Decoder()
+        decoder.feed(chunk)
+        for item in decoder:
+            ..."""
+
+    def __init__(self, max_depth=None, max_items=None, max_total_bytes=None):
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_total_bytes = max_total_bytes
+        self._buf = bytearray()
+        self._pos = 0  # start of the next item in _buf
+        self._end = None  # end of the next item in _buf, once its header is in
+
+    def feed(self, data):
+        """Adds data (bytes, bytearray, memoryview etc) to the end of the stream."""
+        if self._pos:  # drop what's been consumed
+            del self._buf[: self._pos]
+            if self._end is not None:
+                self._end -= self._pos
+            self._pos = 0
+        self._buf += data
+
+    @property
+    def needed(self):
+        """How many more bytes are needed to complete the next item. 0 if it's ready.
+        - if the item's header isn't all in yet this is 1, as its size isn't known yet."""
+        if self._end is None and not self._find_end():
+            return 1
+        return max(0, self._end - len(self._buf))
+
+    @property
+    def buffered(self):
+        """How many bytes are buffered, not yet yielded as items."""
+        return len(self._buf) - self._pos
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self.next_bytes()
+        if data is None:
+            raise StopIteration
+        return unpack_item(data, self.max_depth, self.max_items)
+
+    next = __next__  # py2
+
+    def next_bytes(self):
+        """Returns the bytes (header and value) of the next completed item without decoding it, or None.
+        - unpack_item() decodes them. For forwarding items on, or decoding them elsewhere."""
+        if self._end is None and not self._find_end():
+            return None
+        if self._end > len(self._buf):
+            return None
+        data = bytes(self._buf[self._pos : self._end])
+        self._pos, self._end = self._end, None
+        return data
+
+    def _find_end(self):
+        """Walks the next item's header, sets self._end and returns True if the header is all in."""
+        found = find_header(self._buf, self._pos, self.max_total_bytes)
+        if found is None:
+            return False
+        data_type, index, data_len = found
+        self._end = index + data_len
+        return True
+
+
+def find_header(buf, index, max_size=None):
+    """Walks the item header at index in buf, decoding only its varints.
+    Returns (data_type, value_offset, data_len), or None if the header isn't all in buf yet.
+    max_size - optional limit on the item's key and data bytes, ValueError if exceeded. The key length
+               is checked as soon as it is in, before the key itself is."""
+    key_len = 0
+    try:
+        cbyte = buf[index]
+        index += 1
+        data_type = cbyte >> 4
+        if data_type == 15:  # 'extended' data types 15 and up follow the control byte
+            data_type, index = decode_uvarint(buf, index)
+        key_type_bits = cbyte & 0x03
+        if key_type_bits == 0x01:  # number key
+            _, index = decode_uvarint(buf, index)
+        elif key_type_bits:  # string or bytes key
+            key_len, index = decode_uvarint(buf, index)
+            check_size("item key", key_len, max_size)
+            index += key_len
+        data_len = 0
+        if cbyte & 0x08 and data_type != BOOL:
+            data_len, index = decode_uvarint(buf, index)
+            check_size("item data", data_len, max_size)
+            check_size("item key and data", key_len + data_len, max_size)
+    except IndexError:  # header not all in yet
+        return None
+    if index > len(buf):  # key not all in yet
+        return None
+    return data_type, index, data_len
+
+
+def check_size(what, size, max_size):
+    if max_size is not None and size > max_size:
+        raise ValueError("%s is %d bytes, limit is %d" % (what, size, max_size))
+
+
+def unpack_item(data, max_depth=None, max_items=None):
+    """Returns the value of the one whole item (header and value) in bytes data.
+    - lists and dicts are unpacked fully, other types are decoded like decode_value()."""
+    key, data_type, has_data, is_null, data_len, index = decode_header(data, 0)
+    if data_type in (LIST, DICT):
+        out = new_container(data_type)
+        return unpack_into(out, data, index, index + data_len, False, max_depth, max_items)
+    return decode_value(data_type, has_data, is_null, data_len, data, index)
+
+
+READ_SIZE = 64 * 1024
+
+
+def iter_unpack(
+    buf_or_file,
+    index=0,
+    zero_copy=False,
+    read_size=READ_SIZE,
+    max_depth=None,
+    max_items=None,
+    max_total_bytes=None,
+):
+    """Returns an iterator over the elements of a packed list, unpacking one element at a time.
+    buf_or_file - bytes data (or bytearray, mmap, memoryview etc), or a binary file object to read() from,
+    index       - where the list's header starts in buf (defaults to 0). Files are read from where they are,
+    zero_copy   - if True, BYTES values are memoryview slices of buf instead of copies (buffers only),
+    read_size   - how many bytes to read() from a file at a time,
+    max_depth, max_items, max_total_bytes - optional limits for untrusted input, applied to each element.
+    - the list header is checked straight away, raising TypeError if it isn't a list.
+    - raises ValueError if the data ends before the list does."""
+    limits = (max_depth, max_items, max_total_bytes)
+    if hasattr(buf_or_file, "read") and not isinstance(buf_or_file, mmap.mmap):
+        return iter_file(buf_or_file, read_size, limits)
+
+    buf = memoryview(buf_or_file) if zero_copy else buf_or_file
+    key, data_type, has_data, is_null, data_len, index = decode_header(buf, index)
+    check_list(data_type)
+    if index + data_len > len(buf):
+        raise ValueError("buffer truncated - list data runs past the end of the buffer")
+    return iter_buffer_elements(buf, index, index + data_len, zero_copy, limits)
+
+
+def check_list(data_type):
+    if data_type != LIST:
+        emsg = "Expecting list first, but got %s" % (b3_type_name(data_type))
+        raise TypeError(emsg)
+
+
+def iter_buffer_elements(buf, index, end, zero_copy, limits):
+    max_depth, max_items, max_total_bytes = limits
+    for key, data_type, flags, index, data_len in scan(buf, index, end):
+        if max_total_bytes is not None and data_len > max_total_bytes:
+            emsg = "item data is %d bytes, limit is %d" % (data_len, max_total_bytes)
+            raise ValueError(emsg)
+        if data_type in (LIST, DICT):
+            out = new_container(data_type)
+            yield unpack_into(out, buf, index, index + data_len, zero_copy, max_depth, max_items)
+        else:
+            has_data, is_null = flags & FLAG_HAS_DATA, flags & FLAG_NULL
+            yield decode_value(data_type, has_data, is_null, data_len, buf, index, zero_copy)
+
+
+def iter_file(f, read_size, limits):
+    head = bytearray()
+    found = None
+    while found is None:
+        chunk = f.read(read_size)
+        if not chunk:
+            raise ValueError("file truncated - no list header")
+        head += chunk
+        found = find_header(head, 0)
+    data_type, index, data_len = found
+    check_list(data_type)
+    return iter_file_elements(f, head[index : index + data_len], data_len, read_size, limits)
+
+
+def iter_file_elements(f, data, data_len, read_size, limits):
+    decoder = Decoder(*limits)
+    decoder.feed(data)
+    left = data_len - len(data)  # bytes of the list still to be read
+    while True:
+        for item in decoder:
+            yield item
+        if not left:
+            break
+        chunk = f.read(min(read_size, left))
+        if not chunk:
+            raise ValueError("file truncated - list data runs past the end of the file")
+        decoder.feed(chunk)
+        left -= len(chunk)
+    if decoder.buffered:
+        raise ValueError("list data truncated - its last element runs past the end of the list")
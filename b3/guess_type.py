@@ -1,9 +1,11 @@
 # Python-Obj to B3-Type guesser for composite_dynamic (pack)
 
-import datetime, decimal
-from six import PY2
+import datetime, decimal, functools
 
 from b3.datatypes import *
+from b3.utils import VALID_INT_TYPES, VALID_STR_TYPES
+from b3.type_codecs import ENCODERS, ZERO_VALUE_TABLE
+from b3.type_basic import encode_ints
 
 # policy: Weird edge case: if the encoder gets a None, we consider that BYTES, because
 #         the header needs to encode *something* as the data type.
@@ -11,58 +13,130 @@ from b3.datatypes import *
 #         so this should be ok.
 
 
-def guess_type(obj):
-    if obj is None:
-        return BYTES
+def guess_type(obj, mode="fixed"):
+    entry = TYPE_DISPATCH.get(type(obj))
+    if entry is None:
+        entry = resolve_type(type(obj))  # may blow up here encountering unknown types
+    if entry[0] == SVARINT and mode != "fixed":
+        entry = INT_MODES[mode](obj)
+    return entry[0]
+
+
+# --- Type dispatch ---
+# Method: pack looks up type(obj) in TYPE_DISPATCH, which maps straight to the b3 type, its encoder, and its zero value,
+#         so there's one dict lookup per value instead of a chain of isinstance checks and then another dispatch
+#         on the data type. The encoder is None for the types encode_item handles itself (None, bool, containers).
+# Method: types that aren't in the table (i.e. subclasses) go through guess_type_of_class's issubclass checks once,
+#         and the answer is cached in the table.
+
+
+def type_dispatch(obj):
+    """Returns the (data_type, encoder, zero_value) dispatch entry for obj. (for mode "fixed", see below)"""
+    return TYPE_DISPATCH.get(type(obj)) or resolve_type(type(obj))
+
+
+def resolve_type(cls):
+    entry = TYPE_DISPATCH[cls] = dispatch_entry(guess_type_of_class(cls))
+    return entry
 
-    if isinstance(obj, bytes):  # Note this will catch also *str* on python2.
+
+def dispatch_entry(data_type):
+    if data_type in (BOOL, DICT, LIST):
+        encoder = None
+    elif data_type == BYTES:
+        encoder = bytes
+    elif data_type in (U64, S64):
+        encoder = functools.partial(encode_ints, data_type)
+    else:
+        encoder = ENCODERS[data_type]
+    return data_type, encoder, ZERO_VALUE_TABLE.get(data_type)
+
+
+def guess_type_of_class(cls):
+    if cls is type(None):
         return BYTES
 
-    if PY2 and isinstance(obj, unicode):  # py2 unicode string
-        return UTF8
+    if USER_TYPES:  # registered user types first, they may subclass core ones. The most specific class wins.
+        for user_cls in getattr(cls, "__mro__", (cls,)):
+            if user_cls in USER_TYPES:
+                return USER_TYPES[user_cls]
+
+    if issubclass(cls, bytes):  # Note this will catch also *str* on python2.
+        return BYTES
 
-    if isinstance(
-        obj, str
-    ):  # Py3 unicode str only, py2 str/bytes is caught by above test.
+    if issubclass(cls, VALID_STR_TYPES):  # py3 str, py2 unicode. (py2 str/bytes is caught by above test)
         return UTF8
 
-    if obj is True or obj is False:  # Note: make sure this check is BEFORE int checks!
+    if issubclass(cls, bool):  # Note: make sure this check is BEFORE int checks!
         return BOOL  # Note: because bools are a subclass of int (!?) in python :S
 
-    if isinstance(obj, int):
+    if issubclass(cls, VALID_INT_TYPES):  # int, and py2 long
         return SVARINT  # Policy: fixed to svarint to make this deterministic for better interop.
 
-    if PY2 and isinstance(obj, long):
-        return SVARINT  # the zigzag size diff is only noticeable with small numbers.
-
-    if isinstance(obj, float):
+    if issubclass(cls, float):
         return FLOAT64
 
-    if isinstance(obj, decimal.Decimal):
+    if issubclass(cls, decimal.Decimal):
         return DECIMAL
 
-    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+    if issubclass(cls, (datetime.datetime, datetime.date, datetime.time)):
         return SCHED
 
-    if isinstance(obj, complex):
+    if issubclass(cls, complex):
         return COMPLEX
 
-    if isinstance(obj, dict):  # Not used by composite, included here for completeness
+    if issubclass(cls, dict):  # Not used by composite, included here for completeness
         return DICT
 
-    if isinstance(obj, list):  # Not used by composite, included here for completeness
+    if issubclass(cls, list):  # Not used by composite, included here for completeness
         return LIST
 
-    raise TypeError("Could not map type of object %r to a viable B3 type" % type(obj))
+    raise TypeError("Could not map type of object %r to a viable B3 type" % cls)
+
+
+TYPE_DISPATCH = {}
+USER_TYPES = {}  # python type: data type number, for user-defined types. See registry.py
+for _cls in VALID_STR_TYPES + VALID_INT_TYPES + (type(None), bytes, bool, float, decimal.Decimal, complex,
+                                                datetime.datetime, datetime.date, datetime.time, dict, list):
+    resolve_type(_cls)
+CORE_TYPES = frozenset(TYPE_DISPATCH)  # the python types with a core b3 type
 
 
-# Policy: Currently guessed types are fixed and 1:1 with python types.
-# - There is/was an idea to have guess_type select the 'best' type based on value (e.g. SVARINT or UVARINT depending on sign)
-# - But that would make interop difficult between the Dynamic and Schema packers, so we've dropped it for now.
-# The 'best type' selector would have 3 settings -
-# 'fixed' (default, as now), 'compact' (e.g. prefer var-types for small numbers), 'fast' (prefer the xxx64 types)
+# --- Type selection modes ---
+# The 'best type' selector has 3 settings, chosen per pack() call with its mode argument -
+# 'fixed'   (default) guessed types are fixed and 1:1 with python types. Ints are always SVARINT.
+# 'compact' prefer var-types for small numbers. Ints are UVARINT if they're not negative, SVARINT if they are.
+# 'fast'    prefer the xxx64 types, which are cheaper to encode and decode. Ints are S64 (or U64 for 2**63 to 2**64-1),
+#           and SVARINT only if they are too big for 64 bits.
+# Policy: only ints are affected for now. Floats are already FLOAT64, and everything else has only one b3 type.
+# Policy: 'fixed' is the default because value-dependent types make interop between the Dynamic and Schema packers
+#         harder (a schema field has one type). Unpack handles all the modes' output the same way.
 # The wastefulness of using svarint for everything hurts a little, but compactness-obsessed people should be using schemas anyway.
 
+MODES = ("fixed", "compact", "fast")
+INT_ENTRIES = dict((data_type, dispatch_entry(data_type)) for data_type in (UVARINT, SVARINT, U64, S64))
+
+
+def compact_int(num):
+    return INT_ENTRIES[UVARINT] if num >= 0 else INT_ENTRIES[SVARINT]
+
+
+def fast_int(num):
+    if -0x8000000000000000 <= num <= 0x7FFFFFFFFFFFFFFF:
+        return INT_ENTRIES[S64]
+    if 0 <= num <= 0xFFFFFFFFFFFFFFFF:
+        return INT_ENTRIES[U64]
+    return INT_ENTRIES[SVARINT]
+
+
+# The int dispatch entry chooser for each mode ('fixed' has none, it's the TYPE_DISPATCH entry as-is).
+INT_MODES = {"compact": compact_int, "fast": fast_int}
+
+
+def check_mode(mode):
+    if mode not in MODES:
+        raise ValueError("mode must be one of %s, not %r" % (", ".join(MODES), mode))
+
 # Policy: we are NOT auto-converting stuff to DECIMAL, callers responsibility
 # - because we'd have to fix a precision for the user and i dont know if we want to be opinionated about that.
 # - just because I hate IEEE754 doesnt mean any one else does.
@@ -1,10 +1,13 @@
-from six import int2byte
+import functools
+from codecs import utf_8_decode
 
-from b3.utils import VALID_STR_TYPES, VALID_INT_TYPES, IntByteAt
-from b3.type_varint import encode_uvarint, decode_uvarint
+from six import int2byte, PY2
+
+from b3.utils import VALID_STR_TYPES, VALID_INT_TYPES, check_room, write_bytes_into
+from b3.type_varint import encode_uvarint, encode_uvarint_into, uvarint_size, decode_uvarint
 from b3.datatypes import BOOL, U64, S64
-from b3.type_codecs import ENCODERS, DECODERS, ZERO_VALUE_TABLE
-from b3.type_basic import encode_ints, decode_ints
+from b3.type_codecs import ENCODERS, ENCODERS_INTO, DECODERS, ZERO_VALUE_TABLE
+from b3.type_basic import encode_ints, encode_ints_into, decode_ints
 
 # Item:
 # [header BYTE] [15+ type# UVARINT] [key (see below)] [data len UVARINT]  [ data BYTES ]
@@ -81,7 +84,11 @@ def encode_item(key, data_type, value):
         # bytes value (bytes, dict, list, unknown data types)
         value_bytes = bytes(value)
 
-    # ======= Header encoding =======
+    header_bytes = encode_header(key, data_type, has_data, is_null, len(value_bytes))
+    return header_bytes, value_bytes
+
+
+def encode_header(key, data_type, has_data, is_null, data_len):
     ext_data_type_bytes = len_bytes = b""
     cbyte = 0x00
 
@@ -90,8 +97,8 @@ def encode_item(key, data_type, value):
         cbyte |= 0x08
     if is_null:
         cbyte |= 0x04
-    if has_data and data_type is not BOOL:  # has_data controls if there is a data length
-        len_bytes = encode_uvarint(len(value_bytes))
+    if has_data and data_type != BOOL:  # has_data controls if there is a data length
+        len_bytes = encode_uvarint(data_len)
         # ^^ (except for BOOL where there is never a data length)
 
     # --- Key type ---
@@ -107,8 +114,114 @@ def encode_item(key, data_type, value):
         cbyte |= (data_type << 4) & 0xF0  # 'core' data types live in the control byte's bits only.
 
     # --- Build header ---
-    header_bytes = b"".join([int2byte(cbyte), ext_data_type_bytes, key_bytes, len_bytes])
-    return header_bytes, value_bytes
+    return b"".join([int2byte(cbyte), ext_data_type_bytes, key_bytes, len_bytes])
+
+
+def header_size(key, data_type, has_data, data_len):
+    """Returns the size in bytes of the header encode_header() would make, without making it."""
+    size = 1 + key_size(key)
+    if data_type > 14:
+        size += uvarint_size(data_type)
+    if has_data and data_type != BOOL:
+        size += uvarint_size(data_len)
+    return size
+
+
+def key_size(key):
+    """Returns the size in bytes of the key encode_key() would make."""
+    ktype = type(key)
+    if key is None:
+        return 0
+    if ktype in VALID_INT_TYPES:
+        return uvarint_size(key)
+    if ktype in VALID_STR_TYPES:
+        key_len = len(key.encode("utf8", "replace"))
+        return uvarint_size(key_len) + key_len
+    if ktype == bytes:
+        return uvarint_size(len(key)) + len(key)
+    raise TypeError("Key type must be None, uint, str or bytes, not %s" % ktype)
+
+
+# --- Encoding into a buffer ---
+# These write into the writable buffer buf (bytearray, mmap, memoryview etc) at offset, and return the offset of the
+# end of the written data, so a writer can encode items with no per-item temporaries. ValueError if buf is too small.
+# Method: the data length goes in front of the value but isn't known until the value is written, so a one-byte
+#         data length is assumed, and the value is moved up to make room in the (rarer) case it is 128+ bytes.
+
+
+def encode_item_into(buf, offset, key, data_type, value):
+    has_data = True
+    is_null = False
+
+    # Note that the order of these matters, same as encode_item.
+    if value is None:
+        has_data = False
+        is_null = True
+
+    elif data_type == BOOL:
+        is_null = value  # repurposes the null/zero flag to store its value
+
+    elif data_type in ZERO_VALUE_TABLE and value == ZERO_VALUE_TABLE[data_type]:
+        has_data = False
+
+    if not has_data or data_type == BOOL:  # no data length or value
+        return encode_header_into(buf, offset, key, data_type, has_data, is_null, 0)
+
+    start = encode_header_into(buf, offset, key, data_type, True, False, 0)
+    end = encode_value_into(buf, start, data_type, value)
+    data_len = end - start
+    if data_len < 128:
+        buf[start - 1] = data_len
+        return end
+
+    extra = uvarint_size(data_len) - 1
+    check_room(buf, end, extra)
+    buf[start + extra : end + extra] = buf[start:end]
+    encode_uvarint_into(buf, start - 1, data_len)
+    return end + extra
+
+
+def encode_value_into(buf, offset, data_type, value):
+    if U64 <= data_type <= S64:  # int types have a common function
+        return encode_ints_into(data_type, buf, offset, value)
+    if data_type in ENCODERS_INTO:
+        return ENCODERS_INTO[data_type](buf, offset, value)
+    if data_type in ENCODERS:
+        return write_bytes_into(buf, offset, ENCODERS[data_type](value))
+    # bytes value (bytes, dict, list, unknown data types)
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+    return write_bytes_into(buf, offset, value)
+
+
+def encode_header_into(buf, offset, key, data_type, has_data, is_null, data_len):
+    start = offset
+    check_room(buf, start, 1)
+    offset += 1  # control byte goes here once it's worked out
+
+    # --- Null & data flags ---
+    cbyte = 0x00
+    if has_data:
+        cbyte |= 0x08
+    if is_null:
+        cbyte |= 0x04
+
+    # --- Data type ---
+    if data_type > 14:
+        offset = encode_uvarint_into(buf, offset, data_type)
+        cbyte |= 0xF0
+    else:
+        cbyte |= (data_type << 4) & 0xF0
+
+    # --- Key ---
+    key_type_bits, offset = encode_key_into(buf, offset, key)
+    cbyte |= key_type_bits & 0x03
+    buf[start] = cbyte
+
+    # --- Data len ---
+    if has_data and data_type != BOOL:
+        offset = encode_uvarint_into(buf, offset, data_len)
+    return offset
 
 
 # Convenience function for tests
@@ -120,31 +233,74 @@ def encode_item_joined(key, data_type, value):
 #       BUT header decoding and data decoding are split, because Dynamic's recursive unpack needs it.
 
 
+# --- Control byte decode table ---
+# Method: everything the control byte says about an item is worked out once, up front, for all 256 control bytes.
+#         Decoding an item header is then one table lookup instead of a handful of bit ops and bool() calls.
+# Entries: (data_type, key_decoder, has_data, is_null, has_len, no_data_value)
+#   data_type     - the core data type number, or 15 if an extended type number follows the control byte,
+#   key_decoder   - fn(buf, index) returning key, index,
+#   has_data      - the has_data flag,
+#   is_null       - the null/zero flag (the value, for BOOL),
+#   has_len       - True if a data length follows the key (has_data and not BOOL),
+#   no_data_value - the item's value if has_len is False (None, zero value, or bool), for core data types.
+# Note: on py2 indexing a str (or a memoryview) gives 1-char strs, not ints, so there the table is a dict keyed by
+#       both, which is quicker than calling ord() on every control byte.
+
+
+def build_control_table():
+    table = []
+    for cbyte in range(256):
+        data_type = cbyte >> 4
+        has_data = bool(cbyte & 0x08)
+        is_null = bool(cbyte & 0x04)
+        has_len = has_data and data_type != BOOL
+        if data_type == 15 or has_len:
+            no_data_value = None  # not known up front, or not needed
+        elif has_data:
+            no_data_value = is_null  # BOOL
+        elif is_null:
+            no_data_value = None
+        else:
+            no_data_value = ZERO_VALUE_TABLE.get(data_type, b"")
+        key_decoder = KEY_DECODERS[cbyte & 0x03]
+        table.append((data_type, key_decoder, has_data, is_null, has_len, no_data_value))
+    if PY2:
+        table = dict(
+            [(i, entry) for i, entry in enumerate(table)] + list(zip(map(chr, range(256)), table))
+        )
+    return table
+
+
+# Decoder fns indexed by data type, None for the types that are yielded as bytes.
+def build_value_decoders():
+    decoders = [None] * (max(DECODERS) + 1)
+    for data_type, fn in DECODERS.items():
+        decoders[data_type] = fn
+    decoders[U64] = functools.partial(decode_ints, U64)
+    decoders[S64] = functools.partial(decode_ints, S64)
+    return decoders
+
+
 def decode_header(buf, index):
-    cbyte, index = IntByteAt(buf, index)  # control byte
+    data_type, key_decoder, has_data, is_null, has_len, _ = CONTROL_TABLE[buf[index]]
+    index += 1
 
     # --- Data type ---
-    data_type = (cbyte & 0xF0) >> 4
     if data_type == 15:  # 'extended' data types 15 and up follow the control byte
         data_type, index = decode_uvarint(buf, index)
 
     # --- Key ---
-    key_type_bits = cbyte & 0x03
-    key, index = decode_key(key_type_bits, buf, index)  # key bytes
-
-    # --- Flags ---
-    data_len = 0
-    has_data = bool(cbyte & 0x08)
-    is_null = bool(cbyte & 0x04)
+    key, index = key_decoder(buf, index)  # key bytes
 
     # --- Data length ---
-    if has_data and data_type != BOOL:
+    data_len = 0
+    if has_len:
         data_len, index = decode_uvarint(buf, index)  # data len bytes
 
     return key, data_type, has_data, is_null, data_len, index
 
 
-def decode_value(data_type, has_data, is_null, data_len, buf, index):
+def decode_value(data_type, has_data, is_null, data_len, buf, index, zero_copy=False):
     # Note: the order of these matters, be careful about changing it.
     # --- No data: Null or Zero ---
     if not has_data:
@@ -157,22 +313,27 @@ def decode_value(data_type, has_data, is_null, data_len, buf, index):
     if data_type == BOOL:
         return bool(is_null)
 
-    # --- fixed-value integers ---
-    if U64 <= data_type <= S64:
-        return decode_ints(data_type, buf, index, index + data_len)
-
-    # --- Encoded data ---
-    if data_type in DECODERS:
-        DecoderFn = DECODERS[data_type]
+    # --- Encoded data (incl. fixed-value integers) ---
+    if data_type < len(VALUE_DECODERS):
+        DecoderFn = VALUE_DECODERS[data_type]
+    else:
+        DecoderFn = DECODERS.get(data_type)
+    if DecoderFn is not None:
         return DecoderFn(buf, index, index + data_len)
 
     # --- Bytes (bytes, dict, list, unknown etc) ---
-    else:
-        # go would blow up in this case, python just gives us what it can, but we don't want that
-        # all the other decoders complain if the sizing is wrong, so we should behave consistently
-        if index+data_len > len(buf):
-            raise ValueError("buffer truncated - field data is shorter than wanted field size")
-        return buf[index : index + data_len]
+    return decode_bytes(buf, index, data_len, zero_copy)
+
+
+def decode_bytes(buf, index, data_len, zero_copy=False):
+    # go would blow up in this case, python just gives us what it can, but we don't want that
+    # all the other decoders complain if the sizing is wrong, so we should behave consistently
+    if index + data_len > len(buf):
+        raise ValueError("buffer truncated - field data is shorter than wanted field size")
+    value = buf[index : index + data_len]
+    if isinstance(value, memoryview) and not zero_copy:
+        return value.tobytes()  # memoryview slices are only handed out if zero_copy is on
+    return value
 
 
 # inverse of encode_item()
@@ -206,23 +367,58 @@ def encode_key(key):
     raise TypeError("Key type must be None, uint, str or bytes, not %s" % ktype)
 
 
+# Out: the key type bits, and the offset after the key bytes
+
+
+def encode_key_into(buf, offset, key):
+    ktype = type(key)
+    if key is None:
+        return 0x00, offset
+    if ktype in VALID_INT_TYPES:
+        return 0x01, encode_uvarint_into(buf, offset, key)
+    if ktype in VALID_STR_TYPES:
+        keybytes = key.encode("utf8", "replace")
+        offset = encode_uvarint_into(buf, offset, len(keybytes))
+        return 0x02, write_bytes_into(buf, offset, keybytes)
+    if ktype == bytes:
+        offset = encode_uvarint_into(buf, offset, len(key))
+        return 0x03, write_bytes_into(buf, offset, key)
+    raise TypeError("Key type must be None, uint, str or bytes, not %s" % ktype)
+
+
 # Out: the key, and the new index
 
 
 def decode_key(key_type_bits, buf, index):
-    if key_type_bits == 0x00:
-        return None, index
-    if key_type_bits == 0x01:
-        return decode_uvarint(buf, index)  # note returns number, index
-    if key_type_bits == 0x02:
-        klen, index = decode_uvarint(buf, index)
-        key_str_bytes = buf[index : index + klen]
-        return key_str_bytes.decode("utf8"), index + klen
-    if key_type_bits == 0x03:
-        klen, index = decode_uvarint(buf, index)
-        key_bytes = buf[index : index + klen]
-        return key_bytes, index + klen
-    raise TypeError("Invalid key type in control byte %02x" % key_type_bits)
+    if not 0x00 <= key_type_bits <= 0x03:
+        raise TypeError("Invalid key type in control byte %02x" % key_type_bits)
+    return KEY_DECODERS[key_type_bits](buf, index)
+
+
+def decode_no_key(buf, index):
+    return None, index
+
+
+def decode_str_key(buf, index):
+    klen, index = decode_uvarint(buf, index)
+    key_str_bytes = buf[index : index + klen]
+    return utf_8_decode(key_str_bytes, "strict", True)[0], index + klen
+
+
+def decode_bytes_key(buf, index):
+    klen, index = decode_uvarint(buf, index)
+    key_bytes = buf[index : index + klen]
+    if type(key_bytes) is not bytes:  # keys must be hashable, bytearray slices etc aren't
+        key_bytes = key_bytes.tobytes() if isinstance(key_bytes, memoryview) else bytes(key_bytes)
+    return key_bytes, index + klen
+
+
+# Indexed by the control byte key type bits.
+# uvarint returns number, index
+KEY_DECODERS = [decode_no_key, decode_uvarint, decode_str_key, decode_bytes_key]
+
+CONTROL_TABLE = build_control_table()
+VALUE_DECODERS = build_value_decoders()
 
 
 # Policy: data types 15 and up are encoded as a seperate uvarint immediately following the control byte,
@@ -0,0 +1,78 @@
+# User-defined data types - plugging codecs for type numbers 96 to 8191 into pack, unpack, encode_item & co.
+
+from b3.datatypes import DATATYPE_NAMES
+from b3.type_codecs import ENCODERS, DECODERS, ZERO_VALUE_TABLE
+from b3 import guess_type, item
+
+# Method: a registered type goes into the same tables the core types use - ENCODERS, DECODERS, ZERO_VALUE_TABLE,
+#         guess_type's TYPE_DISPATCH, and item's VALUE_DECODERS list (rebuilt in place, as other modules hold it).
+#         So user types take the same fast paths as core ones, and core types pay nothing extra per item.
+# Policy: the codecs have the same signatures as the core ones -
+#         encoder(value) returns bytes, decoder(buf, index, end) returns the value from buf[index:end].
+# Policy: pack() chooses the type by python type (incl. subclasses), the most specific registered class wins.
+#         Core python types (int, str etc) and their base classes (e.g. object) can't be registered, as that would
+#         change what pack() makes for existing data.
+# Policy: a zero value is optional. If given, values equal to it are sent as a zero-value item with no data,
+#         and unpack hands out that same object, so it should be immutable.
+
+USER_TYPE_MIN = 96
+USER_TYPE_MAX = 8191
+NO_ZERO_VALUE = object()
+
+
+def register_type(number, python_type, encoder, decoder, zero_value=NO_ZERO_VALUE, name=None):
+    """Registers a user-defined data type.
+    number      - the b3 data type number, 96 to 8191,
+    python_type - the python class pack() uses this type for (subclasses too),
+    encoder     - fn(value) returning the value's bytes,
+    decoder     - fn(buf, index, end) returning the value decoded from buf[index:end],
+    zero_value  - optional value sent with no data bytes, e.g. the equivalent of 0 or "",
+    name        - type name for error messages, defaults to the python type's name.
+    - registering a number again for the same python type replaces its codecs."""
+    if not USER_TYPE_MIN <= number <= USER_TYPE_MAX:
+        raise ValueError(
+            "user type numbers are %d to %d, not %r" % (USER_TYPE_MIN, USER_TYPE_MAX, number)
+        )
+    if not isinstance(python_type, type):
+        raise TypeError("python_type must be a class, not %r" % (python_type,))
+    if not callable(encoder) or not callable(decoder):
+        raise TypeError("encoder and decoder must be callable")
+    if python_type in guess_type.CORE_TYPES:
+        raise ValueError("%s already has a core b3 type" % python_type.__name__)
+    if any(issubclass(core_type, python_type) for core_type in guess_type.CORE_TYPES):
+        raise ValueError("%s is a base class of a type with a core b3 type" % python_type.__name__)
+    existing = guess_type.USER_TYPES.get(python_type)
+    if existing is not None and existing != number:
+        raise ValueError("%s is already registered as type %d" % (python_type.__name__, existing))
+    if number in DECODERS and existing is None:
+        raise ValueError("type %d is already registered (as %s)" % (number, DATATYPE_NAMES[number]))
+
+    ENCODERS[number] = encoder
+    DECODERS[number] = decoder
+    if zero_value is NO_ZERO_VALUE:
+        ZERO_VALUE_TABLE.pop(number, None)
+    else:
+        ZERO_VALUE_TABLE[number] = zero_value
+    DATATYPE_NAMES[number] = name or python_type.__name__
+    guess_type.USER_TYPES[python_type] = number
+    forget_dispatch(python_type)
+    guess_type.TYPE_DISPATCH[python_type] = guess_type.dispatch_entry(number)
+    item.VALUE_DECODERS[:] = item.build_value_decoders()
+
+
+def unregister_type(number):
+    """Removes a user-defined data type. Its items unpack as bytes again, and pack() no longer knows its class."""
+    for python_type, data_type in list(guess_type.USER_TYPES.items()):
+        if data_type == number:
+            del guess_type.USER_TYPES[python_type]
+            forget_dispatch(python_type)
+    for table in (ENCODERS, DECODERS, ZERO_VALUE_TABLE, DATATYPE_NAMES):
+        table.pop(number, None)
+    item.VALUE_DECODERS[:] = item.build_value_decoders()
+
+
+def forget_dispatch(python_type):
+    """Drops the cached TYPE_DISPATCH entries for python_type and its subclasses, so they get resolved again."""
+    for cls in list(guess_type.TYPE_DISPATCH):
+        if cls not in guess_type.CORE_TYPES and issubclass(cls, python_type):
+            del guess_type.TYPE_DISPATCH[cls]
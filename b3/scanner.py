@@ -0,0 +1,96 @@
+# Header-only structural scanning - item boundaries without decoding any values.
+
+from b3.datatypes import BOOL, LIST, DICT, b3_type_name
+from b3.item import decode_key
+from b3.type_varint import decode_uvarint
+from b3.utils import IntByteAt
+
+# Scan records are plain tuples, for speed:
+# (key, data_type, flags, value_offset, value_len)
+# flags is the has_data (0x08) and null/zero (0x04) bits of the control byte, see item.py.
+# value_offset is where the value's data starts in buf, and value_len is its size (0 if there is no data).
+
+FLAG_HAS_DATA = 0x08
+FLAG_NULL = 0x04  # null when there's no data, bool value for BOOL items that have data.
+
+# Policy: scanning never calls a codec. Keys are decoded (they're needed to find things), values never are.
+# Policy: favouring correctness for splitters & validators, an item that runs past end raises ValueError.
+
+
+def scan(buf, start=0, end=None):
+    """Yields a (key, data_type, flags, value_offset, value_len) record for each item in buf[start:end].
+    buf   - bytes data (or bytearray, mmap, memoryview etc),
+    start - where to start in buf (defaults to 0),
+    end   - where to stop in buf (defaults to len(buf)).
+    - this scans one level only, the items inside lists and dicts are not visited.
+      Call scan() again on a container item's value_offset and value_len to go down a level."""
+    if end is None:
+        end = len(buf)
+    index = start
+
+    while index < end:
+        cbyte, index = IntByteAt(buf, index)  # control byte
+
+        data_type = cbyte >> 4
+        if data_type == 15:  # 'extended' data types 15 and up follow the control byte
+            data_type, index = decode_uvarint(buf, index)
+
+        key_type_bits = cbyte & 0x03
+        if key_type_bits:
+            key, index = decode_key(key_type_bits, buf, index)
+        else:
+            key = None
+
+        flags = cbyte & 0x0C
+        if flags & FLAG_HAS_DATA and data_type != BOOL:
+            data_len, index = decode_uvarint(buf, index)
+            if index + data_len > end:
+                raise ValueError("buffer truncated - item data runs past the end of the buffer")
+        else:
+            data_len = 0
+
+        yield key, data_type, flags, index, data_len
+        index += data_len
+
+
+def index_container(buf, index=0):
+    """Returns a ContainerIndex of the list or dict item whose header starts at index in buf.
+    - raises ValueError if there is no item at index (e.g. buf is empty)."""
+    record = next(scan(buf, index), None)
+    # Note: not StopIteration, which would quietly end a caller's loop or generator
+    if record is None:
+        raise ValueError("no item at index %d, the buffer is %d bytes" % (index, len(buf)))
+    key, data_type, flags, value_offset, value_len = record
+    if data_type not in (DICT, LIST):
+        emsg = "Expecting list or dict, but got %s" % (b3_type_name(data_type))
+        raise TypeError(emsg)
+    return ContainerIndex(buf, value_offset, value_offset + value_len, data_type)
+
+
+class ContainerIndex(object):
+    """A reusable index of the scan records of one container's items.
+    buf, start, end - where the container's items are (i.e. its value),
+    data_type       - LIST or DICT (optional, for information).
+    - records is the list of scan records in order, find() looks items up by key."""
+
+    def __init__(self, buf, start, end, data_type=None):
+        self.data_type = data_type
+        self.records = list(scan(buf, start, end))
+        self._positions = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, position):
+        return self.records[position]
+
+    def positions(self):
+        """Returns a dict of key: position in records. If a key appears more than once the last one wins."""
+        if self._positions is None:
+            self._positions = dict((rec[0], n) for n, rec in enumerate(self.records))
+        return self._positions
+
+    def find(self, key):
+        """Returns the scan record for key, or None if the key isn't there."""
+        position = self.positions().get(key)
+        return None if position is None else self.records[position]
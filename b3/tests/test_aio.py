@@ -0,0 +1,206 @@
+# -*- coding: UTF-8 -*-
+import pytest
+from six import PY2
+
+if PY2:
+    pytest.skip("asyncio needs python 3", allow_module_level=True)
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from b3.datatypes import UTF8
+from b3.item import encode_item_joined
+from b3.type_varint import encode_uvarint
+from b3.composite_dynamic import pack
+from b3.aio import read_message, write_message, B3Protocol
+
+# Note: no async def in here, so the file still parses on python 2 before being skipped.
+
+test_msgs = [
+    {u"a": u"hi", u"b": True, u"c": None, u"d": 0, u"e": [1, 2], 7: b"\xff" * 200},
+    [1, 2.5, u"three", None, {u"x": [b"y" * 1000]}],
+    {},
+]
+test_stream = b"".join(pack(msg) for msg in test_msgs)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def make_reader(loop, data):
+    reader = asyncio.StreamReader(loop=loop)
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def read_all(loop, reader, **kw):
+    out = []
+    while True:
+        try:
+            out.append(loop.run_until_complete(read_message(reader, **kw)))
+        except asyncio.IncompleteReadError as exc:
+            assert exc.partial == b""  # ended cleanly between items
+            return out
+
+
+def test_aio_read_message(loop):
+    assert read_all(loop, make_reader(loop, test_stream)) == test_msgs
+
+
+def test_aio_read_bare_and_keyed_items(loop):
+    buf = encode_item_joined(u"kéy", UTF8, u"v") + encode_item_joined(300, UTF8, u"w")
+    assert read_all(loop, make_reader(loop, buf)) == [u"v", u"w"]
+
+
+def test_aio_read_executor(loop):
+    with ThreadPoolExecutor(1) as executor:
+        out = read_all(
+            loop, make_reader(loop, test_stream), executor_threshold=100, executor=executor
+        )
+    assert out == test_msgs
+
+
+def test_aio_read_truncated(loop):
+    reader = make_reader(loop, test_stream[:50])
+    with pytest.raises(asyncio.IncompleteReadError) as exc:
+        loop.run_until_complete(read_message(reader))
+    assert exc.value.partial != b""
+
+
+def test_aio_read_max_total_bytes(loop):
+    reader = make_reader(loop, pack([b"x" * 5000]))
+    with pytest.raises(ValueError):
+        loop.run_until_complete(read_message(reader, max_total_bytes=1000))
+
+
+class CountingReader(asyncio.StreamReader):
+    def readexactly(self, n):
+        self.reads = getattr(self, "reads", 0) + 1
+        return super(CountingReader, self).readexactly(n)
+
+
+class PlainReader(object):  # no _buffer to peek at, so headers are read a part at a time
+    def __init__(self, reader):
+        self.readexactly = reader.readexactly
+
+
+def test_aio_read_header_from_buffer(loop):
+    reader = CountingReader(loop=loop)
+    reader.feed_data(encode_item_joined(u"key" * 50, UTF8, u"value"))
+    reader.feed_eof()
+    assert loop.run_until_complete(read_message(reader)) == u"value"
+    assert reader.reads == 3  # control byte, rest of the header, value - not a read per header byte
+
+    out = read_all(loop, PlainReader(make_reader(loop, test_stream)))
+    assert out == test_msgs
+
+
+def test_aio_read_max_total_bytes_key(loop):
+    # UTF8 item header with a 2**28 byte string key
+    huge_key = b"\x12" + encode_uvarint(2**28) + b"k" * 2000
+    for reader in (make_reader(loop, huge_key), PlainReader(make_reader(loop, huge_key))):
+        with pytest.raises(ValueError):
+            loop.run_until_complete(read_message(reader, max_total_bytes=10))
+    keyed = encode_item_joined(u"abcdef", UTF8, u"ghijkl")  # key and data together too big
+    with pytest.raises(ValueError):
+        loop.run_until_complete(read_message(make_reader(loop, keyed), max_total_bytes=10))
+    assert (
+        loop.run_until_complete(read_message(make_reader(loop, keyed), max_total_bytes=12))
+        == u"ghijkl"
+    )
+
+
+class FakeWriter(object):
+    def __init__(self, loop):
+        self.loop = loop
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    def drain(self):
+        done = self.loop.create_future()
+        done.set_result(None)
+        return done
+
+
+def test_aio_write_message(loop):
+    writer = FakeWriter(loop)
+    for msg in test_msgs:
+        loop.run_until_complete(write_message(writer, msg))
+    assert writer.data == test_stream
+
+
+class FakeTransport(object):
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        self.closed = True
+
+
+class Collector(B3Protocol):
+    def __init__(self, **kw):
+        super(Collector, self).__init__(**kw)
+        self.received = []
+
+    def message_received(self, obj):
+        self.received.append(obj)
+
+
+@pytest.mark.parametrize("threshold", [None, 100])
+def test_aio_protocol(loop, threshold):
+    asyncio.set_event_loop(loop)
+    proto = Collector(executor_threshold=threshold)
+    proto.connection_made(FakeTransport())
+    for i in range(0, len(test_stream), 7):
+        proto.data_received(test_stream[i : i + 7])
+    loop.run_until_complete(asyncio.sleep(0.05))  # let any executor decodes finish
+    assert proto.received == test_msgs
+    asyncio.set_event_loop(None)
+
+
+def test_aio_protocol_order(loop):
+    asyncio.set_event_loop(loop)
+    big, small = {u"big": b"x" * 5000}, [1]
+    proto = Collector(executor_threshold=1000)
+    proto.connection_made(FakeTransport())
+    proto.data_received(pack(big) + pack(small))  # small is decoded first, but must wait for big
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert proto.received == [big, small]
+    asyncio.set_event_loop(None)
+
+
+def test_aio_protocol_bad_data(loop):
+    proto = Collector()
+    proto.connection_made(FakeTransport())
+    proto.data_received(pack([1]) + b"\x18\x02\xff\xfe")  # bad utf8
+    assert proto.received == [[1]]
+    assert proto.transport.closed
+
+
+def test_aio_protocol_bad_data_while_decoding(loop):
+    asyncio.set_event_loop(loop)
+    proto = Collector(executor_threshold=1000)
+    proto.connection_made(FakeTransport())
+    proto.data_received(pack({u"big": b"x" * 5000}) + b"\x18\x02\xff\xfe")  # big is still decoding
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert proto.received == []  # nothing is delivered after the failure
+    assert proto.transport.closed
+    asyncio.set_event_loop(None)
+
+
+def test_aio_protocol_send(loop):
+    proto = Collector()
+    proto.connection_made(FakeTransport())
+    proto.send_message(test_msgs[0])
+    assert proto.transport.data == pack(test_msgs[0])
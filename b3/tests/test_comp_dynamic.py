@@ -1,8 +1,14 @@
 import datetime, decimal
+from array import array
+
 import pytest
 
 from b3.utils import SBytes
-from b3.composite_dynamic import pack, unpack, unpack_into
+from b3.datatypes import SVARINT, UVARINT, U64, S64, FLOAT64, LIST
+from b3.item import encode_header, encode_item_joined
+from b3.type_varint import encode_uvarint
+from b3 import composite_dynamic
+from b3.composite_dynamic import pack, unpack, unpack_into, pack_into, packed_size
 
 # Policy: small-scale bottom-up-assembly. (See format doc)
 
@@ -136,6 +142,141 @@ def test_dyna_roundtrip_all_guess_types_toplevel_dict():
     assert unpack(pack(DX), 0) == DX
 
 
+def test_dyna_roundtrip_deep_nesting():
+    deep = [b"leaf", {u"k": 1}]
+    for i in range(10):
+        deep = [deep, {i: deep}]
+    assert unpack(pack(deep, rlimit=30), 0) == deep
+
+
+def test_dyna_pack_empty_containers():
+    assert pack([]) == SBytes("d8 00")
+    assert pack({}) == SBytes("e8 00")
+    assert pack([[], {}]) == SBytes("d8 04 d8 00 e8 00")
+    assert pack([[]], with_header=False) == SBytes("d8 00")
+
+
+def test_dyna_pack_rlimit():
+    assert pack([[1]], rlimit=3) == SBytes("d8 05 d8 03 48 01 02")
+    with pytest.raises(ValueError):
+        pack([[1]], rlimit=2)
+
+
+# --- Packing into caller-supplied buffers ---
+
+
+def test_dyna_packed_size():
+    assert packed_size(test1_data) == len(test1_buf)
+    assert packed_size(test1_data, with_header=False) == len(test1_buf) - 2
+
+
+@pytest.mark.parametrize("mode", ["fixed", "compact", "fast"])
+def test_dyna_packed_size_without_packing(mode, monkeypatch):
+    zeros = [None, 0, 0.0, u"", b"", False, 0j, decimal.Decimal(0)]
+    data = {
+        u"types": data_dyna_types + zeros,
+        u"ints": [0, 1, -1, 127, 128, -65, 2**63, 2**64, -(2**70)],
+        b"bkey": {7: u"v" * 200, 2**40: [b"x" * 20000]},  # number keys, 2 and 3 byte data lengths
+        u"k\u00e9y": [[], {}, [[1.5]]],
+    }
+    sizes = [
+        len(pack(data, key, header, mode=mode))
+        for key, header in ((None, True), (u"top", True), (None, False))
+    ]
+    # must be worked out without making the bytes
+    monkeypatch.setattr(composite_dynamic, "pack_chunks", None)
+    assert packed_size(data, mode=mode) == sizes[0]
+    assert packed_size(data, key=u"top", mode=mode) == sizes[1]
+    assert packed_size(data, with_header=False, mode=mode) == sizes[2]
+    with pytest.raises(TypeError):
+        packed_size({1.5: 1})  # bad key type, as for pack()
+    with pytest.raises(ValueError):
+        packed_size([[[1]]], rlimit=2)
+
+
+def test_dyna_pack_into_bytearray():
+    buf = bytearray(b"\xff" * 40)
+    end = pack_into(buf, 3, test1_data)
+    assert end == 3 + len(test1_buf)
+    assert buf[3:end] == test1_buf
+    assert buf[:3] == b"\xff\xff\xff" and buf[end:] == b"\xff" * (40 - end)
+
+
+def test_dyna_pack_into_no_header():
+    buf = bytearray(40)
+    end = pack_into(buf, 0, test1_data, with_header=False)
+    assert bytes(buf[:end]) == test1_buf[2:]
+
+
+def test_dyna_pack_into_memoryview_mmap():
+    import mmap
+
+    mv = memoryview(bytearray(len(test1_buf)))
+    assert pack_into(mv, 0, test1_data) == len(test1_buf)
+    assert mv.tobytes() == test1_buf
+
+    mm = mmap.mmap(-1, 64)
+    end = pack_into(mm, 10, test1_data)
+    assert mm[10:end] == test1_buf
+    mm.close()
+
+
+def test_dyna_pack_into_too_small():
+    buf = bytearray(len(test1_buf) - 1)
+    with pytest.raises(ValueError):
+        pack_into(buf, 0, test1_data)
+    assert buf == bytearray(len(test1_buf) - 1)  # nothing written
+    with pytest.raises(ValueError):
+        pack_into(bytearray(100), -1, test1_data)
+
+
+# --- Zero-copy & non-bytes input buffers ---
+
+
+def test_dyna_unpack_zero_copy():
+    buf = pack(test1_data)
+    out = unpack(buf, 0, zero_copy=True)
+    assert out == test1_data
+    assert isinstance(out[11], memoryview)
+    assert out[11].obj is buf  # a view of the original buffer, not a copy
+
+
+def test_dyna_unpack_zero_copy_sees_buffer_changes():
+    buf = bytearray(pack([b"foo"]))
+    out = unpack(buf, zero_copy=True)
+    buf[-1:] = b"x"
+    assert out[0] == b"fox"
+
+
+def test_dyna_unpack_into_zero_copy():
+    buf = pack(test1_data, with_header=False)
+    out = unpack_into({}, buf, 0, len(buf), zero_copy=True)
+    assert isinstance(out[11], memoryview) and out == test1_data
+
+
+@pytest.mark.parametrize("wrap", [bytearray, memoryview])
+def test_dyna_unpack_buffer_types(wrap):
+    data = {u"k": u"Виагра", b"bk": b"bv", 1: [b"x", 2.5]}
+    out = unpack(wrap(pack(data)))
+    assert out == data
+    assert isinstance(out[b"bk"], bytes if wrap is memoryview else wrap)
+
+
+def test_dyna_unpack_mmap():
+    import mmap
+
+    buf = pack(data_dyna_types)
+    mm = mmap.mmap(-1, len(buf))
+    mm[:] = buf
+    assert unpack(mm) == data_dyna_types
+    out = unpack(mm, zero_copy=True)
+    assert out == data_dyna_types
+    with pytest.raises(BufferError):
+        mm.close()  # can't close while our memoryview slices are alive
+    del out
+    mm.close()
+
+
 # --- Weird cases ---
 
 
@@ -159,3 +300,223 @@ def test_dyna_dict_none_key():
 #     print(hexdump(buf))
 #     print()
 #     print(repr(buf))
+
+
+# --- Type selection modes ---
+
+mode_ints = [0, 1, -1, 300, -300, 2**63 - 1, -(2**63), 2**63, 2**64 - 1, 2**64, -(2**64), 2**100]
+
+
+@pytest.mark.parametrize("mode", ["fixed", "compact", "fast"])
+def test_dyna_pack_modes_roundtrip(mode):
+    data = dict(ints=mode_ints, other=data_dyna_types, nested=[{u"x": 5}])
+    assert unpack(pack(data, mode=mode)) == data
+    assert packed_size(data, mode=mode) == len(pack(data, mode=mode))
+
+
+def test_dyna_pack_mode_types():
+    # control bytes of items with 1-byte values
+    types = lambda buf: [b >> 4 for b in bytearray(buf[2::3])]
+    assert types(pack([5, -5], mode="fixed")) == [SVARINT, SVARINT]
+    assert types(pack([5, -5], mode="compact")) == [UVARINT, SVARINT]
+    assert pack([5], mode="compact") == SBytes("d8 03 38 01 05")
+    assert pack([5], mode="fast") == SBytes("d8 0a 68 08 05 00 00 00 00 00 00 00")
+    assert bytearray(pack([2**63], mode="fast"))[2] >> 4 == U64
+    assert bytearray(pack([2**64], mode="fast"))[2] >> 4 == SVARINT  # too big for 64 bits
+    assert pack([True, 1.5], mode="fast") == pack([True, 1.5])  # only ints are affected
+
+
+def test_dyna_pack_mode_is_per_call():
+    assert pack([5], mode="compact") != pack([5])
+    assert pack([5]) == SBytes("d8 03 48 01 0a")
+
+
+def test_dyna_pack_bad_mode():
+    with pytest.raises(ValueError):
+        pack([1], mode="fastest")
+
+
+# --- Unpack limits & deep nesting ---
+
+
+def nested_lists(depth):  # packed [[[...]]] with depth lists, built directly because pack() recurses
+    buf = SBytes("d8 00")
+    for _ in range(depth - 1):
+        buf = SBytes("d8") + encode_uvarint(len(buf)) + buf
+    return buf
+
+
+def test_dyna_unpack_very_deep_nesting():
+    out = unpack(nested_lists(5000))  # way past the python recursion limit
+    depth = 0
+    while out:
+        out = out[0]
+        depth += 1
+    assert depth == 4999
+
+
+def test_dyna_unpack_max_depth():
+    buf = pack([1, [2, [3]]])
+    assert unpack(buf, max_depth=3) == [1, [2, [3]]]
+    with pytest.raises(ValueError):
+        unpack(buf, max_depth=2)
+    with pytest.raises(ValueError):
+        unpack(pack({u"a": {}}), max_depth=1)  # empty containers count too
+    with pytest.raises(ValueError):
+        unpack(nested_lists(5000), max_depth=100)
+
+
+def test_dyna_unpack_max_items():
+    buf = pack([1, [2, 3], {u"x": 4}])  # 6 items below the top list
+    assert unpack(buf, max_items=6) == [1, [2, 3], {u"x": 4}]
+    with pytest.raises(ValueError):
+        unpack(buf, max_items=5)
+    assert unpack(pack([]), max_items=0) == []
+
+
+def test_dyna_unpack_max_total_bytes():
+    buf = pack([b"x" * 100])
+    assert unpack(buf, max_total_bytes=len(buf)) == [b"x" * 100]
+    with pytest.raises(ValueError):
+        unpack(buf, max_total_bytes=50)
+
+
+def test_dyna_unpack_container_past_parent_end():
+    buf = SBytes("d8 03  d8 05 01")  # inner list says 5 bytes but the outer list only has 1 left
+    with pytest.raises(ValueError):
+        unpack(buf)
+
+
+def test_dyna_unpack_into_limits():
+    buf = pack([1, [2]], with_header=False)
+    assert unpack_into([], buf, 0, len(buf), max_depth=2, max_items=3) == [1, [2]]
+    with pytest.raises(ValueError):
+        unpack_into([], buf, 0, len(buf), max_items=2)
+
+
+# --- Runs of fixed-width values ---
+
+floats = [i * 0.5 + 0.25 for i in range(100)] + [float("inf"), -1e300]
+
+
+def item_by_item(buf):  # unpack with run decoding turned off, for comparison
+    saved = composite_dynamic.MIN_RUN_BYTES
+    composite_dynamic.MIN_RUN_BYTES = 1 << 62
+    try:
+        return unpack(buf)
+    finally:
+        composite_dynamic.MIN_RUN_BYTES = saved
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        floats,
+        [2**63 + i for i in range(40)],  # U64 in fast mode
+        [-(2**40) - i for i in range(40)],  # S64
+        [complex(i, -i) for i in range(1, 40)],
+        floats + [u"tail", None, 3],  # run then other things
+        floats[:20] + [0.0] + floats[20:],  # zero values have no data, but are part of the run
+        [0j] * 5 + [complex(i, 0) for i in range(30)] + [0j],
+        floats[:20] + [None] + floats[20:],  # None ends the run
+        [u"head"] + floats,  # runs only start at the start of a list
+        floats[:15],  # too short to be worth it
+    ],
+)
+def test_dyna_unpack_runs(data):
+    buf = pack(data, mode="fast")
+    assert unpack(buf) == item_by_item(buf) == data
+    assert unpack(pack({u"k": data, u"n": [data]}, mode="fast")) == {u"k": data, u"n": [data]}
+
+
+def test_dyna_unpack_runs_nan():
+    out = unpack(pack([float("nan")] * 20))
+    assert len(out) == 20 and all(v != v for v in out)
+
+
+def test_dyna_unpack_arrays():
+    out = unpack(pack(floats), arrays=True)
+    assert isinstance(out, array) and out.typecode == "d" and out.tolist() == floats
+    ints = unpack(pack({u"u": [2**63, 2**64 - 1], u"s": [-5, 7]}, mode="fast"), arrays=True)
+    assert ints[u"u"].tolist() == [2**63, 2**64 - 1] and ints[u"s"].tolist() == [-5, 7]
+    # any length, if the whole list is one type
+    assert isinstance(unpack(pack([[1.5]]), arrays=True)[0], array)
+
+    mixed = [floats, floats + [u"x"], [], [1.5, None], [1j, 2j]]
+    out = unpack(pack(mixed), arrays=True)
+    assert isinstance(out[0], array)
+    assert [type(v) for v in out[1:]] == [list] * 4  # not all one fixed-width type (or complex)
+    assert out == [array("d", floats)] + mixed[1:]
+
+
+@pytest.mark.parametrize(
+    "data, typecode",
+    [
+        ([0.0] + [1.5] * 30, "d"),
+        ([1.5] * 30 + [0.0], "d"),
+        ([0.0, 1.5], "d"),
+        ([0.0], "d"),
+        ([0.0, 0.0, 2.5, 0.0] * 50 + [0.0] * 100, "d"),  # lots of short stretches
+        ([0, 2**63] * 20, "Q"),
+        ([0, -5, 0, 0] * 20, "q"),
+    ],
+)
+def test_dyna_unpack_arrays_zeros(data, typecode):
+    # zero values have no data, but are still part of the run
+    data_type = {"d": FLOAT64, "Q": U64, "q": S64}[typecode]  # pack() uses varints for small ints
+    items = b"".join(encode_item_joined(None, data_type, v) for v in data)
+    buf = encode_header(None, LIST, True, False, len(items)) + items
+    out = unpack(buf, arrays=True)
+    assert isinstance(out, array) and out.typecode == typecode and out.tolist() == data
+    assert unpack(buf) == item_by_item(buf) == data
+    assert type(unpack(buf)) is list
+
+
+def test_dyna_unpack_arrays_empty_lists():  # an empty list mustn't look at the next item's header
+    for data in ([[], 1.5], [[], 2**63], {u"a": [], u"b": -(2**40)}, [[[]], [], 1j]):
+        out = unpack(pack(data, mode="fast"), arrays=True)
+        first = list(data)[0] if isinstance(data, dict) else 0
+        assert out == data and type(out[first]) is type(data[first])
+    out = unpack(pack([[], floats]), arrays=True)
+    assert out[0] == [] and out[1].tolist() == floats
+    assert unpack(pack([]), arrays=True) == []
+
+
+def test_dyna_unpack_arrays_mixed_decodes_run_once(monkeypatch):
+    calls = []
+    real_unpack_run = composite_dynamic.unpack_run
+
+    def counting_unpack_run(*args):
+        calls.append(args[1])
+        return real_unpack_run(*args)
+
+    monkeypatch.setattr(composite_dynamic, "unpack_run", counting_unpack_run)
+    data = floats + [u"x", [1.5, 2.5]]
+    buf = pack(data)
+    out = unpack(buf, arrays=True)
+    assert type(out) is list and out[:-1] == data[:-1] and out[-1].tolist() == [1.5, 2.5]
+    assert len(calls) == len(set(calls)) == 2  # the top-level run and the nested list, once each
+    assert len(unpack(buf, arrays=True, max_items=len(data) + 2)) == len(data)
+    with pytest.raises(ValueError):
+        unpack(buf, arrays=True, max_items=len(data) + 1)  # the nested list's 2 items count too
+
+
+def test_dyna_unpack_runs_limits():
+    buf = pack(floats)
+    assert unpack(buf, max_items=len(floats)) == floats
+    assert unpack(buf, max_items=len(floats), arrays=True).tolist() == floats
+    for arrays in (False, True):
+        with pytest.raises(ValueError):
+            unpack(buf, max_items=len(floats) - 1, arrays=arrays)
+        with pytest.raises(ValueError):
+            unpack(pack([floats]), max_items=len(floats), arrays=arrays)
+        with pytest.raises(ValueError):
+            unpack(buf, max_total_bytes=len(buf) - 10, arrays=arrays)
+
+
+def test_dyna_unpack_runs_truncated():
+    buf = pack(floats)
+    with pytest.raises(Exception):
+        unpack(buf[:-3])
+    with pytest.raises(Exception):
+        item_by_item(buf[:-3])
@@ -0,0 +1,95 @@
+import datetime, decimal
+import pytest
+
+from b3.utils import SBytes
+from b3.composite_dynamic import pack, unpack
+from b3.composite_lazy import view, LazyDict, LazyList
+
+# --- Shared test data ---
+
+test1_data = {
+    10: 0,
+    11: b"foo",
+    12: [True, False, False, True],
+    13: {9: 8, 7: 6},
+    14: None,
+}
+test1_buf = pack(test1_data)
+
+data_dyna_types = [
+    None,
+    b"foo",
+    u"bar",
+    True,
+    -69,
+    2.318,
+    decimal.Decimal("3.8"),
+    datetime.datetime(2022, 4, 4, 16, 45, 43, 2718),
+    {1: 2},
+    [3, 4],
+    4j,
+]
+
+
+def test_lazy_view_types():
+    assert isinstance(view(test1_buf), LazyDict)
+    assert isinstance(view(pack([1, 2])), LazyList)
+    assert isinstance(view(test1_buf)[12], LazyList)
+    assert isinstance(view(test1_buf)[13], LazyDict)
+
+
+def test_lazy_view_not_container():
+    with pytest.raises(TypeError):
+        view(SBytes("50"))
+
+
+def test_lazy_dict_matches_unpack():
+    v = view(test1_buf)
+    assert v == test1_data
+    assert len(v) == 5
+    assert list(v.keys()) == list(test1_data.keys())
+    assert v[11] == b"foo"
+    assert 13 in v and 99 not in v
+    assert v.get(99, u"nope") == u"nope"
+    with pytest.raises(KeyError):
+        v[99]
+
+
+def test_lazy_list_matches_unpack():
+    v = view(pack(data_dyna_types))
+    assert v == data_dyna_types
+    assert len(v) == len(data_dyna_types)
+    assert v[-1] == 4j
+    assert v[1:3] == [b"foo", u"bar"]
+    assert list(reversed(v)) == list(reversed(data_dyna_types))
+    assert v != data_dyna_types[:-1]
+    with pytest.raises(IndexError):
+        v[len(data_dyna_types)]
+
+
+def test_lazy_only_decodes_what_is_read():
+    data = {u"meta": {u"tenant": u"acme"}, u"body": [b"x" * 1000] * 10}
+    v = view(pack(data))
+    assert v[u"meta"][u"tenant"] == u"acme"
+    assert list(v._values) == [0]  # only meta was decoded
+    assert v[u"body"]._items is None  # and the body list was never even scanned
+
+
+def test_lazy_values_are_cached():
+    v = view(test1_buf)
+    assert v[12] is v[12]
+
+
+def test_lazy_duplicate_keys_last_wins():
+    buf = SBytes("e8 08  49 01 01 02  49 01 01 04")  # dict {1: 1, 1: 2}
+    assert view(buf) == unpack(buf) == {1: 2}
+
+
+def test_lazy_zero_copy():
+    v = view(test1_buf, zero_copy=True)
+    assert isinstance(v[11], memoryview) and v == test1_data
+
+
+def test_lazy_empty():
+    assert view(pack([])) == []
+    assert view(pack({})) == {}
@@ -0,0 +1,74 @@
+import pytest
+
+from b3.utils import SBytes
+from b3.composite_dynamic import pack, unpack
+from b3.composite_path import get, get_many
+
+# --- Shared test data ---
+
+test_msg = {
+    u"meta": {u"tenant": u"acme", u"trace": [7, 8, 9], u"none": None},
+    u"body": [b"x" * 100, {u"deep": {u"er": 1.5}}],
+    3: u"three",
+    b"raw": b"bytes",
+}
+test_buf = pack(test_msg)
+
+
+def test_path_get_nested():
+    assert get(test_buf, (u"meta", u"tenant")) == u"acme"
+    assert get(test_buf, [u"body", 1, u"deep", u"er"]) == 1.5
+    assert get(test_buf, (u"meta", u"trace", 2)) == 9
+    assert get(test_buf, (3,)) == u"three"
+    assert get(test_buf, (b"raw",)) == b"bytes"
+
+
+def test_path_get_containers_are_unpacked():
+    assert get(test_buf, (u"meta",)) == test_msg[u"meta"]
+    assert get(test_buf, ()) == test_msg
+
+
+def test_path_get_none_value_vs_missing():
+    assert get(test_buf, (u"meta", u"none")) is None
+    with pytest.raises(KeyError):
+        get(test_buf, (u"meta", u"nope"))
+    assert get(test_buf, (u"meta", u"nope"), default=u"dflt") == u"dflt"
+    assert get(test_buf, (u"body", 5), default=None) is None
+    assert get(test_buf, (u"meta", u"tenant", u"past_the_end"), default=0) == 0
+
+
+def test_path_get_many():
+    paths = [
+        (u"meta", u"tenant"),
+        (u"body", 1, u"deep", u"er"),
+        (u"nope",),
+        (u"meta", u"trace", 0),
+        (),
+    ]
+    assert get_many(test_buf, paths) == [u"acme", 1.5, None, 7, test_msg]
+
+
+def test_path_get_many_shared_prefix_default():
+    paths = [(u"meta", u"tenant"), (u"meta", u"tenant"), (u"meta", u"missing")]
+    assert get_many(test_buf, paths, default=False) == [u"acme", u"acme", False]
+
+
+def test_path_duplicate_keys_last_wins():
+    buf = SBytes("e8 08  49 01 01 02  49 01 01 04")  # dict {1: 1, 1: 2}
+    assert get(buf, (1,)) == unpack(buf)[1] == 2
+
+
+def test_path_zero_copy_and_offset():
+    buf = b"junk" + test_buf
+    value = get(buf, (u"body", 0), index=4, zero_copy=True)
+    assert isinstance(value, memoryview) and value == b"x" * 100
+
+
+def test_path_empty_buffer():  # ValueError, not a StopIteration that would end the caller's loop
+    for buf, index in ((b"", 0), (test_buf, len(test_buf))):
+        with pytest.raises(ValueError):
+            get(buf, (u"a",), index=index)
+        with pytest.raises(ValueError):
+            get_many(buf, [(u"a",)], index=index)
+        with pytest.raises(ValueError):
+            get(buf, (u"a",), default=None, index=index)
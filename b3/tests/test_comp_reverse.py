@@ -0,0 +1,129 @@
+import datetime, decimal
+import pytest
+
+from b3.utils import SBytes
+from b3.datatypes import *
+from b3.composite_dynamic import pack
+from b3.composite_schema import schema_pack
+from b3.composite_reverse import pack_reverse, schema_pack_reverse, ReverseWriter
+from b3 import composite_schema  # so we can get to strict_mode
+
+# The back-to-front encoders must produce byte-identical output to pack() and schema_pack().
+
+test1_data = {
+    10: 0,
+    11: b"foo",
+    12: [True, False, False, True],
+    13: {9: 8, 7: 6},
+    14: None,
+}
+
+data_dyna_types = [
+    None,
+    b"foo",
+    u"bar",
+    u"",
+    True,
+    -69,
+    0,
+    2.318,
+    decimal.Decimal("3.8"),
+    datetime.datetime(2022, 4, 4, 16, 45, 43, 2718),
+    {1: 2, u"k": b"v", b"b": [], u"Виагра": {}},
+    [3, 4, [5, [6, [7]]]],
+    4j,
+    b"x" * 300,  # multi-byte data length
+    2**100,
+]
+
+
+@pytest.mark.parametrize(
+    "data", [test1_data, data_dyna_types, dict(top=data_dyna_types), [], {}, [[]], {None: 3}]
+)
+def test_reverse_pack_matches_pack(data):
+    assert pack_reverse(data) == pack(data)
+    assert pack_reverse(data, with_header=False) == pack(data, with_header=False)
+    assert pack_reverse(data, key=u"top") == pack(data, key=u"top")
+
+
+@pytest.mark.parametrize("mode", ["compact", "fast"])
+def test_reverse_pack_modes_match_pack(mode):
+    data = [0, 5, -5, 2**63, 2**64, 2**100, {u"x": -(2**63)}]
+    assert pack_reverse(data, mode=mode) == pack(data, mode=mode)
+
+
+@pytest.mark.parametrize("value", [0, 5, u"", u"foo", None, True])
+def test_reverse_pack_bare_values(value):
+    assert pack_reverse(value, with_header=False) == pack(value, with_header=False)
+
+
+def test_reverse_pack_rlimit():
+    with pytest.raises(ValueError):
+        pack_reverse([[1]], rlimit=2)
+
+
+def test_reverse_pack_bad_type():
+    with pytest.raises(TypeError):
+        pack_reverse([object()])
+
+
+ALLTYPES_SCHEMA = (
+    (BYTES, "bytes1", 1),
+    (UTF8, "string1", 2),
+    (BOOL, "bool1", 3),
+    (UVARINT, "uvint1", 4),
+    (SVARINT, "svint1", 5),
+    (U64, "u641", 6),
+    (S64, "s641", 7),
+    (FLOAT64, "float1", 8),
+    (DECIMAL, "deci1", 9),
+    (SCHED, "date1", 10),
+    (COMPLEX, "cplx1", 11),
+    (DICT, "dict1", 12),
+    (555, "ext1", 300),
+)
+
+schema_data = dict(
+    bytes1=b"foo",
+    string1=u"bar",
+    bool1=True,
+    uvint1=456,
+    svint1=-789,
+    u641=2**64 - 1,
+    s641=-123,
+    float1=13.37,
+    deci1=decimal.Decimal("13.37"),
+    date1=datetime.datetime(2022, 4, 4, 16, 45, 43, 2718),
+    cplx1=33j,
+    dict1=b"\x31\x01",
+    ext1=b"\xbe\xef",
+)
+
+
+@pytest.mark.parametrize("data", [schema_data, {}, {1: b"x", "uvint1": 0, 6: 0}])
+def test_reverse_schema_pack_matches_schema_pack(data):
+    assert schema_pack_reverse(ALLTYPES_SCHEMA, data) == schema_pack(ALLTYPES_SCHEMA, data)
+
+
+def test_reverse_schema_pack_errors():
+    composite_schema.strict_mode = False
+    with pytest.raises(TypeError):
+        schema_pack_reverse(ALLTYPES_SCHEMA, [])
+    with pytest.raises(TypeError):
+        schema_pack_reverse(ALLTYPES_SCHEMA, dict(dict1={1: 2}))
+    with pytest.raises(TypeError):
+        schema_pack_reverse(ALLTYPES_SCHEMA, dict(u641=1.5))
+    composite_schema.strict_mode = True
+    with pytest.raises(KeyError):
+        schema_pack_reverse(ALLTYPES_SCHEMA, dict(unwanted=1))
+    composite_schema.strict_mode = False
+
+
+def test_reverse_writer_grows():
+    writer = ReverseWriter(size_hint=2)
+    writer.write(b"world")
+    writer.write_byte(0x20)
+    writer.write(b"hello")
+    writer.write_uvarint(50000)
+    assert writer.getvalue() == SBytes("d0 86 03") + b"hello world"
+    assert len(writer) == 14
@@ -2,7 +2,7 @@ import pytest, copy
 
 from b3.utils import SBytes
 from b3.datatypes import *
-from b3.composite_schema import schema_pack, schema_unpack
+from b3.composite_schema import schema_pack, schema_unpack, schema_pack_into, compile_schema
 from b3 import composite_schema  # so we can get to strict_mode
 
 # Item header & data structure is
@@ -38,6 +38,7 @@ TEST_SCHEMA4 = ((UVARINT, "number1", 1, True), (UTF8, "string1", 2, False), (BOO
 
 # --- Pack/Encoder tests ---
 
+
 def test_schema_pack_nominal_data():  # "Happy path"
     out1_buf = schema_pack(TEST_SCHEMA, test1)
     assert out1_buf == test1_buf
@@ -152,6 +153,7 @@ def test_schema_unpack_nominal_data():  # "Happy path"
     out1_data = schema_unpack(TEST_SCHEMA, test1_buf, 0, len(test1_buf))
     assert out1_data == test1
 
+
 def test_schema_unpack_nominal_data_4fields():  # "Happy path"
     out1_data = schema_unpack(TEST_SCHEMA4, test1_buf, 0, len(test1_buf))
     assert out1_data == test1
@@ -290,6 +292,7 @@ def test_schema_alltypes_roundtrip():
 #         this is favouring interop (with Dynamic, who can't type-set Nones) over correctness.
 #         Call unpack with strict=True to favour correctness and always check, even with nulls.
 
+
 # Strict defaults to false, nulls bypass the strict type-check.
 def test_schema_unpack_type_mismatch_nulls():
     mismatch_buf = SBytes("31 01   85 02   21 03")
@@ -353,3 +356,97 @@ def test_schema_unpack_type_mismatch_nulls_strict():
 # >>> out
 
 # {1: 'outerbytes', 2: -1234, 3: {1: 0, 2: u'', 3: False}}
+
+
+# --- Compiled schemas ---
+
+
+def test_schema_compiled_pack_unpack():
+    csch = compile_schema(TEST_SCHEMA)
+    assert schema_pack(csch, test1) == test1_buf
+    assert schema_unpack(csch, test1_buf) == test1
+
+
+def test_schema_compiled_is_idempotent():
+    csch = compile_schema(TEST_SCHEMA4)
+    assert compile_schema(csch) is csch
+    assert list(csch) == [(UVARINT, "number1", 1), (UTF8, "string1", 2), (BOOL, "bool1", 3)]
+
+
+def test_schema_compiled_lookup_key():
+    csch = compile_schema(TEST_SCHEMA)
+    assert csch.lookup_key(2) == (UTF8, "string1", 2)
+    assert csch.lookup_key("bool1") == (BOOL, "bool1", 3)
+    assert csch.lookup_key(99) == (None, None, None)
+    assert csch.lookup_key("nope") == (None, None, None)
+
+
+def test_schema_compiled_missing_and_number_keys():
+    csch = compile_schema(TEST_SCHEMA)
+    buf = schema_pack(csch, {1: 69, 2: u"foo"})  # bool1 missing -> sent null
+    assert buf == schema_pack(TEST_SCHEMA, {1: 69, 2: u"foo"})
+    assert schema_unpack(csch, buf) == dict(number1=69, string1=u"foo", bool1=None)
+
+
+def test_schema_compiled_unordered_schema():
+    rev_schema = tuple(reversed(TEST_SCHEMA))
+    assert schema_pack(compile_schema(rev_schema), test1) == test1_buf
+
+
+def test_schema_compiled_cache(monkeypatch):  # raw schemas are compiled once, by contents
+    assert compile_schema(TEST_SCHEMA) is compile_schema(tuple(TEST_SCHEMA))
+    as_lists = [list(field_def) for field_def in TEST_SCHEMA]
+    assert compile_schema(as_lists) is compile_schema(TEST_SCHEMA)
+    assert compile_schema(tuple(as_lists)) is compile_schema(TEST_SCHEMA)  # tuple of lists
+    assert schema_pack(tuple(as_lists), test1) == test1_buf
+
+    monkeypatch.setattr(composite_schema, "_compiled", {})
+    monkeypatch.setattr(composite_schema, "COMPILED_CACHE_SIZE", 2)
+    for n in range(5):
+        compile_schema(((UVARINT, "n", n + 1),))
+    assert len(composite_schema._compiled) <= 2
+
+
+# --- Packing into caller-supplied buffers ---
+
+
+def test_schema_pack_into():
+    buf = bytearray(32)
+    end = schema_pack_into(buf, 4, TEST_SCHEMA, test1)
+    assert bytes(buf[4:end]) == test1_buf
+    assert schema_unpack(TEST_SCHEMA, buf, 4, end) == test1
+
+
+def test_schema_pack_into_shared_memory():
+    shared_memory = pytest.importorskip("multiprocessing.shared_memory")
+    shm = shared_memory.SharedMemory(create=True, size=len(test1_buf))
+    try:
+        assert schema_pack_into(shm.buf, 0, compile_schema(TEST_SCHEMA), test1) == len(test1_buf)
+        assert bytes(shm.buf[: len(test1_buf)]) == test1_buf
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_schema_pack_into_too_small():
+    with pytest.raises(ValueError):
+        schema_pack_into(bytearray(len(test1_buf) - 1), 0, TEST_SCHEMA, test1)
+
+
+# --- Zero-copy ---
+
+
+def test_schema_unpack_zero_copy_nesting():
+    inner_buf = schema_pack(TEST_SCHEMA, dict(bool1=False, number1=0, string1=u"foo"))
+    outer_buf = schema_pack(OUTER_SCHEMA, dict(bytes1=b"outerbytes", signed1=-1234, inner1=inner_buf))
+    outer_data = schema_unpack(OUTER_SCHEMA, outer_buf, zero_copy=True)
+    assert isinstance(outer_data["bytes1"], memoryview)
+    assert isinstance(outer_data["inner1"], memoryview)
+    assert outer_data["bytes1"] == b"outerbytes"
+    inner_data = schema_unpack(TEST_SCHEMA, outer_data["inner1"])
+    assert inner_data == dict(bool1=False, number1=0, string1=u"foo")
+
+
+def test_schema_unpack_memoryview_input_copies():
+    out = schema_unpack(OUTER_SCHEMA, memoryview(schema_pack(OUTER_SCHEMA, dict(bytes1=b"xy"))))
+    assert out["bytes1"] == b"xy" and isinstance(out["bytes1"], bytes)
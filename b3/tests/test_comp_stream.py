@@ -0,0 +1,196 @@
+# -*- coding: UTF-8 -*-
+import io, mmap
+
+import pytest
+
+from b3.datatypes import UTF8
+from b3.item import encode_item_joined
+from b3.type_varint import encode_uvarint
+from b3.composite_dynamic import pack
+from b3.composite_stream import Decoder, iter_unpack
+
+# --- Shared test data ---
+
+test_msgs = [
+    {u"a": u"hi", u"b": True, u"c": None, u"d": 0, u"e": [1, 2], 7: b"\xff" * 200},
+    [1, 2.5, u"three", None, {u"x": [b"y" * 1000]}],
+    {},
+    [],
+]
+test_stream = b"".join(pack(msg) for msg in test_msgs)
+
+
+def test_stream_one_chunk():
+    dec = Decoder()
+    dec.feed(test_stream)
+    assert list(dec) == test_msgs
+    assert dec.buffered == 0
+    assert list(dec) == []
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1000])
+def test_stream_chunked(size):
+    dec = Decoder()
+    out = []
+    for i in range(0, len(test_stream), size):
+        dec.feed(test_stream[i : i + size])
+        out.extend(dec)
+    assert out == test_msgs
+    assert dec.buffered == 0
+
+
+def test_stream_bare_items():
+    buf = encode_item_joined(None, UTF8, u"hello") + encode_item_joined(5, UTF8, u"") + pack([3])
+    dec = Decoder()
+    for i in range(len(buf)):
+        dec.feed(buf[i : i + 1])
+    assert list(dec) == [u"hello", u"", [3]]
+
+
+def test_stream_input_types():
+    dec = Decoder()
+    dec.feed(bytearray(test_stream[:10]))
+    dec.feed(memoryview(test_stream)[10:])
+    assert list(dec) == test_msgs
+
+
+def test_stream_needed():
+    buf = pack([b"x" * 300])  # header is control byte + 2-byte data length
+    dec = Decoder()
+    assert dec.needed == 1
+    dec.feed(buf[:2])
+    assert dec.needed == 1  # data length not all in yet
+    dec.feed(buf[2:3])
+    assert dec.needed == len(buf) - 3
+    dec.feed(buf[3:-1])
+    assert dec.needed == 1
+    assert list(dec) == []
+    dec.feed(buf[-1:])
+    assert dec.needed == 0
+    assert list(dec) == [[b"x" * 300]]
+    assert dec.needed == 1
+
+
+def test_stream_str_key_split():
+    buf = encode_item_joined(u"kéy", UTF8, u"v")  # split inside the utf8 key
+    dec = Decoder()
+    dec.feed(buf[:4])
+    assert list(dec) == []
+    dec.feed(buf[4:])
+    assert list(dec) == [u"v"]
+
+
+def test_stream_header_parsed_once():
+    buf = pack([b"x" * 5000])
+    dec = Decoder()
+    dec.feed(buf[:10])
+    assert list(dec) == []
+    end = dec._end
+    dec._find_end = None  # would blow up if called again before the item completes
+    for i in range(10, len(buf), 100):
+        dec.feed(buf[i : i + 100])
+        assert dec._end == end
+        if i + 100 < len(buf):
+            assert list(dec) == []
+    assert next(dec) == [b"x" * 5000]
+
+
+def test_stream_max_total_bytes():
+    buf = pack([b"x" * 5000])
+    dec = Decoder(max_total_bytes=1000)
+    dec.feed(buf[:3])  # just the header is enough to refuse it
+    with pytest.raises(ValueError):
+        list(dec)
+
+
+def test_stream_max_total_bytes_key():  # a huge key length is refused before the key is buffered
+    dec = Decoder(max_total_bytes=10)
+    dec.feed(b"\x12" + encode_uvarint(2**28))  # UTF8 item header with a 2**28 byte string key
+    with pytest.raises(ValueError):
+        dec.needed
+    dec = Decoder(max_total_bytes=10)
+    dec.feed(encode_item_joined(u"abcdef", UTF8, u"ghijkl"))  # key and data together too big
+    with pytest.raises(ValueError):
+        list(dec)
+    dec = Decoder(max_total_bytes=10)
+    dec.feed(pack([u"k" * 5]))
+    assert list(dec) == [[u"k" * 5]]
+
+
+def test_stream_limits():
+    dec = Decoder(max_depth=2)
+    dec.feed(pack([[[1]]]))
+    with pytest.raises(ValueError):
+        list(dec)
+
+    dec = Decoder(max_items=2)
+    dec.feed(pack([1, 2, 3]))
+    with pytest.raises(ValueError):
+        list(dec)
+
+
+# --- iter_unpack ---
+
+big_list = [{u"n": i, u"b": b"x" * (i % 300)} for i in range(500)] + [None, 0, u"", [], {}, True]
+big_buf = pack(big_list)
+
+
+def test_iter_unpack_buffers():
+    for buf in (big_buf, bytearray(big_buf), memoryview(big_buf)):
+        assert list(iter_unpack(buf)) == big_list
+
+
+def test_iter_unpack_index_zero_copy():
+    buf = b"junk" + pack([b"abc", [b"de"]])
+    out = list(iter_unpack(buf, 4, zero_copy=True))
+    assert isinstance(out[0], memoryview) and out[0] == b"abc"
+    assert out[1][0] == b"de"
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 1000, 1 << 20])
+def test_iter_unpack_file(read_size):
+    f = io.BytesIO(big_buf + b"trailing")
+    assert list(iter_unpack(f, read_size=read_size)) == big_list
+
+
+def test_iter_unpack_mmap(tmp_path):
+    path = tmp_path / "big.b3"
+    path.write_bytes(big_buf)
+    with open(str(path), "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            assert list(iter_unpack(mm)) == big_list
+        finally:
+            mm.close()
+        assert list(iter_unpack(f)) == big_list
+
+
+def test_iter_unpack_lazy():
+    items = iter_unpack(io.BytesIO(big_buf), read_size=64)
+    assert next(items) == big_list[0]
+    assert next(items) == big_list[1]
+
+
+def test_iter_unpack_not_list():
+    with pytest.raises(TypeError):
+        iter_unpack(pack({1: 2}))  # checked straight away, before iterating
+    with pytest.raises(TypeError):
+        iter_unpack(io.BytesIO(pack({1: 2})))
+
+
+def test_iter_unpack_truncated():
+    for data in (big_buf[:-5], big_buf[:1]):
+        with pytest.raises((ValueError, IndexError)):
+            list(iter_unpack(data))
+        with pytest.raises(ValueError):
+            list(iter_unpack(io.BytesIO(data), read_size=100))
+
+
+def test_iter_unpack_limits():
+    with pytest.raises(ValueError):
+        list(iter_unpack(big_buf, max_total_bytes=100))
+    with pytest.raises(ValueError):
+        list(iter_unpack(io.BytesIO(big_buf), max_total_bytes=100))
+    assert list(iter_unpack(pack([[1], [[2]]]), max_depth=2)) == [[1], [[2]]]
+    with pytest.raises(ValueError):
+        list(iter_unpack(pack([[1], [[[2]]]]), max_depth=2))
@@ -1,9 +1,12 @@
+import random
 from decimal import Decimal, InvalidOperation
 
 import pytest
 
-from b3.utils import SBytes
+from b3.utils import SBytes, IntByteAt
+from b3.type_varint import decode_uvarint
 from b3.type_decimal import encode_decimal, decode_decimal
+from b3.type_decimal import BIT_EXP_EXT, BIT_EXP_NEGA, BIT_NEGATIVE, EXPONENT_BITS
 
 # Note: these test the decimal CODEC directly, rather than going through Item
 # See type_decimal.py for the Data Format Standard
@@ -123,6 +126,74 @@ def test_decimal_roundtrip_2():
     assert decode_decimal(buf, 0, len(buf)) == Decimal("-0.0000000006789")
 
 
+# --- Parity with the previous string-based codec ---
+
+
+def old_value(num):  # the significand, as encode_decimal used to make it
+    digits = num.as_tuple()[1]
+    return int("".join(map(str, digits))) if digits else 0
+
+
+def old_decode_decimal(buf, index, end):  # the number path of decode_decimal, as it used to be
+    bits, index = IntByteAt(buf, index)
+    if bits & BIT_EXP_EXT:
+        exp, index = decode_uvarint(buf, index)
+    else:
+        exp = bits & EXPONENT_BITS
+    value = 0 if index == end else decode_uvarint(buf, index)[0]
+    dec_str = "%s%de%s%d" % (
+        "-" if bits & BIT_NEGATIVE else "",
+        value,
+        "-" if bits & BIT_EXP_NEGA else "",
+        exp,
+    )
+    return Decimal(dec_str)
+
+
+def parity_numbers():
+    rng = random.Random(1234)
+    nums = ["0", "-0", "0.00", "-0.00", "0e5", "-0e-20", "1", "-1", "100", "1e2", "-1E+2", "13.37"]
+    nums += [
+        "69e49",
+        "-.1234567890123456789",
+        "1" * 60,
+        "-" + "9" * 40 + "e-300",
+        "12345678",
+        "123456789",
+    ]
+    for _ in range(2000):
+        digits = "".join(rng.choice("0123456789") for _ in range(rng.randint(1, 40)))
+        nums.append("%s%se%d" % (rng.choice("-+"), digits, rng.randint(-40, 40)))
+    return [Decimal(num) for num in nums]
+
+
+def test_decimal_encode_parity():
+    for num in parity_numbers():
+        sign, digits, exp = num.as_tuple()
+        buf = encode_decimal(num)
+        bits, index = IntByteAt(buf, 0)
+        if bits & BIT_EXP_EXT:
+            index = decode_uvarint(buf, index)[1]
+        value = decode_uvarint(buf, index)[0] if index < len(buf) else 0
+        assert value == old_value(num)
+
+
+def test_decimal_decode_parity():
+    for num in parity_numbers():
+        buf = encode_decimal(num)
+        new, old = decode_decimal(buf, 0, len(buf)), old_decode_decimal(buf, 0, len(buf))
+        assert new.as_tuple() == old.as_tuple() == num.as_tuple()  # incl. sign of zero & exponent
+        assert encode_decimal(new) == buf
+
+
+def test_decimal_negative_zero():
+    for text in ("-0", "-0.000", "-0e7", "-0e-30"):
+        buf = encode_decimal(Decimal(text))
+        out = decode_decimal(buf, 0, len(buf))
+        assert out.is_signed() and out.is_zero()
+        assert str(out) == str(Decimal(text))
+
+
 # --- decode benchmark experiments ---
 
 # vs:
@@ -0,0 +1,68 @@
+import datetime, decimal
+from collections import OrderedDict
+
+import pytest
+
+from b3.datatypes import *
+from b3.guess_type import guess_type, type_dispatch, TYPE_DISPATCH
+from b3.composite_dynamic import pack, unpack
+from b3.item import encode_item_joined
+
+TEST_GUESSES = (
+    (None, BYTES),
+    (b"foo", BYTES),
+    (u"foo", UTF8),
+    (True, BOOL),
+    (False, BOOL),
+    (0, SVARINT),
+    (-(2**100), SVARINT),
+    (1.5, FLOAT64),
+    (decimal.Decimal("1.5"), DECIMAL),
+    (datetime.datetime(2022, 4, 4, 16, 45), SCHED),
+    (datetime.date(2022, 4, 4), SCHED),
+    (datetime.time(16, 45), SCHED),
+    (1j, COMPLEX),
+    ({}, DICT),
+    ([], LIST),
+)
+
+
+@pytest.mark.parametrize("obj,data_type", TEST_GUESSES)
+def test_guess_type(obj, data_type):
+    assert guess_type(obj) == data_type
+    assert type_dispatch(obj)[0] == data_type
+
+
+class MyInt(int):
+    pass
+
+
+class MyStr(type(u"")):
+    pass
+
+
+def test_guess_type_subclasses_are_cached():
+    assert MyInt not in TYPE_DISPATCH
+    assert guess_type(MyInt(5)) == SVARINT
+    assert TYPE_DISPATCH[MyInt][0] == SVARINT  # resolved once, then looked up
+    assert guess_type(MyStr(u"x")) == UTF8
+    assert guess_type(OrderedDict()) == DICT
+
+
+def test_guess_type_unknown():
+    with pytest.raises(TypeError):
+        guess_type(object())
+    assert object not in TYPE_DISPATCH
+
+
+def test_pack_subclasses_same_as_base_types():
+    assert pack([MyInt(5), MyStr(u"x"), MyInt(0)]) == pack([5, u"x", 0])
+
+
+@pytest.mark.parametrize("obj,data_type", TEST_GUESSES)
+def test_pack_dispatch_same_as_encode_item(obj, data_type):
+    if data_type in (DICT, LIST):
+        return
+    item = encode_item_joined(7, data_type, obj)
+    assert pack({7: obj})[2:] == item  # skip the 2-byte dict header
+    assert unpack(pack([obj])) == [obj]
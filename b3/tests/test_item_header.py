@@ -1,11 +1,15 @@
 # -*- coding: UTF-8 -*-
 
+import pytest
+
 from b3.utils import SBytes
+from b3.datatypes import BOOL, UTF8, U64
 from b3.item import *
 
 # Note: encode_item takes (key, data_type, value)
 # Note: decode_header returns    (key, data_type, has_data, is_null, data_len, index)
 
+
 # --- Kitchen sink ---
 def test_enc_header_all():
     assert encode_item(key=u"foo", data_type=555, value=b"\xbe\xef") == (
@@ -61,6 +65,7 @@ def test_dec_keytype_str_bytes():
 
 # --- Header null & has-data bits ENcoder ---
 
+
 # null, no data
 def test_enc_header_null():
     assert encode_item(None, 0, None) == (SBytes("04"), b"")
@@ -85,6 +90,7 @@ def test_enc_header_datalen():
 
 # Note: decode_header returns    (key, data_type, has_data, is_null, data_len, index)
 
+
 # is_null True
 def test_dec_header_null():
     assert decode_header(SBytes("04"), 0) == (None, 0, False, True, 0, 1)
@@ -116,6 +122,7 @@ def test_dec_header_zeroval_2():
 
 # --- Ext data type numbers ---
 
+
 # Using the None/Null path through encode_item, so we can test just the data_type numbers
 def test_enc_header_exttype():
     assert encode_item(None, 5, None) == (SBytes("54"), b"")
@@ -173,3 +180,32 @@ def test_dec_header_keys():
         14,
     )
     assert decode_header(SBytes("03 03 66 6f 6f"), 0) == (b"foo", 0, False, False, 0, 5)
+
+
+def test_dec_control_table_matches_bit_ops():
+    for cbyte in range(256):
+        data_type, key_decoder, has_data, is_null, has_len, _ = CONTROL_TABLE[cbyte]
+        assert data_type == cbyte >> 4
+        assert key_decoder is KEY_DECODERS[cbyte & 0x03]
+        assert has_data == bool(cbyte & 0x08)
+        assert is_null == bool(cbyte & 0x04)
+        assert has_len == (has_data and data_type != BOOL)
+
+
+def test_dec_header_ext_type_and_bool():
+    assert decode_header(SBytes("f9 10 04 10"), 0) == (4, 16, True, False, 16, 4)  # complex, key 4
+    # bool True has no data len
+    assert decode_header(SBytes("2c"), 0) == (None, BOOL, True, True, 0, 1)
+    assert decode_header(SBytes("24"), 0) == (None, BOOL, False, True, 0, 1)  # bool None
+
+
+def test_dec_value_no_data_values():
+    assert decode_value(U64, False, False, 0, b"", 0) == 0
+    assert decode_value(UTF8, False, True, 0, b"", 0) is None
+    assert decode_value(99, False, False, 0, b"", 0) == b""  # unknown type zero value
+    assert decode_value(99, True, False, 2, SBytes("01 02"), 0) == SBytes("01 02")
+
+
+def test_dec_key_invalid():
+    with pytest.raises(TypeError):
+        decode_key(0x04, b"", 0)
@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+import datetime, decimal
+import pytest
+
+from b3.datatypes import *
+from b3.item import encode_item_joined, encode_item_into, encode_header, encode_header_into
+from b3.type_basic import encode_ints, encode_ints_into
+from b3.type_codecs import ENCODERS, ENCODERS_INTO, ZERO_VALUE_TABLE
+from b3.type_varint import encode_uvarint, encode_uvarint_into, encode_svarint, encode_svarint_into
+from b3.tests.test_core import TEST_UNISTRS, TEST_NUM_VALUES, TEST_DECSCHED_VALUES
+
+# The _into encoders must write exactly the same bytes as the ones that return bytes.
+
+ALL_VALUES = (
+    [(UTF8, s) for s, _ in TEST_UNISTRS]
+    + [(t, v) for _, t, v, _ in TEST_NUM_VALUES + TEST_DECSCHED_VALUES]
+    + [
+        (BOOL, True),
+        (BOOL, False),
+        (BYTES, b"\x01\x02"),
+        (BYTES, bytearray(b"\x03")),
+        (UTF8, None),
+        (UVARINT, 2**200),
+        (SVARINT, -(2**200)),
+        (DECIMAL, decimal.Decimal("-1.5E-40")),
+        (DECIMAL, decimal.Decimal("-Infinity")),
+        (SCHED, datetime.date(2022, 4, 4)),
+        (SCHED, datetime.time(16, 45, 43, 2718)),
+        (555, b"\xbe\xef"),  # unknown type
+    ]
+)
+KEYS = (None, 7, 7777777777, u"foo", u"Виагра", b"bar")
+
+
+def encode_into_new(fn, *args):
+    buf = bytearray(b"\xee" * 100000)
+    end = fn(buf, 3, *args)
+    assert buf[:3] == b"\xee\xee\xee" and buf[end:] == b"\xee" * (len(buf) - end)
+    return bytes(buf[3:end])
+
+
+@pytest.mark.parametrize("data_type,value", ALL_VALUES)
+def test_item_into_same_as_encode_item(data_type, value):
+    for key in KEYS:
+        assert encode_into_new(encode_item_into, key, data_type, value) == encode_item_joined(
+            key, data_type, value
+        )
+
+
+@pytest.mark.parametrize("size", [0, 1, 127, 128, 16383, 16384, 70000])
+def test_item_into_long_values(size):  # the value gets moved up for data lengths of 2+ bytes
+    for value in (b"\x05" * size, u"x" * size):
+        data_type = BYTES if isinstance(value, bytes) else UTF8
+        assert encode_into_new(encode_item_into, u"k", data_type, value) == encode_item_joined(
+            u"k", data_type, value
+        )
+
+
+def test_header_into():
+    for data_type in (BYTES, BOOL, UVARINT, 555):
+        for has_data, is_null, data_len in ((True, False, 0), (True, True, 300), (False, True, 0)):
+            args = (7, data_type, has_data, is_null, data_len)
+            assert encode_into_new(encode_header_into, *args) == encode_header(*args)
+
+
+def test_codecs_into():
+    for data_type, value in ALL_VALUES:
+        if data_type in ENCODERS_INTO and value is not None and value != ZERO_VALUE_TABLE[data_type]:
+            assert encode_into_new(ENCODERS_INTO[data_type], value) == ENCODERS[data_type](value)
+    for num in (0, 1, 127, 128, 16384, 2**64, 3**300):
+        assert encode_into_new(encode_uvarint_into, num) == encode_uvarint(num)
+        assert encode_into_new(encode_svarint_into, -num) == encode_svarint(-num)
+    for data_type, value in ((U64, 2**64 - 1), (S64, -(2**63))):
+        into = lambda buf, offset, value: encode_ints_into(data_type, buf, offset, value)
+        assert encode_into_new(into, value) == encode_ints(data_type, value)
+
+
+def test_into_buffer_types():
+    expected = encode_item_joined(u"k", UTF8, u"hello")
+    buf = bytearray(20)
+    for target in (buf, memoryview(buf)):
+        end = encode_item_into(target, 2, u"k", UTF8, u"hello")
+        assert bytes(buf[2:end]) == expected
+
+
+def test_into_buffer_too_small():
+    item = encode_item_joined(u"k", UVARINT, 123456789)
+    for size in range(len(item)):
+        with pytest.raises(ValueError):
+            encode_item_into(bytearray(size), 0, u"k", UVARINT, 123456789)
+    with pytest.raises(ValueError):
+        encode_item_into(bytearray(200), 0, None, BYTES, b"x" * 199)  # needs a 2-byte data length
+    with pytest.raises(ValueError):
+        encode_uvarint_into(bytearray(2), 0, 2**14)
+    with pytest.raises(ValueError):
+        encode_uvarint_into(bytearray(2), 0, -1)
+    with pytest.raises(TypeError):
+        encode_item_into(bytearray(20), 0, 1.5, BYTES, b"x")  # bad key type
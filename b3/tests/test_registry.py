@@ -0,0 +1,166 @@
+import numbers, struct, uuid
+
+import pytest
+
+from b3.datatypes import b3_type_name
+from b3.guess_type import guess_type
+from b3.item import encode_item_joined, decode_item_type_value, encode_item_into
+from b3.composite_dynamic import pack, unpack, pack_into, packed_size
+from b3.composite_reverse import pack_reverse
+from b3.composite_schema import schema_pack, schema_unpack
+from b3.registry import register_type, unregister_type
+
+# --- User types for testing ---
+
+UUID_TYPE = 100
+MONEY_TYPE = 300  # two-byte extended type number
+
+
+class Money(object):
+    """Fixed-point money, in cents."""
+
+    def __init__(self, cents):
+        self.cents = cents
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and self.cents == other.cents
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.cents)
+
+
+class Dollars(Money):
+    pass
+
+
+def encode_uuid(value):
+    return value.bytes
+
+
+def decode_uuid(buf, index, end):
+    return uuid.UUID(bytes=bytes(buf[index:end]))
+
+
+def encode_money(value):
+    return struct.pack("<q", value.cents)
+
+
+def decode_money(buf, index, end):
+    return Money(struct.unpack("<q", bytes(buf[index:end]))[0])
+
+
+@pytest.fixture
+def user_types():
+    register_type(UUID_TYPE, uuid.UUID, encode_uuid, decode_uuid)
+    register_type(MONEY_TYPE, Money, encode_money, decode_money, zero_value=Money(0))
+    yield
+    unregister_type(UUID_TYPE)
+    unregister_type(MONEY_TYPE)
+
+
+test_uuid = uuid.UUID("12345678-1234-5678-1234-567812345678")
+
+
+def test_registry_item(user_types):
+    buf = encode_item_joined(None, UUID_TYPE, test_uuid)
+    assert buf[:3] == b"\xf8\x64\x10"  # extended type, has data, 16 bytes
+    assert decode_item_type_value(buf) == (UUID_TYPE, test_uuid)
+    assert decode_item_type_value(encode_item_joined(None, MONEY_TYPE, Money(-150))) == (
+        MONEY_TYPE,
+        Money(-150),
+    )
+
+
+def test_registry_zero_and_null(user_types):
+    zero = encode_item_joined(None, MONEY_TYPE, Money(0))
+    assert zero == b"\xf0\xac\x02"  # no data
+    assert decode_item_type_value(zero) == (MONEY_TYPE, Money(0))
+    assert decode_item_type_value(encode_item_joined(None, MONEY_TYPE, None)) == (MONEY_TYPE, None)
+
+
+def test_registry_pack_unpack(user_types):
+    data = {u"id": test_uuid, u"price": Money(1999), u"free": Money(0), u"ids": [test_uuid, None, 5]}
+    buf = pack(data)
+    assert unpack(buf) == data
+    assert pack_reverse(data) == buf
+    out = bytearray(packed_size(data))
+    assert pack_into(out, 0, data) == len(buf) and bytes(out) == buf
+
+
+def test_registry_guess_type(user_types):
+    assert guess_type(test_uuid) == UUID_TYPE
+    assert guess_type(Money(1)) == MONEY_TYPE
+    assert guess_type(Dollars(1)) == MONEY_TYPE  # subclasses too
+    assert unpack(pack([Dollars(5)])) == [Money(5)]
+    assert b3_type_name(MONEY_TYPE) == "Money"
+
+
+class Cents(Dollars):
+    pass
+
+
+def encode_dollars(value):
+    return struct.pack("<q", value.cents // 100)
+
+
+def decode_dollars(buf, index, end):
+    return Dollars(struct.unpack("<q", bytes(buf[index:end]))[0] * 100)
+
+
+# a registered subclass wins over its registered base class
+def test_registry_most_specific(user_types):
+    register_type(301, Dollars, encode_dollars, decode_dollars)
+    try:
+        assert guess_type(Money(1)) == MONEY_TYPE
+        assert guess_type(Dollars(100)) == guess_type(Cents(100)) == 301
+        out = unpack(pack([Cents(500)]))
+        assert out == [Dollars(500)] and type(out[0]) is Dollars
+    finally:
+        unregister_type(301)
+    assert guess_type(Cents(100)) == MONEY_TYPE
+
+
+def test_registry_encode_into(user_types):
+    buf = bytearray(40)
+    end = encode_item_into(buf, 2, 7, UUID_TYPE, test_uuid)
+    assert bytes(buf[2:end]) == encode_item_joined(7, UUID_TYPE, test_uuid)
+
+
+def test_registry_schema(user_types):
+    schema = ((UUID_TYPE, u"id", 1), (MONEY_TYPE, u"price", 2))
+    data = {u"id": test_uuid, u"price": Money(250)}
+    assert schema_unpack(schema, schema_pack(schema, data)) == data
+
+
+def test_registry_unregister():
+    register_type(UUID_TYPE, uuid.UUID, encode_uuid, decode_uuid)
+    buf = pack([test_uuid])
+    unregister_type(UUID_TYPE)
+    assert unpack(buf) == [test_uuid.bytes]  # unknown types come back as bytes
+    with pytest.raises(TypeError):
+        pack([test_uuid])
+
+
+def test_registry_bad_args(user_types):
+    with pytest.raises(ValueError):
+        register_type(95, uuid.UUID, encode_uuid, decode_uuid)  # not a user type number
+    with pytest.raises(ValueError):
+        register_type(8192, uuid.UUID, encode_uuid, decode_uuid)
+    with pytest.raises(ValueError):
+        register_type(200, int, encode_uuid, decode_uuid)  # core python type
+    with pytest.raises(ValueError):
+        register_type(200, object, encode_uuid, decode_uuid)  # base class of core python types
+    with pytest.raises(ValueError):
+        register_type(200, numbers.Number, encode_uuid, decode_uuid)  # abstract base class of int etc
+    with pytest.raises(ValueError):
+        # already registered as another number
+        register_type(200, uuid.UUID, encode_uuid, decode_uuid)
+    with pytest.raises(ValueError):
+        register_type(UUID_TYPE, Money, encode_money, decode_money)  # number taken
+    with pytest.raises(TypeError):
+        register_type(200, test_uuid, encode_uuid, decode_uuid)  # not a class
+    register_type(UUID_TYPE, uuid.UUID, encode_uuid, decode_uuid, name="UUID")  # re-registering is ok
+    assert b3_type_name(UUID_TYPE) == "UUID"
@@ -0,0 +1,102 @@
+import pytest
+
+from b3.utils import SBytes
+from b3.datatypes import LIST, DICT, UTF8, BOOL, SVARINT, BYTES, FLOAT64
+from b3.composite_dynamic import pack, unpack
+from b3.scanner import scan, index_container, ContainerIndex, FLAG_HAS_DATA, FLAG_NULL
+
+# --- Shared test data ---
+
+test_msg = {u"a": u"hi", u"b": True, u"c": None, u"d": 0, u"e": [1, 2], 7: b"\xff" * 200}
+test_buf = pack(test_msg)
+
+
+def test_scan_top_level():
+    recs = list(scan(test_buf))
+    assert len(recs) == 1
+    key, data_type, flags, value_offset, value_len = recs[0]
+    assert (key, data_type, flags) == (None, DICT, FLAG_HAS_DATA)
+    assert value_offset + value_len == len(test_buf)
+
+
+def test_scan_records():
+    _, _, _, start, size = next(scan(test_buf))
+    recs = list(scan(test_buf, start, start + size))
+    assert [r[0] for r in recs] == list(test_msg.keys())
+    by_key = dict((r[0], r) for r in recs)
+
+    key, data_type, flags, offset, dlen = by_key[u"a"]
+    assert (data_type, flags, dlen) == (UTF8, FLAG_HAS_DATA, 2)
+    assert test_buf[offset : offset + dlen] == b"hi"
+
+    assert by_key[u"b"][1:3] == (BOOL, FLAG_HAS_DATA | FLAG_NULL)  # bool True, no data length
+    assert by_key[u"b"][4] == 0
+    assert by_key[u"c"][1:3] == (BYTES, FLAG_NULL)  # None
+    assert by_key[u"d"][1:3] == (SVARINT, 0)  # zero value
+    assert by_key[7][4] == 200  # multi-byte data length
+
+
+def test_scan_nested():
+    _, _, _, start, size = next(scan(test_buf))
+    rec = [r for r in scan(test_buf, start, start + size) if r[0] == u"e"][0]
+    assert rec[1] == LIST
+    inner = list(scan(test_buf, rec[3], rec[3] + rec[4]))
+    assert [(r[0], r[1]) for r in inner] == [(None, SVARINT), (None, SVARINT)]
+
+
+def test_scan_is_lazy_and_never_decodes_values():
+    buf = pack([1.5, b"\x00" * 5, u"x"], with_header=False)
+    gen = scan(buf)
+    assert next(gen)[1] == FLOAT64
+    assert [r[1] for r in gen] == [BYTES, UTF8]
+
+
+def test_scan_memoryview_and_bytearray():
+    expected = list(scan(test_buf))
+    assert list(scan(bytearray(test_buf))) == expected
+    assert list(scan(memoryview(test_buf))) == expected
+
+
+def test_scan_truncated_raises():
+    with pytest.raises(ValueError):
+        list(scan(test_buf[:-1]))
+    with pytest.raises(ValueError):
+        list(scan(test_buf, 0, len(test_buf) - 1))
+
+
+def test_scan_empty():
+    assert list(scan(b"")) == []
+    assert list(scan(test_buf, 5, 5)) == []
+
+
+def test_index_container():
+    idx = index_container(test_buf)
+    assert isinstance(idx, ContainerIndex)
+    assert idx.data_type == DICT
+    assert len(idx) == len(test_msg)
+    assert idx[0][0] == u"a"
+    rec = idx.find(7)
+    assert test_buf[rec[3] : rec[3] + rec[4]] == b"\xff" * 200
+    assert idx.find(u"nope") is None
+
+
+def test_index_container_last_key_wins():
+    buf = SBytes("e8 0a  4a 01 61 01 02  4a 01 61 01 04")  # dict {"a": 1, "a": 2}
+    idx = index_container(buf)
+    assert len(idx) == 2
+    assert idx.positions() == {u"a": 1}
+    assert idx.find(u"a")[3] == len(buf) - 1
+    assert unpack(buf) == {u"a": 2}
+
+
+def test_index_container_not_container():
+    with pytest.raises(TypeError):
+        index_container(SBytes("18 01 78"))  # a bare UTF8 item
+
+
+def test_index_container_empty():  # ValueError, not a StopIteration that would end the caller's loop
+    buf = pack([1])
+    with pytest.raises(ValueError):
+        index_container(b"")
+    with pytest.raises(ValueError):
+        index_container(buf, len(buf))
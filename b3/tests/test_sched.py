@@ -1,10 +1,19 @@
 from collections import namedtuple
 import datetime
 
+import pytest
 from six import PY2
 
 from b3.utils import SBytes
-from b3.type_sched import encode_sched_gen, encode_sched, decode_sched, decode_offset
+from b3.type_varint import encode_uvarint
+from b3.type_sched import (
+    encode_sched_gen,
+    encode_sched,
+    encode_sched_into,
+    decode_sched,
+    decode_offset,
+)
+from b3.type_sched import OFFSET_BYTES, dt_offset_byte
 
 # Note: these test the sched CODEC directly, rather than going through Item
 
@@ -180,6 +189,86 @@ if not PY2:
         buf = encode_sched(dt_in)
         assert decode_sched(buf, 0, len(buf)) == dt_in
 
+    class DstZone(datetime.tzinfo):  # fixed -03:45, always in dst
+        def utcoffset(self, dt):
+            return datetime.timedelta(hours=-3, minutes=-45)
+
+        def dst(self, dt):
+            return datetime.timedelta(hours=1)
+
+    def old_encode_sched(dt, tzname=""):  # encode_sched as it was, via timetuple() & strftime("%z")
+        tms = (
+            dt.timetuple()
+            if hasattr(dt, "timetuple")
+            else TMX(0, 0, 0, dt.hour, dt.minute, dt.second, -1)
+        )
+        is_date, is_time = not isinstance(dt, datetime.time), hasattr(dt, "hour")
+        micro = getattr(dt, "microsecond", 0)
+        return encode_sched_gen(
+            tms, is_date, is_time, dt.strftime("%z"), tzname, 6 if micro else 0, micro
+        )
+
+    def test_enc_dt_offset_parity():
+        zones = [
+            None,
+            DstZone(),
+            datetime.timezone.utc,
+            datetime.timezone(datetime.timedelta(hours=20)),
+        ]
+        zones += [datetime.timezone(datetime.timedelta(minutes=15 * q)) for q in range(-60, 60)]
+        zones += [datetime.timezone(datetime.timedelta(hours=-5, minutes=-30, seconds=-15))]
+        for n, tz in enumerate(zones):
+            dt = datetime.datetime(2020, 1, 16, 13, 37, 20, n * 997, tzinfo=tz)
+            tzname = "Europe/London" if n % 2 else ""
+            for obj in (dt, dt.date(), dt.timetz()):
+                assert encode_sched(obj, tzname) == old_encode_sched(obj, tzname)
+                buf = bytearray(40)
+                end = encode_sched_into(buf, 3, obj, tzname)
+                assert bytes(buf[3:end]) == old_encode_sched(obj, tzname)
+
+    def test_enc_dt_offset_dst():
+        assert encode_sched(datetime.datetime(2020, 1, 16, 13, 37, 20, tzinfo=DstZone()))[
+            -1:
+        ] == SBytes("f3")
+        assert encode_sched(datetime.time(13, 37, 20, tzinfo=DstZone()))[-1:] == SBytes(
+            "b3"
+        )  # no dst for times
+
+    def test_enc_dt_offset_bad():
+        tzx = datetime.timezone(datetime.timedelta(minutes=7))  # Policy: 15-minute granularity
+        with pytest.raises(KeyError):
+            encode_sched(datetime.datetime(2020, 1, 16, tzinfo=tzx))
+
+    def test_enc_dt_offset_memo():
+        tzx = datetime.timezone(datetime.timedelta(hours=9, minutes=30), "memo test")
+        OFFSET_BYTES.pop(tzx, None)
+        encode_sched(datetime.datetime(2020, 1, 16, tzinfo=tzx))
+        assert OFFSET_BYTES[tzx] == 0x29
+        assert dt_offset_byte(datetime.datetime(2021, 7, 1, tzinfo=tzx)) == 0x29
+
+    def test_dec_dt_offset_parity():  # the tzinfo cache gives what strptime used to, for every offset byte
+        for offbyte in range(256):
+            offstr, _, _ = decode_offset(bytearray([offbyte]), 0)
+            for sub in (0, 1, 999999):
+                strval = "2020 1 16 13 37 20 %06d %s" % (sub, offstr)
+                old = datetime.datetime.strptime(strval, "%Y %m %d %H %M %S %f %z")
+                buf = bytearray([0xE2 if sub else 0xE0, 0xC8, 0x1F, 1, 16, 13, 37, 20, offbyte])
+                if sub:
+                    buf += encode_uvarint(sub)
+                new = decode_sched(bytes(buf), 0, len(buf))
+                assert new == old
+                assert new.utcoffset() == old.utcoffset()
+                assert new.tzinfo == old.tzinfo
+
+
+def test_sched_tznames_import():  # reachable from "import b3", and harmless without zoneinfo
+    import b3
+
+    if b3.tznames.zoneinfo is None:
+        with pytest.raises(ImportError):
+            b3.tznames.enable()
+    b3.tznames.disable()
+
 
 ########################################################################################################################
 # NOTES - WIP - HERE BE DRAGONS
@@ -0,0 +1,165 @@
+import copy, datetime, decimal
+import pytest
+
+from b3.utils import SBytes
+from b3.datatypes import *
+from b3.composite_schema import schema_pack, schema_unpack
+from b3.schema_codegen import make_schema_pack, make_schema_unpack
+from b3 import composite_schema  # so we can get to strict_mode
+
+# The generated functions must give exactly the same results as the generic schema_pack/schema_unpack.
+
+TEST_SCHEMA = ((UVARINT, "number1", 1), (UTF8, "string1", 2), (BOOL, "bool1", 3))
+test1 = dict(bool1=True, number1=69, string1=u"foo")
+test1_buf = SBytes("39 01 01 45 19 02 03 66 6f 6f 2D 03")
+
+ALLTYPES_SCHEMA = (
+    (BYTES, "bytes1", 1),
+    (UTF8, "string1", 2),
+    (BOOL, "bool1", 3),
+    (UVARINT, "uvint1", 4),
+    (SVARINT, "svint1", 5),
+    (U64, "u641", 6),
+    (S64, "s641", 7),
+    (FLOAT64, "float1", 8),
+    (DECIMAL, "deci1", 9),
+    (SCHED, "date1", 10),
+    (COMPLEX, "cplx1", 11),
+    (DICT, "dict1", 12),
+    (LIST, "list1", 13),
+    (555, "ext1", 700),
+)
+
+alltypes_data = dict(
+    bytes1=b"foo",
+    string1=u"bar",
+    bool1=True,
+    uvint1=456,
+    svint1=-789,
+    u641=123,
+    s641=-123,
+    float1=13.37,
+    deci1=decimal.Decimal("13.37"),
+    date1=datetime.datetime(2022, 4, 4, 16, 45, 43, 2718),
+    cplx1=33j,
+    dict1=b"\x31\x01",
+    list1=b"",
+    ext1=b"\xbe\xef",
+)
+
+alltypes_zero = dict(
+    bytes1=b"",
+    string1=u"",
+    bool1=False,
+    uvint1=0,
+    svint1=0,
+    u641=0,
+    s641=0,
+    float1=0.0,
+    deci1=decimal.Decimal("0"),
+    date1=datetime.datetime(1, 1, 1),
+    cplx1=0j,
+    dict1=b"",
+    list1=b"",
+    ext1=b"",
+)
+
+
+@pytest.fixture(autouse=True)
+def not_strict():
+    composite_schema.strict_mode = False
+    yield
+    composite_schema.strict_mode = False
+
+
+# --- Pack ---
+
+
+def test_codegen_pack_nominal():
+    assert make_schema_pack(TEST_SCHEMA)(test1) == test1_buf
+
+
+@pytest.mark.parametrize("data", [alltypes_data, alltypes_zero, {}, dict(string1=None, bool1=None)])
+def test_codegen_pack_matches_generic(data):
+    pack_fn = make_schema_pack(ALLTYPES_SCHEMA)
+    assert pack_fn(data) == schema_pack(ALLTYPES_SCHEMA, data)
+
+
+def test_codegen_pack_number_keys_fallback():
+    pack_fn = make_schema_pack(TEST_SCHEMA)
+    assert pack_fn({1: 69, "string1": u"foo", 3: True}) == test1_buf
+
+
+def test_codegen_pack_unwanted_field():
+    pack_fn = make_schema_pack(TEST_SCHEMA)
+    test2 = copy.copy(test1)
+    test2["unwanted_field"] = u"hello"
+    assert pack_fn(test2) == test1_buf
+    composite_schema.strict_mode = True
+    with pytest.raises(KeyError):
+        pack_fn(test2)
+
+
+def test_codegen_pack_errors():
+    pack_fn = make_schema_pack(ALLTYPES_SCHEMA)
+    with pytest.raises(TypeError):
+        pack_fn([])
+    with pytest.raises(TypeError):
+        pack_fn(dict(dict1={1: 2}))
+    with pytest.raises(TypeError):
+        pack_fn(dict(list1=None))  # like schema_pack, explicit None is not bytes
+    with pytest.raises(TypeError):
+        pack_fn(dict(u641=1.5))
+
+
+# --- Unpack ---
+
+
+def test_codegen_unpack_nominal():
+    assert make_schema_unpack(TEST_SCHEMA)(test1_buf) == test1
+
+
+@pytest.mark.parametrize("data", [alltypes_data, alltypes_zero, {}])
+def test_codegen_unpack_matches_generic(data):
+    buf = schema_pack(ALLTYPES_SCHEMA, data)
+    unpack_fn = make_schema_unpack(ALLTYPES_SCHEMA)
+    assert unpack_fn(buf) == schema_unpack(ALLTYPES_SCHEMA, buf)
+    assert unpack_fn(b"xx" + buf, 2, 2 + len(buf)) == schema_unpack(ALLTYPES_SCHEMA, buf)
+
+
+@pytest.mark.parametrize(
+    "buf_hex",
+    [
+        "2D 03 39 01 01 45 19 02 03 66 6f 6f",  # out of order
+        "39 01 01 45 2D 03",  # field missing
+        "39 01 01 45 19 02 03 66 6f 6f 2D 03 59 04 01 01",  # extra field
+        "39 01 01 45 15 02 2D 03",  # null
+        "39 01 01 45 85 02 2D 03",  # null with mismatched type
+        "",
+    ],
+)
+def test_codegen_unpack_fallback(buf_hex):
+    buf = SBytes(buf_hex)
+    assert make_schema_unpack(TEST_SCHEMA)(buf) == schema_unpack(TEST_SCHEMA, buf)
+
+
+def test_codegen_unpack_type_mismatch():
+    with pytest.raises(TypeError):
+        make_schema_unpack(TEST_SCHEMA)(SBytes("31 01 b1 02 21 03"))
+
+
+def test_codegen_duplicate_fields_use_generic():
+    dup_schema = ((UVARINT, "number1", 1), (UTF8, "number1", 2))
+    data = dict(number1=5)
+    assert make_schema_pack(dup_schema)(data) == schema_pack(dup_schema, data)
+    buf = schema_pack(dup_schema, data)
+    assert make_schema_unpack(dup_schema)(buf) == schema_unpack(dup_schema, buf)
+
+
+def test_codegen_unpack_zero_copy():
+    buf = schema_pack(ALLTYPES_SCHEMA, alltypes_data)
+    out = make_schema_unpack(ALLTYPES_SCHEMA)(buf, zero_copy=True)
+    assert out == alltypes_data
+    assert isinstance(out["bytes1"], memoryview) and isinstance(out["dict1"], memoryview)
+    out = make_schema_unpack(ALLTYPES_SCHEMA)(memoryview(buf))
+    assert isinstance(out["bytes1"], bytes)
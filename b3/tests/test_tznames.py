@@ -0,0 +1,134 @@
+import datetime, json, os
+
+import pytest
+
+from b3 import tznames
+from b3.type_sched import encode_sched, decode_sched, encode_tzname
+
+if tznames.zoneinfo is None or not tznames.zoneinfo.available_timezones():
+    pytest.skip("needs zoneinfo and a tz database", allow_module_level=True)
+
+ZoneInfo = tznames.zoneinfo.ZoneInfo
+
+
+@pytest.fixture
+def lookup(tmp_path):
+    cache_path = str(tmp_path / "b3" / "tznames.json")
+    tznames._table = None
+    tznames.enable(cache_path)
+    yield cache_path
+    tznames.disable()
+    tznames._table = None
+
+
+def roundtrip(dt, tzname):
+    buf = encode_sched(dt, tzname)
+    return decode_sched(buf, 0, len(buf))
+
+
+def test_tzname_hash():
+    assert encode_tzname("Europe/London") == tznames.tzname_hash("Europe/London").to_bytes(
+        4, "little"
+    )
+
+
+def test_tzname_decode_with_offset(lookup):
+    london = ZoneInfo("Europe/London")
+    dt_in = datetime.datetime(2021, 7, 1, 12, 30, tzinfo=london)
+    dt_out = roundtrip(dt_in, "Europe/London")
+    assert dt_out.tzinfo is london
+    assert dt_out == dt_in and dt_out.utcoffset() == datetime.timedelta(hours=1)
+
+
+def test_tzname_decode_converts_to_zone(lookup):
+    # the offset pins the instant, the zone is attached by converting to it
+    dt_in = datetime.datetime(
+        2021, 1, 1, 12, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+    )
+    dt_out = roundtrip(dt_in, "Asia/Tokyo")
+    assert dt_out == dt_in
+    assert (dt_out.hour, dt_out.tzinfo) == (19, ZoneInfo("Asia/Tokyo"))
+
+
+def test_tzname_decode_no_offset(lookup):
+    dt_out = roundtrip(datetime.datetime(2021, 7, 1, 12, 30), "Pacific/Auckland")
+    assert dt_out.tzinfo is ZoneInfo("Pacific/Auckland")
+    assert (dt_out.hour, dt_out.minute) == (12, 30)
+
+
+def test_tzname_decode_unknown(lookup):
+    dt_in = datetime.datetime(2021, 7, 1, 12, 30)
+    assert roundtrip(dt_in, "Not/A_Zone") == dt_in
+    assert roundtrip(dt_in, "Not/A_Zone").tzinfo is None
+
+
+def test_tzname_disabled():
+    tznames.disable()
+    dt_out = roundtrip(datetime.datetime(2021, 7, 1, 12, 30), "Europe/London")
+    assert dt_out.tzinfo is None
+
+
+def test_tzname_cache_file(lookup, monkeypatch):
+    with open(lookup) as f:
+        data = json.load(f)
+    assert data["zones"][str(tznames.tzname_hash("Europe/London"))] == "Europe/London"
+
+    def no_build():
+        raise AssertionError("table should come from the cache file")
+
+    monkeypatch.setattr(tznames, "build_table", no_build)
+    tznames._table = None
+    assert tznames.load_table(lookup) == dict((int(k), v) for k, v in data["zones"].items())
+
+
+def test_tzname_cache_stale(lookup):
+    with open(lookup) as f:
+        data = json.load(f)
+    data["source"]["tzdata"] = "stale"
+    data["zones"] = {"1": "Stale/Zone"}
+    with open(lookup, "w") as f:
+        json.dump(data, f)
+    tznames._table = None
+    table = tznames.load_table(lookup)
+    assert 1 not in table and tznames.tzname_hash("Europe/London") in table
+    with open(lookup) as f:
+        assert json.load(f)["source"]["tzdata"] != "stale"  # rewritten
+
+
+# an OS tzdata upgrade makes the cache stale
+def test_tzname_system_tz_version(tmp_path, monkeypatch):
+    zi = tmp_path / "tzdata.zi"
+    zi.write_text(u"# version 2024a\n")
+    assert tznames.system_tz_version(str(tmp_path)) == "2024a"
+    monkeypatch.setattr(tznames.zoneinfo, "TZPATH", (str(tmp_path),))
+    before = tznames.tz_source()
+    zi.write_text(u"# version 2025b\n")
+    assert tznames.tz_source() != before
+    zi.unlink()
+    assert tznames.system_tz_version(str(tmp_path)) == os.stat(str(tmp_path)).st_mtime
+    assert tznames.system_tz_version(str(tmp_path / "missing")) is None
+
+
+def test_tzname_zone_gone(lookup):  # a cached name the tz database no longer has looks up as unknown
+    gone, bad = tznames.tzname_hash("Gone/Zone"), tznames.tzname_hash("../bad")
+    tznames._table.update({gone: "Gone/Zone", bad: "../bad"})
+    assert tznames.lookup_zone(gone) is None and tznames.lookup_zone(bad) is None
+    dt_out = roundtrip(datetime.datetime(2021, 7, 1, 12, 30), "Gone/Zone")
+    assert dt_out == datetime.datetime(2021, 7, 1, 12, 30)
+
+
+def test_tzname_cache_unwritable(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text(u"not a directory")
+    tznames._table = None
+    try:
+        table = tznames.load_table(str(blocker / "tznames.json"))
+        assert tznames.tzname_hash("Europe/London") in table
+    finally:
+        tznames._table = None
+    assert os.listdir(str(tmp_path)) == ["file"]
+
+
+def test_tzname_clash(monkeypatch):
+    monkeypatch.setattr(tznames, "tzname_hash", lambda name: 7)
+    assert tznames.build_table() == {7: None}
@@ -1,3 +1,9 @@
+import random
+
+import pytest
+from six import PY2
+
+from b3 import type_varint
 from b3.utils import SBytes
 from b3.type_varint import *
 
@@ -32,6 +38,123 @@ def test_svarint_dec():
     assert decode_svarint(SBytes("a9 b4 de 75"), 0) == (-123456789, 4)
 
 
+def loop_encode_uvarint(num):  # reference implementation, one 7-bit group at a time
+    out = bytearray()
+    while True:
+        out.append((num & 127) | (128 if num >> 7 else 0))
+        num >>= 7
+        if not num:
+            return bytes(out)
+
+
+def test_uvarint_big_numbers():
+    for bits in (1, 7, 8, 139, 140, 141, 147, 300, 1024, 8191, 70001):
+        for num in (1 << (bits - 1), (1 << bits) - 1, random.getrandbits(bits)):
+            data = encode_uvarint(num)
+            assert data == loop_encode_uvarint(num)
+            assert decode_uvarint(b"\x55" + data + b"\x01", 1) == (num, len(data) + 1)
+
+
+def test_svarint_big_numbers():
+    for num in (1 << 2000, -(1 << 2000), (1 << 999) - 1, -(3**1000)):
+        data = encode_svarint(num)
+        assert decode_svarint(data, 0) == (num, len(data))
+        assert codec_decode_svarint(data, 0, len(data)) == num
+
+
+@pytest.mark.skipif(PY2, reason="bulk codec needs int.to_bytes")
+def test_uvarint_big_bulk_functions():
+    num = 3**5000
+    data = encode_uvarint_bulk(num)
+    assert data == loop_encode_uvarint(num)
+    assert decode_uvarint_bulk(bytearray(data), 0) == (num, len(data))
+    assert decode_uvarint_bulk(memoryview(b"\xff" + data), 1) == (num, len(data) + 1)
+    assert encode_uvarint_bulk(0) == b"\x00"
+
+
+def test_uvarint_big_truncated():
+    data = encode_uvarint(1 << 1000)
+    with pytest.raises(IndexError):
+        decode_uvarint(data[:-1], 0)
+    with pytest.raises(ValueError):
+        codec_decode_uvarint(data + b"\x00", 0, len(data) + 1)
+
+
+def test_uvarint_small_table():
+    for num in (0, 1, 127, 128, 300, 16383, 16384, 16385, 2**21 - 1, 2**21):
+        assert encode_uvarint(num) == loop_encode_uvarint(num)
+    assert all(SMALL_UVARINTS[num] == loop_encode_uvarint(num) for num in range(SMALL_LIMIT))
+    assert encode_svarint(-8192) == loop_encode_uvarint(16383)
+    assert encode_svarint(8192) == loop_encode_uvarint(16384)
+    with pytest.raises(ValueError):
+        encode_uvarint(-1)
+
+
+def test_varint_size():
+    for num in (0, 1, 127, 128, 16383, 16384, 2**21 - 1, 2**21, 2**64, 3**5000):
+        assert uvarint_size(num) == len(encode_uvarint(num))
+        assert svarint_size(num) == len(encode_svarint(num))
+        assert svarint_size(-num) == len(encode_svarint(-num))
+    with pytest.raises(ValueError):
+        uvarint_size(-1)
+
+
+# --- Many at once ---
+
+MANY_U = [0, 1, 127, 128, 300, 16384, 2**40, 2**64 - 1] * 40
+MANY_S = [0, -1, 1, -64, 64, 2**40, -(2**63), 2**63 - 1] * 40
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(type_varint, "numpy", None)
+    return request.param
+
+
+def test_uvarint_many(backend):
+    for nums in (MANY_U, MANY_U[:5], [], list(range(300))):
+        data = encode_uvarint_many(iter(nums))
+        assert data == b"".join(encode_uvarint(i) for i in nums)
+        out, index = decode_uvarint_many(b"\xff\xff" + data + b"\x01", 2, len(nums))
+        assert out.typecode == UINT64_TYPECODE
+        assert list(out) == nums and index == len(data) + 2
+
+
+def test_uvarint_many_one_byte(backend):  # all one-byte varints take the shortcut (pure python)
+    for nums in (list(range(100)), [1, 2, 3], [5] * 8):
+        data = encode_uvarint_many(nums)
+        out, index = decode_uvarint_many(b"\xff" + data, 1, len(nums))
+        assert out.typecode == UINT64_TYPECODE
+        assert list(out) == nums and index == len(data) + 1
+        out, index = decode_svarint_many(data, 0, len(nums))
+        assert list(out) == [(n >> 1) ^ -(n & 1) for n in nums]
+
+
+def test_svarint_many(backend):
+    for nums in (MANY_S, MANY_S[:5], [], list(range(-150, 150))):
+        data = encode_svarint_many(nums)
+        assert data == b"".join(encode_svarint(i) for i in nums)
+        out, index = decode_svarint_many(bytearray(data), 0, len(nums))
+        assert out.typecode == INT64_TYPECODE
+        assert list(out) == nums and index == len(data)
+
+
+def test_varint_many_errors(backend):
+    with pytest.raises(ValueError):
+        encode_uvarint_many([5, -1] * 150)
+    with pytest.raises(OverflowError):  # decoding is for 64-bit numbers
+        decode_uvarint_many(encode_uvarint(2**64) * 300, 0, 300)
+    with pytest.raises(IndexError):
+        decode_uvarint_many(encode_uvarint(300) * 299, 0, 300)
+
+
+def test_varint_many_big_numbers_encode(backend):
+    nums = [2**70, 5] * 150  # too big for numpy, always falls back
+    assert encode_uvarint_many(nums) == b"".join(encode_uvarint(i) for i in nums)
+    assert encode_svarint_many([-n for n in nums]) == b"".join(encode_svarint(-i) for i in nums)
 
 
 # --- Notes for benchmarking ---
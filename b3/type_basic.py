@@ -1,13 +1,15 @@
 # Codecs for basic/simple types
 
 import struct, math
+from codecs import utf_8_decode
 
-from b3.utils import VALID_INT_TYPES, VALID_STR_TYPES
+from b3.utils import VALID_INT_TYPES, VALID_STR_TYPES, check_room, write_bytes_into
 from b3.datatypes import U64, S64, DATATYPE_NAMES
 
 # Method: Encoders assemble lists of byte-buffers, then b"".join() them.
 #         We take advantage of this often for empty/nonexistant fields etc.
 # Method: Decoders always take the whole buffer, and an index, and return an updated index.
+# Method: The _into encoders write into a given writable buffer at an offset, and return the offset after the data.
 
 # Policy: Favouring simplicity over performance by having some type safety checks here.
 #         (There probably should be more)
@@ -22,6 +24,14 @@ def encode_ints(typ, value):
     return struct.pack(INT_FMTS[typ], value)
 
 
+def encode_ints_into(typ, buf, offset, value):
+    if not isinstance(value, VALID_INT_TYPES):
+        raise TypeError("%s only accepts integer values" % DATATYPE_NAMES[typ])
+    check_room(buf, offset, INT_SZS[typ])
+    struct.pack_into(INT_FMTS[typ], buf, offset, value)
+    return offset + INT_SZS[typ]
+
+
 def decode_ints(typ, buf, index, end):
     if end - index != INT_SZS[typ]:
         raise ValueError("%s data size isn't %d bytes" % (DATATYPE_NAMES[typ], INT_SZS[typ]))
@@ -37,8 +47,14 @@ def encode_utf8(value):
     return value.encode("utf8")
 
 
+# Note: python has no encode-into-a-buffer for strings, so this one does make a temporary bytes.
+def encode_utf8_into(buf, offset, value):
+    return write_bytes_into(buf, offset, encode_utf8(value))
+
+
+# Note: utf_8_decode rather than .decode() so memoryview input works too.
 def decode_utf8(buf, index, end):  # handles index==end transparently.
-    return buf[index:end].decode("utf8")
+    return utf_8_decode(buf[index:end], "strict", True)[0]
 
 
 def encode_float64(value):
@@ -47,6 +63,14 @@ def encode_float64(value):
     return struct.pack("<d", value)
 
 
+def encode_float64_into(buf, offset, value):
+    if not isinstance(value, float):
+        raise TypeError("float64 only accepts float values")
+    check_room(buf, offset, 8)
+    struct.pack_into("<d", buf, offset, value)
+    return offset + 8
+
+
 def decode_float64(buf, index, end):
     if end - index != 8:
         raise ValueError("FLOAT64 data size isn't 8 bytes")
@@ -60,6 +84,14 @@ def encode_complex(value):
     return struct.pack("<dd", value.real, value.imag)
 
 
+def encode_complex_into(buf, offset, value):
+    if not isinstance(value, complex):
+        raise TypeError("complex only accepts complex types")
+    check_room(buf, offset, 16)
+    struct.pack_into("<dd", buf, offset, value.real, value.imag)
+    return offset + 16
+
+
 def decode_complex(buf, index, end):
     if end - index != 16:
         raise ValueError("COMPLEX data size isn't 16 bytes")
@@ -10,7 +10,6 @@ from b3 import type_varint
 from b3 import type_decimal
 from b3 import type_sched
 
-
 ENCODERS = {
     UTF8: type_basic.encode_utf8,
     FLOAT64: type_basic.encode_float64,
@@ -31,6 +30,17 @@ DECODERS = {
     SCHED: type_sched.decode_sched,
 }
 
+# Encoders that write into a buffer: fn(buf, offset, value), returning the offset of the end of the written data.
+ENCODERS_INTO = {
+    UTF8: type_basic.encode_utf8_into,
+    FLOAT64: type_basic.encode_float64_into,
+    COMPLEX: type_basic.encode_complex_into,
+    UVARINT: type_varint.encode_uvarint_into,
+    SVARINT: type_varint.encode_svarint_into,
+    DECIMAL: type_decimal.encode_decimal_into,
+    SCHED: type_sched.encode_sched_into,
+}
+
 # Policy: If there's no codec for a type, then it's a yield-as-bytes.
 #         (for e.g. schema-composite, and the actual BYTES type, and unknown types)
 # Policy: NULL is not a specific type, it is a flag in the item header.
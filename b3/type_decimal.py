@@ -4,8 +4,8 @@ import decimal
 
 from six import int2byte
 
-from b3.type_varint import encode_uvarint, decode_uvarint
-from b3.utils import IntByteAt
+from b3.type_varint import encode_uvarint, encode_uvarint_into, decode_uvarint
+from b3.utils import IntByteAt, check_room
 
 ########################################################################################################################
 # Data Format Standard
@@ -38,6 +38,20 @@ EXPONENT_BITS = 0x0F  # Lower 4 bits of control byte
 # https://www.jpl.nasa.gov/edu/news/2016/3/16/how-many-decimals-of-pi-do-we-really-need/
 # @ 15dp, "voyager 1 distance-radius circle circumference error is 1.5 inches"
 
+# Method: the value <-> Decimal conversions are arithmetic, there are no string round-trips.
+#         Encode: short significands are summed up from the digits tuple, long ones come from scaling the number
+#         to an integer. Decode: Decimal(value) scaled by the exponent, then negated if need be.
+# Note: scaleb() rounds to its context's precision, so it is given a context big enough to always be exact.
+# Note: copy_negate() (unlike -x or Decimal(-value)) keeps the sign of zero, so -0 survives the round trip.
+
+SHORT_DIGITS = 8  # up to here the digits loop beats scaleb()
+MAX = 999999999999999999  # decimal.MAX_PREC & MAX_EMAX on 64-bit (py2's decimal doesn't have them)
+EXACT = decimal.Context(
+    prec=getattr(decimal, "MAX_PREC", MAX),
+    Emax=getattr(decimal, "MAX_EMAX", MAX),
+    Emin=getattr(decimal, "MIN_EMIN", -MAX),
+)
+
 
 ########################################################################################################################
 # Encode
@@ -45,9 +59,37 @@ EXPONENT_BITS = 0x0F  # Lower 4 bits of control byte
 
 # Note: we're not supporting compact zero-value mode in the encoder.  CZV is optional for encoders so that's ok.
 
+
 # In:  num - a decimal.Decimal type ONLY
 # Out: bytes
 def encode_decimal(num):
+    bits, ext_exp, value = decimal_parts(num)
+    out = [int2byte(bits)]
+    if ext_exp is not None:
+        # uv b/c exp sign already done & we're trying to be compact
+        out.append(encode_uvarint(ext_exp))
+    if value:  # Note that 0 = no value bytes at all.
+        out.append(encode_uvarint(value))
+    return b"".join(out)
+
+
+# In:  buf - writable buffer, offset - where to write in buf, num - a decimal.Decimal type ONLY
+# Out: offset of the end of the written data
+def encode_decimal_into(buf, offset, num):
+    bits, ext_exp, value = decimal_parts(num)
+    check_room(buf, offset, 1)
+    buf[offset] = bits
+    offset += 1
+    if ext_exp is not None:
+        offset = encode_uvarint_into(buf, offset, ext_exp)
+    if value:
+        offset = encode_uvarint_into(buf, offset, value)
+    return offset
+
+
+# In:  num - a decimal.Decimal type ONLY
+# Out: control byte, exponent if it needs a varint (else None), value (significand) as an int.
+def decimal_parts(num):
     if not isinstance(num, decimal.Decimal):
         raise TypeError("only accepts decimal.Decimal objects")
 
@@ -72,32 +114,34 @@ def encode_decimal(num):
     if special:  # bit 1 (0x10) : [special] 0=qnan 1=snan
         if num.is_snan():
             bits |= BIT_SNAN
-        return int2byte(bits)  # *** Special only, we're done ***
+        return bits, None, 0  # *** Special only, we're done ***
 
     # --- Exponent ---
     exp_abs = abs(exp)
+    ext_exp = None
 
     if exp_abs > 0x0F:  # bit 1 (0x10) : [number] 0=expo bottom-4bits 1=expo varint follows
         bits |= 0x10  # exponent > 15, store it in varint
-        out = [int2byte(bits), encode_uvarint(exp_abs)]
-        # ^^ uv b/c exp sign already done & we're trying to be compact
+        ext_exp = exp_abs
     else:  # exponent =< 15, store it in low nibble
         bits |= exp_abs & 0x0F
-        out = [int2byte(bits)]
 
     # --- Value (significand) ---
-    if digits:
-        value = int("".join(map(str, digits)))  # [screaming intensifies]
-        if value:  # Note that 0 = no value bytes at all.
-            out.append(encode_uvarint(value))
+    if len(digits) <= SHORT_DIGITS:
+        value = 0
+        for digit in digits:
+            value = value * 10 + digit
+    else:
+        value = abs(int(num.scaleb(-exp, EXACT)))
 
-    return b"".join(out)
+    return bits, ext_exp, value
 
 
 ########################################################################################################################
 # Decode
 ########################################################################################################################
 
+
 # In:  bytes buffer, index of our start, index of next thing's start (so index of us + size of us)
 # Out: a decimal.Decimal
 def decode_decimal(buf, index, end):
@@ -128,17 +172,11 @@ def decode_decimal(buf, index, end):
     else:
         value, index = decode_uvarint(buf, index)
 
-    # Note: we cant get -0 through here if we use ints and scaleb, so using strings instead for now.
-
-    dec_str = "%s%de%s%d" % (
-        "-" if bits & BIT_NEGATIVE else "",
-        value,
-        "-" if bits & BIT_EXP_NEGA else "",
-        exp,
-    )
-    # print("Dec str: %r" % dec_str)
-    return decimal.Decimal(dec_str)
-
-
-# decimal.Decimal(-1234).scaleb(-2)  ->  Decimal('-12.34')      # using ints
-# decimal.Decimal('-1234e-2')        ->  Decimal('-12.34')      # using strings
+    if bits & BIT_EXP_NEGA:
+        exp = -exp
+    num = decimal.Decimal(value)
+    if exp:
+        num = num.scaleb(exp, EXACT)
+    if bits & BIT_NEGATIVE:
+        num = num.copy_negate()
+    return num
@@ -1,7 +1,6 @@
 # Codec for SCHED Schedule (datetime) type
 
 import struct, zlib
-from collections import namedtuple
 import datetime
 
 from six import PY2, int2byte
@@ -9,10 +8,12 @@ from six import PY2, int2byte
 from b3.type_varint import (
     encode_uvarint,
     encode_svarint,
+    encode_uvarint_into,
+    encode_svarint_into,
     decode_uvarint,
     decode_svarint,
 )
-from b3.utils import IntByteAt
+from b3.utils import IntByteAt, check_room, write_bytes_into
 
 ########################################################################################################################
 # Data Format Standard
@@ -61,31 +62,110 @@ OFFS_HOUR_BITS = 0x0F
 # In:  python date, time or datetime objects.  Optional tzname.
 # Out: bytes
 
+# Method: encode_sched reads the date/time attributes straight off dt, and works the offset byte out from utcoffset()
+#         arithmetic (no timetuple, strftime or re-parsing). Output is the same as encode_sched_gen gives.
+# Note: offset bytes for datetime.timezone tzinfos are memoized, as their offset never changes. Other tzinfos
+#       (zoneinfo, dateutil, pytz etc) can give a different offset for each dt, so they're worked out every time.
 
-def encode_sched(dt, tzname=""):
-    if isinstance(dt, datetime.time):  # ugh datetime.time doesnt have timetuple!?
-        tms = namedtuple("tms", "tm_hour tm_min tm_sec tm_isdst")(dt.hour, dt.minute, dt.second, -1)
-    else:
-        tms = dt.timetuple()
 
+def encode_sched(dt, tzname=""):
     is_date, is_time = CLS_TO_PROPS[dt.__class__]
+    offbyte = dt_offset_byte(dt)
+    micro = dt.microsecond if is_time else 0
+
+    out = bytearray()
+    out.append(sched_flags(is_date, is_time, offbyte is not None, tzname, 6, micro))
+    if is_date:
+        out += encode_svarint(dt.year)
+        out.append(dt.month)
+        out.append(dt.day)
+    if is_time:
+        out.append(dt.hour)  # note 24hr hour
+        out.append(dt.minute)
+        out.append(dt.second)
+    if offbyte is not None:
+        out.append(offbyte)
+    if tzname:
+        out += encode_tzname(tzname)
+    if micro:
+        out += encode_uvarint(micro)
+    return bytes(out)
 
-    if hasattr(dt, "microsecond") and dt.microsecond:
-        micro = dt.microsecond
-    else:
-        micro = 0
 
-    offset = dt.strftime("%z")  # blank if no tzinfo
+# In:  writable buffer, offset to write at, and the same as encode_sched.
+# Out: offset of the end of the written data
 
-    return encode_sched_gen(
-        tms,
-        is_date,
-        is_time,
-        offset=offset,
-        tzname=tzname,
-        sub_exp=6 if micro else 0,
-        sub=micro,
-    )
+
+def encode_sched_into(buf, index, dt, tzname=""):
+    is_date, is_time = CLS_TO_PROPS[dt.__class__]
+    offbyte = dt_offset_byte(dt)
+    micro = dt.microsecond if is_time else 0
+
+    check_room(buf, index, 1)
+    buf[index] = sched_flags(is_date, is_time, offbyte is not None, tzname, 6, micro)
+    index += 1
+    if is_date:
+        index = encode_svarint_into(buf, index, dt.year)
+        check_room(buf, index, 2)
+        buf[index] = dt.month
+        buf[index + 1] = dt.day
+        index += 2
+    if is_time:
+        check_room(buf, index, 3)
+        buf[index] = dt.hour  # note 24hr hour
+        buf[index + 1] = dt.minute
+        buf[index + 2] = dt.second
+        index += 3
+    if offbyte is not None:
+        check_room(buf, index, 1)
+        buf[index] = offbyte
+        index += 1
+    if tzname:
+        index = write_bytes_into(buf, index, encode_tzname(tzname))
+    if micro:
+        index = encode_uvarint_into(buf, index, micro)
+    return index
+
+
+# In:  python date, time or datetime object.
+# Out: its offset byte, or None if it has no utc offset.
+
+OFFSET_BYTES = {}  # offset byte by tzinfo, for datetime.timezone tzinfos only
+FIXED_TZ_TYPE = None if PY2 else datetime.timezone
+ZERO_DELTA = datetime.timedelta(0)
+
+
+def dt_offset_byte(dt):
+    tz = getattr(dt, "tzinfo", None)  # dates don't have one
+    if tz is None:
+        return None
+    if tz.__class__ is FIXED_TZ_TYPE:
+        offbyte = OFFSET_BYTES.get(tz)
+        if offbyte is None:
+            offbyte = OFFSET_BYTES[tz] = delta_offset_byte(dt.utcoffset(), False)
+        return offbyte
+    # Note: like timetuple()'s tm_isdst, only datetimes look at dst(). times never get the dst flag.
+    dst = dt.__class__ is datetime.datetime and bool(dt.dst())
+    return delta_offset_byte(dt.utcoffset(), dst)
+
+
+def delta_offset_byte(delta, dst=False):
+    """Offset byte for a utcoffset() timedelta. Same as offset_byte() with the offset in "%z" string form."""
+    if delta is None:
+        return None
+    offbyte = 0x00
+    if delta < ZERO_DELTA:
+        offbyte |= OFFS_FLAG_SIGN
+        delta = -delta
+    if dst:
+        offbyte |= OFFS_FLAG_DST
+    seconds = delta.days * 86400 + delta.seconds
+    hours, minutes = seconds // 3600, seconds // 60 % 60
+    if minutes % 15:
+        raise KeyError("%02d" % minutes)  # Policy: 15-minute granularity, same error as offset_byte()
+    offbyte |= OFFS_MINUTE_BITS & (minutes // 15 << 4)
+    offbyte |= OFFS_HOUR_BITS & hours
+    return offbyte
 
 
 # In - mandatory: time-tuple (Y/M/D H:M:S) assumed zero-filled, if date date (bool), if time data (bool),
@@ -95,7 +175,25 @@ def encode_sched(dt, tzname=""):
 
 
 def encode_sched_gen(tm, is_date, is_time, offset="", tzname="", sub_exp=0, sub=0):
-    # --- flags byte ---
+    flags = sched_flags(is_date, is_time, offset, tzname, sub_exp, sub)
+
+    # --- Data bytes ---
+    out = [int2byte(flags)]
+    if is_date:
+        out.extend([encode_svarint(tm.tm_year), int2byte(tm.tm_mon), int2byte(tm.tm_mday)])
+    if is_time:
+        out.extend([int2byte(tm.tm_hour), int2byte(tm.tm_min), int2byte(tm.tm_sec)])  # note 24hr hour
+    if offset:
+        out.append(encode_offset(offset, tm))  # dst on, vs dst off *or not present*.
+    if tzname:
+        out.append(encode_tzname(tzname))
+    if sub_exp and sub:
+        out.append(encode_uvarint(sub))
+
+    return b"".join(out)
+
+
+def sched_flags(is_date, is_time, offset, tzname, sub_exp, sub):
     flags = 0x00
     if is_date:
         flags |= FLAG_DATE
@@ -107,24 +205,44 @@ def encode_sched_gen(tm, is_date, is_time, offset="", tzname="", sub_exp=0, sub=
         flags |= FLAG_TZNM
     if sub:
         flags |= (abs(sub_exp) // 3) & SUBS_BITS
+    return flags
 
-    # --- Data bytes ---
-    out = [int2byte(flags)]
+
+# Same as encode_sched_gen, but writes into buf at index, and returns the index of the end of the written data.
+
+
+def encode_sched_gen_into(buf, index, tm, is_date, is_time, offset="", tzname="", sub_exp=0, sub=0):
+    check_room(buf, index, 1)
+    buf[index] = sched_flags(is_date, is_time, offset, tzname, sub_exp, sub)
+    index += 1
     if is_date:
-        out.extend([encode_svarint(tm.tm_year), int2byte(tm.tm_mon), int2byte(tm.tm_mday)])
+        index = encode_svarint_into(buf, index, tm.tm_year)
+        check_room(buf, index, 2)
+        buf[index] = tm.tm_mon
+        buf[index + 1] = tm.tm_mday
+        index += 2
     if is_time:
-        out.extend([int2byte(tm.tm_hour), int2byte(tm.tm_min), int2byte(tm.tm_sec)])  # note 24hr hour
+        check_room(buf, index, 3)
+        buf[index] = tm.tm_hour  # note 24hr hour
+        buf[index + 1] = tm.tm_min
+        buf[index + 2] = tm.tm_sec
+        index += 3
     if offset:
-        out.append(encode_offset(offset, tm))  # dst on, vs dst off *or not present*.
+        check_room(buf, index, 1)
+        buf[index] = offset_byte(offset, tm)
+        index += 1
     if tzname:
-        out.append(encode_tzname(tzname))
+        index = write_bytes_into(buf, index, encode_tzname(tzname))
     if sub_exp and sub:
-        out.append(encode_uvarint(sub))
-
-    return b"".join(out)
+        index = encode_uvarint_into(buf, index, sub)
+    return index
 
 
 def encode_offset(offset, tm=None):
+    return int2byte(offset_byte(offset, tm))
+
+
+def offset_byte(offset, tm=None):
     offbyte = 0x00
     if offset[0] == "-":
         offbyte |= OFFS_FLAG_SIGN
@@ -134,7 +252,7 @@ def encode_offset(offset, tm=None):
     offbyte |= OFFS_MINUTE_BITS & OFFS_MINUTE_VAL[min_str]
     hour_str = offset[1:3]
     offbyte |= OFFS_HOUR_BITS & int(hour_str)
-    return int2byte(offbyte)
+    return offbyte
 
 
 def encode_tzname(tzname):
@@ -163,6 +281,40 @@ def decode_offset(buf, index):
     return "%s%s%s" % (sign, hour, mins), dst, index
 
 
+# Optional tzname hash -> tzinfo (or None) function for decode_sched. Off by default, see tznames.py to turn it on.
+tzname_lookup = None
+
+
+# In: decoded datetime, tzinfo for its tzname hash (or None if the hash isn't known)
+# Out: the datetime with the zone attached.
+# Policy: if there's an offset, it pins down the instant - the datetime is converted to the zone (astimezone), so
+#         the instant is kept even if the zone's rules have changed since it was encoded. If there's no offset,
+#         the zone is attached to the wall time as-is.
+
+
+def attach_zone(dt, zone):
+    if zone is None:
+        return dt
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=zone)
+    return dt.astimezone(zone)
+
+
+# In: offset byte
+# Out: the fixed-offset tzinfo for it (py3 only). Policy: the dst flag is not used, see Unfinished Things below.
+
+
+def offset_tzinfo(offbyte):
+    minutes = (offbyte & OFFS_HOUR_BITS) * 60 + ((offbyte & OFFS_MINUTE_BITS) >> 4) * 15
+    if offbyte & OFFS_FLAG_SIGN:
+        minutes = -minutes
+    return datetime.timezone(datetime.timedelta(minutes=minutes))
+
+
+# Note: there are only 256 offset bytes, so their tzinfos are made up front, and decode just indexes this.
+OFFSET_TZINFOS = None if PY2 else [offset_tzinfo(offbyte) for offbyte in range(256)]
+
+
 def decode_sched(buf, index, end):
     if index == end:  # Note: deprecated, this should now be handled by zero_value_table
         return datetime.datetime(1, 1, 1)
@@ -170,7 +322,7 @@ def decode_sched(buf, index, end):
     year = month = day = hour = minute = second = sub = 0
     dt = None
     tzname_hash = None
-    offstr = ""
+    tzinfo = None
 
     flags, index = IntByteAt(buf, index)
 
@@ -183,28 +335,20 @@ def decode_sched(buf, index, end):
         minute, index = IntByteAt(buf, index)
         second, index = IntByteAt(buf, index)
     if flags & FLAG_OFFS:
-        offstr, dst_on, index = decode_offset(buf, index)
+        offbyte, index = IntByteAt(buf, index)
+        if not PY2:  # Note: py2 has no builtin concrete tzinfo class, so its datetimes stay naive
+            tzinfo = OFFSET_TZINFOS[offbyte]
     if flags & FLAG_TZNM:
-        tzname_hash = struct.unpack("<L", buf[index : index + 4])  # todo: incomplete
+        tzname_hash = struct.unpack("<L", buf[index : index + 4])[0]
         index += 4
     sub_exp = (flags & SUBS_BITS) * 3
     if sub_exp:
         sub, index = decode_uvarint(buf, index)
 
     if flags & FLAG_DATE and flags & FLAG_TIME:
-        # Note: exploiting strptime %z format in py3 to parse offset & create a tzinfo'ed datetime
-        if not PY2 and (flags & FLAG_OFFS) and offstr:
-            strval = "%s %s %s %s %s %s" % (year, month, day, hour, minute, second)
-            fmt = "%Y %m %d %H %M %S"
-            if sub:
-                strval += " %06d" % sub
-                fmt += " %f"
-            fmt += " %z"
-            strval += " " + offstr
-            dt = datetime.datetime.strptime(strval, fmt)
-        # Note: no offset and/or python2
-        else:
-            dt = datetime.datetime(year, month, day, hour, minute, second, sub)
+        dt = datetime.datetime(year, month, day, hour, minute, second, sub, tzinfo)
+        if tzname_hash is not None and tzname_lookup is not None:
+            dt = attach_zone(dt, tzname_lookup(tzname_hash))
     elif flags & FLAG_DATE:
         dt = datetime.date(year, month, day)
     elif flags & FLAG_TIME:
@@ -226,8 +370,8 @@ def decode_sched(buf, index, end):
 
 # --- Unfinished Things ---
 # 1) any use of the dst_on flag during decode. We assume the offset is inclusive of dst at all times.
-# 2) using the tzname and tzname_hash on encode and decode. (See below)
-# 3) standardizing the sign of the offset. Currently it's just whatever strptime %z does.
+# 2) using the tzname and tzname_hash on encode and decode. (See below) Decode can now attach a zone, see tznames.py
+# 3) standardizing the sign of the offset. Currently it's the same as strptime %z (which decode used to use).
 
 # Policy: being able to construct a datetime utilizing the tzname_hash here is currently (2020-june) dependent on 3rd party libs (pytz, dateutil)
 # Policy: and our policy is "no external 3rd party deps" so we can't finish this right now.
@@ -7,14 +7,30 @@
 
 # Note: This (followed by item_header) will be the first things to C-ify as they dominate the pyinstrument/cProfile results.
 
-from six import indexbytes, int2byte
+import re
+from array import array
+
+from six import PY2, indexbytes, int2byte
+
+from b3.utils import check_room, write_bytes_into
+
+# Method: big numbers (e.g. DECIMAL significands, crypto-sized SVARINTs) use a bulk algorithm instead of the
+#         7-bits-at-a-time loops, which are quadratic-ish for big python ints. The 7-bit groups are spread out to
+#         one per byte (or gathered back up) with a few whole-number mask-and-shift steps, each of which halves
+#         (or doubles) the group block size, so it is log2(number of bytes) big-int operations done in C.
+#         The continuation bits are then set (or cleared) with bytes.translate, and int.to_bytes/from_bytes
+#         does the conversion. See spread_groups() and gather_groups().
+# Policy: the loops are kept for small numbers (they're faster there) and for py2, which lacks to_bytes.
 
 # --- Encoders ---
 
+
 # API level - unsigned (guard against negatives)
 def encode_uvarint(num):
     if num < 0:
         raise ValueError("encode_uvarint called with negative number")
+    if num < SMALL_LIMIT:
+        return SMALL_UVARINTS[num]
     return encode_uvarint_actual(num)
 
 
@@ -31,6 +47,10 @@ def encode_svarint(num):
 
 # Actual worker
 def encode_uvarint_actual(num):  # actual worker (also called by encode_svarint)
+    if num < SMALL_LIMIT:
+        return SMALL_UVARINTS[num]
+    if num > BULK_MIN_NUM:
+        return encode_uvarint_bulk(num)
     _next = 1
     values = []
     while _next:
@@ -43,12 +63,74 @@ def encode_uvarint_actual(num):  # actual worker (also called by encode_svarint)
     return b"".join(values)
 
 
+# --- Small numbers ---
+# Method: most varints are lengths, key numbers and small counts, so everything that fits in 1 or 2 bytes is
+#         served from a precomputed table of bytes objects. (about 0.5MB, built on import)
+SMALL_LIMIT = 1 << 14
+SMALL_UVARINTS = [int2byte(i) for i in range(128)] + [
+    int2byte((i & 127) | 128) + int2byte(i >> 7) for i in range(128, SMALL_LIMIT)
+]
+
+
+# --- Sizing ---
+# For sizing passes (e.g. working out buffer sizes before writing). These don't allocate anything.
+def uvarint_size(num):
+    """Returns the size in bytes of the uvarint encoding of num."""
+    if num < 0:
+        raise ValueError("uvarint_size called with negative number")
+    if num < 128:
+        return 1
+    if num < SMALL_LIMIT:
+        return 2
+    return (num.bit_length() + 6) // 7
+
+
+def svarint_size(num):
+    """Returns the size in bytes of the svarint encoding of num."""
+    num = num << 1
+    if num < 0:
+        num = -1 ^ num
+    return uvarint_size(num)
+
+
+# --- Into-buffer Encoders ---
+# These write the encoding into the writable buffer buf (bytearray, mmap, memoryview etc) at offset,
+# and return the offset of the end of it. They raise ValueError if buf is too small.
+def encode_uvarint_into(buf, offset, num):
+    if 0 <= num < 128 and 0 <= offset < len(buf):  # fast path for the most common case
+        buf[offset] = num
+        return offset + 1
+    size = uvarint_size(num)  # also guards against negatives
+    check_room(buf, offset, size)
+    if size == 2:
+        buf[offset : offset + 2] = SMALL_UVARINTS[num]
+        return offset + 2
+    if num > BULK_MIN_NUM:
+        return write_bytes_into(buf, offset, encode_uvarint_bulk(num))
+    end = offset + size - 1
+    while offset < end:
+        buf[offset] = (num & 127) | 128
+        num >>= 7
+        offset += 1
+    buf[offset] = num
+    return offset + 1
+
+
+def encode_svarint_into(buf, offset, num):
+    num = num << 1
+    if num < 0:
+        num = -1 ^ num
+    return encode_uvarint_into(buf, offset, num)
+
+
 # --- Internal-use Decoders ---
 def decode_uvarint(data, index):
     item = 128
     num = 0
     left = 0
     while item & 128:
+        if left == BULK_MIN_BITS:  # this one's a big one, do the rest in bulk
+            return decode_uvarint_bulk(data, index - BULK_MIN_BYTES)
         item = indexbytes(data, index)
         index += 1
         value = (item & 127) << left
@@ -80,5 +162,212 @@ def codec_decode_svarint(data, index, end):
     return val
 
 
+# --- Bulk codec for big numbers ---
+
+BULK_MIN_BYTES = 20  # varints this long or longer use the bulk codec (see benchmarks/bench_varint.py)
+BULK_MIN_BITS = BULK_MIN_BYTES * 7
+BULK_MIN_NUM = (1 << BULK_MIN_BITS) - 1
+if PY2:  # no int.to_bytes/from_bytes, always loop
+    BULK_MIN_BITS = -1
+    BULK_MIN_NUM = float("inf")
+
+_SET_HIGH_BITS = bytes(bytearray(i | 0x80 for i in range(256)))
+_CLEAR_HIGH_BITS = bytes(bytearray(i & 0x7F for i in range(256)))
+# the last byte of a varint is the first without its high bit set
+_VARINT_END = re.compile(b"[\x00-\x7f]")
+_mask_cache = {}
+
+
+def encode_uvarint_bulk(num):
+    num_groups = max(1, -(-num.bit_length() // 7))
+    data = spread_groups(num, num_groups).to_bytes(num_groups, "little")
+    return data[:-1].translate(_SET_HIGH_BITS) + data[-1:]
+
+
+def decode_uvarint_bulk(data, index):
+    end = _VARINT_END.search(data, index)
+    if end is None:
+        raise IndexError("varint runs past the end of the buffer")
+    end = end.end()
+    data = bytes(data[index:end]).translate(_CLEAR_HIGH_BITS)
+    return gather_groups(int.from_bytes(data, "little"), end - index), end
+
+
+def spread_groups(num, num_groups):
+    """Spreads num's 7-bit groups out to one per 8-bit lane. num_groups is at least num's number of 7-bit groups."""
+    # blocks of 7-bit groups, starting with one block of all of them
+    size = 1 << (num_groups - 1).bit_length()
+    while size > 1:
+        half = size >> 1
+        low_mask, high_mask = group_masks(size, num_groups)
+        # move the top half of each block up 1 bit/group
+        num = (num & low_mask) | ((num & high_mask) << half)
+        size = half
+    return num
+
+
+def gather_groups(num, num_groups):
+    """The inverse of spread_groups, gathers num's 8-bit lanes' 7-bit groups back up together."""
+    size = 1
+    while size < num_groups:
+        low_mask, high_mask = group_masks(size << 1, num_groups)
+        # move each odd block down 1 bit/group
+        num = (num & low_mask) | ((num & (high_mask << size)) >> size)
+        size <<= 1
+    return num
+
+
+def group_masks(size, num_groups):
+    """Masks of the low and high halves of each block of size 7-bit groups, blocks spaced size bytes apart.
+    Masks are made (and cached) big enough for num_groups rounded up to a power of two."""
+    total = 1 << (num_groups - 1).bit_length()
+    masks = _mask_cache.get((size, total))
+    if masks is None:
+        half_bits = 7 * (size >> 1)
+        stride = 8 * size
+        blocks = total // size
+        # a 1 at the start of each block
+        every_block = ((1 << (stride * blocks)) - 1) // ((1 << stride) - 1)
+        low_mask = ((1 << half_bits) - 1) * every_block
+        masks = _mask_cache[(size, total)] = (low_mask, low_mask << half_bits)
+    return masks
+
+
+# --- Many at once ---
+# Method: encode_*_many join the (mostly table-served) varints of a whole sequence in one go, and decode_*_many
+#         return a run of count varints as an array.array of 64-bit ints, with a fast path for runs that are
+#         all one-byte varints. If numpy is importable, long runs are done by vectorized numpy code instead.
+# Policy: numpy is optional and never required, the pure-python code gives identical results.
+# Policy: the many-functions are for 64-bit values (that's what array.array and numpy can hold). Values that
+#         don't fit raise OverflowError, use the one-at-a-time functions for those.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NUMPY_MIN_COUNT = 256  # below this many values, numpy's overheads outweigh its gains
+
+try:
+    array("Q")
+    UINT64_TYPECODE, INT64_TYPECODE = "Q", "q"
+except ValueError:  # py2 doesn't have Q/q, L/l are 64-bit on 64-bit unixes
+    UINT64_TYPECODE, INT64_TYPECODE = "L", "l"
+
+
+def encode_uvarint_many(nums):
+    """Returns the uvarint encodings of all the numbers in the iterable nums, joined together."""
+    nums = nums if isinstance(nums, (list, tuple, array)) else list(nums)
+    if nums and min(nums) < 0:
+        raise ValueError("encode_uvarint called with negative number")
+    if numpy is not None and len(nums) >= NUMPY_MIN_COUNT:
+        try:
+            return numpy_encode_uvarints(numpy.array(nums, dtype=numpy.uint64))
+        except OverflowError:  # bigger than 64 bits, do it the slow way
+            pass
+    return join_uvarints(nums)
+
+
+def encode_svarint_many(nums):
+    """Returns the svarint encodings of all the numbers in the iterable nums, joined together."""
+    nums = nums if isinstance(nums, (list, tuple, array)) else list(nums)
+    if numpy is not None and len(nums) >= NUMPY_MIN_COUNT:
+        try:
+            signed = numpy.array(nums, dtype=numpy.int64)
+        except OverflowError:  # bigger than 64 bits, do it the slow way
+            pass
+        else:
+            zigzag = (signed << 1) ^ (signed >> 63)
+            return numpy_encode_uvarints(zigzag.view(numpy.uint64))
+    return join_uvarints([(num << 1) ^ -(num < 0) for num in nums])  # zigzag, see encode_svarint
+
+
+def join_uvarints(nums):
+    small, table = SMALL_LIMIT, SMALL_UVARINTS
+    return b"".join([table[num] if num < small else encode_uvarint_actual(num) for num in nums])
+
+
+def decode_uvarint_many(data, index, count):
+    """Decodes count uvarints from data starting at index.
+    Returns an array.array of the numbers (typecode Q), and the index after the last varint."""
+    if count <= 0:
+        return array(UINT64_TYPECODE), index
+    if numpy is not None and count >= NUMPY_MIN_COUNT:
+        values, index = numpy_decode_uvarints(data, index, count)
+        out = array(UINT64_TYPECODE)
+        out.frombytes(values.tobytes())
+        return out, index
+    nums, index = decode_uvarint_list(data, index, count)
+    return array(UINT64_TYPECODE, nums), index
+
+
+def decode_svarint_many(data, index, count):
+    """Decodes count svarints from data starting at index.
+    Returns an array.array of the numbers (typecode q), and the index after the last varint."""
+    if count <= 0:
+        return array(INT64_TYPECODE), index
+    if numpy is not None and count >= NUMPY_MIN_COUNT:
+        values, index = numpy_decode_uvarints(data, index, count)
+        half = (values >> numpy.uint64(1)).view(numpy.int64)
+        sign = (values & numpy.uint64(1)).view(numpy.int64)
+        out = array(INT64_TYPECODE)
+        out.frombytes((half ^ -sign).tobytes())
+        return out, index
+    nums, index = decode_uvarint_list(data, index, count)
+    return array(INT64_TYPECODE, [(num >> 1) ^ -(num & 1) for num in nums]), index  # un-zigzag
+
+
+def decode_uvarint_list(data, index, count):
+    run = bytearray(data[index : index + count])
+    if len(run) == count and max(run) < 128:  # all one-byte varints
+        return list(run), index + count
+    nums = []
+    append = nums.append
+    for _ in range(count):
+        item = indexbytes(data, index)
+        if item < 128:
+            append(item)
+            index += 1
+        else:
+            num, index = decode_uvarint(data, index)
+            append(num)
+    return nums, index
+
+
+# --- Numpy backend ---
+
+
+def numpy_encode_uvarints(values):
+    """Returns the uvarint encodings of a numpy uint64 array of numbers, joined together."""
+    # a uint64 is at most 10 varint bytes
+    width = uvarint_size(int(values.max())) if values.size else 1
+    groups = numpy.empty((values.size, width), dtype=numpy.uint8)
+    sizes = numpy.ones(values.size, dtype=numpy.intp)
+    for k in range(width):
+        shifted = values >> numpy.uint64(7 * k)
+        groups[:, k] = (shifted & numpy.uint64(0x7F)).astype(numpy.uint8)
+        if k:
+            sizes += shifted != 0
+    # continuation bits, all but each last byte
+    groups[numpy.arange(width) < (sizes - 1)[:, None]] |= 0x80
+    return groups[numpy.arange(width) < sizes[:, None]].tobytes()
+
+
+def numpy_decode_uvarints(data, index, count):
+    """Returns a numpy uint64 array of count uvarints from data at index, and the index after them."""
+    window = numpy.frombuffer(data, dtype=numpy.uint8)[index : index + count * 10]
+    ends = numpy.flatnonzero(window < 0x80)[:count]
+    if len(ends) < count:
+        raise IndexError("varints run past the end of the buffer")
+    starts = numpy.concatenate(([0], ends[:-1] + 1))
+    sizes = ends - starts + 1
+    if sizes.max() > 10 or (sizes == 10).any() and (window[ends[sizes == 10]] > 1).any():
+        raise OverflowError("varint too big for a 64-bit int")
+    used = window[: ends[-1] + 1]
+    shifts = (numpy.arange(len(used)) - numpy.repeat(starts, sizes)) * 7
+    parts = (used & 0x7F).astype(numpy.uint64) << shifts.astype(numpy.uint64)
+    return numpy.bitwise_or.reduceat(parts, starts), index + int(ends[-1]) + 1
+
+
 # microbenchmark:
 # 3-byte input: py2 six 1.07us nosix 0.82us,  py3 six 1.14us nosix 1.1us
@@ -0,0 +1,152 @@
+# IANA zone lookup for SCHED tzname hashes - optional, python 3.9+ (needs the stdlib zoneinfo module).
+
+import json, os, sys, tempfile, zlib
+
+try:
+    import zoneinfo
+except ImportError:  # py2 & python < 3.9
+    zoneinfo = None
+
+from b3 import type_sched
+
+# SCHED items can carry a tzname as the crc32 of its IANA name (e.g. "Europe/London"), see type_sched.py.
+# enable() makes decode_sched look those hashes up and attach the ZoneInfo to the datetimes it returns.
+
+# Method: the crc32 -> zone name table is built from zoneinfo.available_timezones() the first time it's needed,
+#         then kept for the life of the process. ZoneInfo objects are made when a zone is first looked up & cached.
+# Method: the table can be saved as a JSON file, so other processes (and later runs) load it instead of listing
+#         and hashing the zones again. The file records the tz database it came from (incl. the system database's
+#         version), and is rebuilt if that changes.
+# Policy: a hash that more than one zone name shares can't be told apart, so it looks up as unknown (None).
+#         So does a zone name that the tz database doesn't have (any more).
+# Policy: the cache file is a nice-to-have. If it can't be read or written, the table is built in memory.
+
+CACHE_VERSION = 1
+_table = None  # crc32 -> zone name (or None for clashes), once loaded
+_zones = {}  # ZoneInfo by zone name
+
+
+def enable(cache_path=None):
+    """Turns on tzname hash lookup in decode_sched().
+    cache_path - JSON file to keep the hash table in, shared between processes. Defaults to default_cache_path().
+                 False to not use a cache file."""
+    if zoneinfo is None:
+        raise ImportError("tzname lookup needs the zoneinfo module (python 3.9+)")
+    load_table(default_cache_path() if cache_path is None else cache_path)
+    type_sched.tzname_lookup = lookup_zone
+
+
+def disable():
+    """Turns tzname hash lookup in decode_sched() back off."""
+    type_sched.tzname_lookup = None
+
+
+def default_cache_path():
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "b3", "tznames.json")
+
+
+def tzname_hash(name):
+    """The hash of a zone name, as encode_tzname() stores it."""
+    return zlib.crc32(name.encode("ascii")) & 0xFFFFFFFF
+
+
+def lookup_zone(name_hash):
+    """Returns the ZoneInfo for a tzname hash, or None if no (single) zone has that hash."""
+    name = load_table().get(name_hash)
+    if name is None:
+        return None
+    zone = _zones.get(name)
+    if zone is None:
+        try:
+            zone = _zones[name] = zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return None  # gone from the tz database, or a mangled name
+    return zone
+
+
+def load_table(cache_path=False):
+    """Returns the crc32 -> zone name dict, loading or building it if this process hasn't yet.
+    cache_path - JSON file to load the table from, or save it to if it's missing or stale. False for none.
+    """
+    global _table
+    if _table is None:
+        source = tz_source()
+        table = read_cache(cache_path, source) if cache_path else None
+        if table is None:
+            table = build_table()
+            if cache_path:
+                write_cache(cache_path, source, table)
+        _table = table
+    return _table
+
+
+def build_table():
+    table = {}
+    for name in zoneinfo.available_timezones():
+        name_hash = tzname_hash(name)
+        table[name_hash] = None if name_hash in table else name
+    return table
+
+
+def tz_source():
+    """Identifies the tz database the zones come from, so stale cache files can be spotted."""
+    try:
+        from importlib.metadata import version
+
+        tzdata = version("tzdata")
+    except Exception:  # not installed, or no importlib.metadata
+        tzdata = None
+    return dict(
+        version=CACHE_VERSION,
+        tzpath=[[path, system_tz_version(path)] for path in zoneinfo.TZPATH],
+        tzdata=tzdata,
+        python=sys.version_info[:2],
+    )
+
+
+def system_tz_version(path):
+    """The version of the system tz database in a TZPATH directory - from its tzdata.zi if it has one,
+    otherwise the directory's mtime. None if there's no such directory."""
+    try:
+        with open(os.path.join(path, "tzdata.zi"), "r") as f:
+            first_line = f.readline()
+        if first_line.startswith("# version "):
+            return first_line[len("# version ") :].strip()
+    except (OSError, UnicodeDecodeError):
+        pass
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def read_cache(path, source):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data["source"] != json.loads(json.dumps(source)):
+            return None
+        return dict((int(k), v) for k, v in data["zones"].items())
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None  # missing, unreadable or mangled
+
+
+def write_cache(path, source, table):
+    """Saves the table to path, atomically (temp file + rename) so readers never see half a file."""
+    data = dict(source=source, zones=table)
+    cache_dir = os.path.dirname(path) or "."
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
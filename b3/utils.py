@@ -25,3 +25,40 @@ def IntByteAt(buf, index):
         return buf[index], index + 1
     else:
         return ord(buf[index]), index + 1
+
+
+# --- Writing into caller-supplied buffers ---
+
+
+def write_chunks_into(buf, offset, chunks, size):
+    """Copies the byte chunks (of total length size) into the writable buffer buf at offset.
+    Returns the offset of the end of the written data. Raises ValueError if buf is too small.
+    - buf can be anything supporting the writable buffer protocol. bytearray, mmap, memoryview etc."""
+    view = memoryview(buf)
+    if not PY2 and (view.ndim != 1 or view.format != "B"):
+        view = view.cast("B")
+    check_room(view, offset, size)
+    for chunk in chunks:
+        end = offset + len(chunk)
+        view[offset:end] = chunk
+        offset = end
+    return offset
+
+
+def write_bytes_into(buf, offset, data):
+    """Copies data into buf at offset, returns the offset of the end of it. Raises ValueError if buf is too small."""
+    end = offset + len(data)
+    check_room(buf, offset, len(data))
+    buf[offset:end] = data
+    return end
+
+
+def check_room(buf, offset, size):
+    """Raises ValueError unless there are size bytes at offset in buf."""
+    if offset < 0 or offset + size > len(buf):
+        emsg = "buffer too small - need %d bytes at offset %d, buffer is %d bytes" % (
+            size,
+            offset,
+            len(buf),
+        )
+        raise ValueError(emsg)
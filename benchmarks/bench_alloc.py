@@ -0,0 +1,56 @@
+# Benchmark: encode_item + join vs encode_item_into a preallocated buffer. Time and peak memory allocated.
+# Usage (from the repo root):  python -m benchmarks.bench_alloc [number_of_items]
+# Note: needs py3 (tracemalloc).
+
+from __future__ import print_function
+import sys, timeit, tracemalloc
+
+import b3
+from b3.item import encode_item, encode_item_into
+
+NUM_ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+VALUES = ((b3.UVARINT, 12345), (b3.SVARINT, -678), (b3.FLOAT64, 13.37), (b3.S64, -1234567))
+ITEMS = [(i, VALUES[i % len(VALUES)][0], VALUES[i % len(VALUES)][1]) for i in range(NUM_ITEMS)]
+
+
+def with_join():
+    out = []
+    for key, data_type, value in ITEMS:
+        out.extend(encode_item(key, data_type, value))
+    return b"".join(out)
+
+
+def with_into(buf):
+    offset = 0
+    for key, data_type, value in ITEMS:
+        offset = encode_item_into(buf, offset, key, data_type, value)
+    return offset
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    size = len(with_join())
+    buf = bytearray(size)
+    assert with_into(buf) == size and bytes(buf) == with_join()
+
+    print("%d items, %d bytes" % (NUM_ITEMS, size))
+    print("%-36s %12s %16s" % ("", "ms/op", "peak alloc bytes"))
+    for label, fn in (
+        ("encode_item + join", with_join),
+        ("encode_item_into (preallocated)", lambda: with_into(buf)),
+    ):
+        secs = min(timeit.repeat(fn, number=5, repeat=3)) / 5
+        print("%-36s %12.2f %16d" % (label, secs * 1e3, peak_memory(fn)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Benchmark: DECIMAL codec encode/decode speed, for prices and for long-significand numbers.
+# Usage (from the repo root):  python -m benchmarks.bench_decimal [number_of_values]
+
+from __future__ import print_function
+import random, sys, timeit
+from decimal import Decimal
+
+from b3.type_decimal import encode_decimal, decode_decimal
+
+NUM_VALUES = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+DATA = (
+    (
+        "prices (2dp)",
+        [
+            Decimal("%d.%02d" % (random.randint(0, 9999), random.randint(0, 99)))
+            for _ in range(NUM_VALUES)
+        ],
+    ),
+    (
+        "negative prices (4dp)",
+        [
+            Decimal("-%d.%04d" % (random.randint(0, 99), random.randint(0, 9999)))
+            for _ in range(NUM_VALUES)
+        ],
+    ),
+    (
+        "30-digit values",
+        [
+            Decimal("%d.%d" % (random.getrandbits(60), random.getrandbits(40)))
+            for _ in range(NUM_VALUES)
+        ],
+    ),
+)
+
+
+def bench(fn):
+    return min(timeit.repeat(fn, number=3, repeat=3)) / 3 / NUM_VALUES * 1e9
+
+
+def main():
+    print("%d values per set" % NUM_VALUES)
+    print("%-24s %14s %14s" % ("data", "encode ns/op", "decode ns/op"))
+    for label, data in DATA:
+        bufs = [encode_decimal(num) for num in data]
+        assert [decode_decimal(buf, 0, len(buf)) for buf in bufs] == data
+        enc_ns = bench(lambda: [encode_decimal(num) for num in data])
+        dec_ns = bench(lambda: [decode_decimal(buf, 0, len(buf)) for buf in bufs])
+        print("%-24s %14.0f %14.0f" % (label, enc_ns, dec_ns))
+
+
+if __name__ == "__main__":
+    main()
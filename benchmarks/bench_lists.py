@@ -0,0 +1,47 @@
+# Benchmark: unpack speed for big lists of floats and ints, item by item vs decoded as runs.
+# Usage (from the repo root):  python -m benchmarks.bench_lists [number_of_values]
+
+from __future__ import print_function
+import random, sys, timeit
+
+from b3 import composite_dynamic
+from b3.composite_dynamic import pack, unpack
+
+NUM_VALUES = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+DATA = (
+    ("float64", [random.random() + 1 for _ in range(NUM_VALUES)]),
+    ("float64 + zeros", [random.choice((0.0, random.random() + 1)) for _ in range(NUM_VALUES)]),
+    ("u64", [random.getrandbits(64) | 1 << 63 for _ in range(NUM_VALUES)]),
+    ("s64", [-random.getrandbits(62) - 1 for _ in range(NUM_VALUES)]),
+    ("complex", [complex(random.random() + 1, 1) for _ in range(NUM_VALUES)]),
+)
+
+
+def bench(fn):
+    return min(timeit.repeat(fn, number=3, repeat=3)) / 3 / NUM_VALUES * 1e9
+
+
+def unpack_item_by_item(buf):
+    saved = composite_dynamic.MIN_RUN_BYTES
+    composite_dynamic.MIN_RUN_BYTES = 1 << 62
+    try:
+        return unpack(buf)
+    finally:
+        composite_dynamic.MIN_RUN_BYTES = saved
+
+
+def main():
+    print("%d values per list, ns per value" % NUM_VALUES)
+    print("%-16s %14s %14s %14s" % ("data", "item by item", "runs", "arrays=True"))
+    for label, data in DATA:
+        buf = pack(data, mode="fast")
+        assert unpack_item_by_item(buf) == unpack(buf) == data
+        old_ns = bench(lambda: unpack_item_by_item(buf))
+        new_ns = bench(lambda: unpack(buf))
+        arr_ns = bench(lambda: unpack(buf, arrays=True))
+        print("%-16s %14.0f %14.0f %14.0f" % (label, old_ns, new_ns, arr_ns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# Benchmark: pack() type selection modes - size vs pack/unpack speed, for lists of ints of different sizes.
+# Usage (from the repo root):  python -m benchmarks.bench_modes [number_of_items]
+
+from __future__ import print_function
+import random, sys, timeit
+
+import b3
+
+NUM_ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+DATA = (
+    ("small ints (0..100)", [random.randint(0, 100) for _ in range(NUM_ITEMS)]),
+    ("signed ints (+-10**6)", [random.randint(-(10**6), 10**6) for _ in range(NUM_ITEMS)]),
+    ("big ints (2**40..2**62)", [random.randint(2**40, 2**62) for _ in range(NUM_ITEMS)]),
+)
+
+
+def bench(fn):
+    return min(timeit.repeat(fn, number=5, repeat=3)) / 5 * 1e3
+
+
+def main():
+    print("%d items per list" % NUM_ITEMS)
+    print("%-24s %-8s %10s %12s %12s" % ("data", "mode", "bytes", "pack ms", "unpack ms"))
+    for label, data in DATA:
+        for mode in b3.MODES:
+            buf = b3.pack(data, mode=mode)
+            assert b3.unpack(buf) == data
+            pack_ms = bench(lambda: b3.pack(data, mode=mode))
+            unpack_ms = bench(lambda: b3.unpack(buf))
+            print("%-24s %-8s %10d %12.2f %12.2f" % (label, mode, len(buf), pack_ms, unpack_ms))
+
+
+if __name__ == "__main__":
+    main()
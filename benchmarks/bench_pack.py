@@ -0,0 +1,27 @@
+# Benchmark: dynamic pack of big lists of one type of value, and of a mixed dict.
+# Usage (from the repo root):  python -m benchmarks.bench_pack [number_of_items]
+
+from __future__ import print_function
+import sys, timeit
+
+import b3
+
+NUM_ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+DATA = {
+    "floats": [i * 1.5 for i in range(NUM_ITEMS)],
+    "strings": [u"item %d" % i for i in range(NUM_ITEMS)],
+    "ints": list(range(-NUM_ITEMS // 2, NUM_ITEMS // 2)),
+    "mixed dict": dict((u"k%d" % i, (i, i * 0.5, u"v", None, True)[i % 5]) for i in range(NUM_ITEMS)),
+}
+
+
+def main():
+    print("%d items" % NUM_ITEMS)
+    for label, item in DATA.items():
+        secs = min(timeit.repeat(lambda: b3.pack(item), number=3, repeat=3)) / 3
+        print("pack %-20s %10.2f ms/op %10d bytes" % (label, secs * 1e3, len(b3.pack(item))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Benchmark: SCHED encode & decode of tz-aware event timestamps, vs the old timetuple/strftime & strptime ways.
+# Usage (from the repo root):  python -m benchmarks.bench_sched [number_of_timestamps]
+
+from __future__ import print_function
+import datetime, random, sys, time
+
+from b3.utils import IntByteAt
+from b3.type_varint import decode_svarint, decode_uvarint
+from b3.type_sched import encode_sched, encode_sched_gen, decode_sched, decode_offset
+from b3.type_sched import FLAG_DATE, FLAG_TIME, FLAG_OFFS, SUBS_BITS
+
+NUM_STAMPS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+NUM_DISTINCT = 1000  # distinct encoded timestamps, cycled through to make up NUM_STAMPS
+
+
+def make_stamps():
+    start = datetime.datetime(2020, 1, 1)
+    zones = [datetime.timezone(datetime.timedelta(minutes=15 * q)) for q in range(-40, 56)]
+    dts = []
+    for _ in range(NUM_DISTINCT):
+        dt = start + datetime.timedelta(
+            seconds=random.randint(0, 10**8), microseconds=random.randint(0, 10**6)
+        )
+        dts.append(dt.replace(tzinfo=random.choice(zones)))
+    return dts
+
+
+def encode_sched_strftime(dt):
+    """encode_sched as it was before: timetuple() and strftime("%z"), then encode_sched_gen."""
+    micro = dt.microsecond
+    return encode_sched_gen(
+        dt.timetuple(), True, True, dt.strftime("%z"), "", 6 if micro else 0, micro
+    )
+
+
+def decode_sched_strptime(buf, index, end):
+    """decode_sched as it was before the tzinfo cache: build a string, parse it with strptime %z."""
+    year = month = day = hour = minute = second = sub = 0
+    flags, index = IntByteAt(buf, index)
+    if flags & FLAG_DATE:
+        year, index = decode_svarint(buf, index)
+        month, index = IntByteAt(buf, index)
+        day, index = IntByteAt(buf, index)
+    if flags & FLAG_TIME:
+        hour, index = IntByteAt(buf, index)
+        minute, index = IntByteAt(buf, index)
+        second, index = IntByteAt(buf, index)
+    offstr, dst_on, index = decode_offset(buf, index)  # all the timestamps here have offsets
+    if (flags & SUBS_BITS) * 3:
+        sub, index = decode_uvarint(buf, index)
+    strval = "%s %s %s %s %s %s" % (year, month, day, hour, minute, second)
+    fmt = "%Y %m %d %H %M %S"
+    if sub:
+        strval += " %06d" % sub
+        fmt += " %f"
+    fmt += " %z"
+    strval += " " + offstr
+    return datetime.datetime.strptime(strval, fmt)
+
+
+def run(fn, args):
+    start = time.time()
+    for n in range(NUM_STAMPS):
+        fn(*args[n % NUM_DISTINCT])
+    return time.time() - start
+
+
+def main():
+    dts = make_stamps()
+    bufs = [encode_sched(dt) for dt in dts]
+    assert bufs == [encode_sched_strftime(dt) for dt in dts]
+    assert all(bytearray(buf)[0] & FLAG_OFFS for buf in bufs)
+    for buf in bufs:
+        assert decode_sched_strptime(buf, 0, len(buf)) == decode_sched(buf, 0, len(buf))
+
+    print("%d tz-aware timestamps" % NUM_STAMPS)
+    enc_args = [(dt,) for dt in dts]
+    dec_args = [(buf, 0, len(buf)) for buf in bufs]
+    tests = (
+        ("encode", "strftime (old)", encode_sched_strftime, enc_args),
+        ("encode", "encode_sched", encode_sched, enc_args),
+        ("decode", "strptime (old)", decode_sched_strptime, dec_args),
+        ("decode", "decode_sched", decode_sched, dec_args),
+    )
+    for op, label, fn, args in tests:
+        secs = run(fn, args)
+        print("%s  %-16s %8.2f s %8.0f ns/op" % (op, label, secs, secs / NUM_STAMPS * 1e9))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Benchmark: generic schema_pack/schema_unpack vs compiled schemas vs generated (make_schema_*) functions.
+# Usage (from the repo root):  python -m benchmarks.bench_schema [number_of_fields]
+
+from __future__ import print_function
+import sys, timeit
+
+import b3
+
+NUM_FIELDS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+
+FIELD_TYPES = (
+    (b3.UVARINT, 12345),
+    (b3.SVARINT, -678),
+    (b3.FLOAT64, 13.37),
+    (b3.UTF8, u"telemetry"),
+    (b3.BOOL, True),
+    (b3.S64, -1234567),
+)
+
+SCHEMA = tuple(
+    (FIELD_TYPES[i % len(FIELD_TYPES)][0], "field%d" % i, i + 1) for i in range(NUM_FIELDS)
+)
+DATA = dict(("field%d" % i, FIELD_TYPES[i % len(FIELD_TYPES)][1]) for i in range(NUM_FIELDS))
+
+
+def bench(label, fn, number):
+    secs = min(timeit.repeat(fn, number=number, repeat=3))
+    print("%-40s %10.2f us/op" % (label, secs / number * 1e6))
+
+
+def main():
+    compiled = b3.compile_schema(SCHEMA)
+    gen_pack = b3.make_schema_pack(SCHEMA)
+    gen_unpack = b3.make_schema_unpack(SCHEMA)
+    buf = b3.schema_pack(SCHEMA, DATA)
+    assert gen_pack(DATA) == buf and gen_unpack(buf) == b3.schema_unpack(SCHEMA, buf)
+
+    number = max(100, 20000 // NUM_FIELDS)
+    print("%d-field schema, message size %d bytes" % (NUM_FIELDS, len(buf)))
+    bench("schema_pack (raw schema tuple)", lambda: b3.schema_pack(SCHEMA, DATA), number)
+    bench("schema_pack (compiled schema)", lambda: b3.schema_pack(compiled, DATA), number)
+    bench("make_schema_pack function", lambda: gen_pack(DATA), number)
+    bench("schema_unpack (raw schema tuple)", lambda: b3.schema_unpack(SCHEMA, buf), number)
+    bench("schema_unpack (compiled schema)", lambda: b3.schema_unpack(compiled, buf), number)
+    bench("make_schema_unpack function", lambda: gen_unpack(buf), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Benchmark: dynamic unpack and schema_unpack of a typical mixed-type message.
+# Usage (from the repo root):  python -m benchmarks.bench_unpack [number_of_items]
+
+from __future__ import print_function
+import sys, timeit
+
+import b3
+
+NUM_ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+
+VALUES = (12345, -678, 13.37, u"telemetry", True, None, 0, b"\x01\x02\x03")
+
+DATA = dict(("field%d" % i, VALUES[i % len(VALUES)]) for i in range(NUM_ITEMS))
+LIST_DATA = [VALUES[i % len(VALUES)] for i in range(NUM_ITEMS)]
+
+NESTED_DATA = [
+    {u"id": i, u"tags": [u"a", u"b"], u"pos": {u"x": 1.5, u"y": -2.5}} for i in range(NUM_ITEMS)
+]
+
+SCHEMA_TYPES = (b3.UVARINT, b3.SVARINT, b3.FLOAT64, b3.UTF8, b3.BOOL, b3.BYTES, b3.UVARINT, b3.BYTES)
+SCHEMA = tuple((SCHEMA_TYPES[i % len(SCHEMA_TYPES)], "field%d" % i, i + 1) for i in range(NUM_ITEMS))
+SCHEMA_DATA = dict(DATA)
+SCHEMA_DATA.update(("field%d" % i, 678) for i in range(1, NUM_ITEMS, len(VALUES)))
+
+
+def bench(label, fn, number):
+    secs = min(timeit.repeat(fn, number=number, repeat=3))
+    print("%-40s %10.2f us/op" % (label, secs / number * 1e6))
+
+
+def main():
+    dict_buf = b3.pack(DATA)
+    list_buf = b3.pack(LIST_DATA)
+    nested_buf = b3.pack(NESTED_DATA)
+    schema_buf = b3.schema_pack(SCHEMA, SCHEMA_DATA)
+    compiled = b3.compile_schema(SCHEMA)
+
+    number = max(100, 20000 // NUM_ITEMS)
+    print("%d items" % NUM_ITEMS)
+    bench("unpack (dict)", lambda: b3.unpack(dict_buf), number)
+    bench("unpack (list)", lambda: b3.unpack(list_buf), number)
+    bench("unpack (list of nested dicts)", lambda: b3.unpack(nested_buf), number)
+    bench("schema_unpack (compiled schema)", lambda: b3.schema_unpack(compiled, schema_buf), number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Benchmark: varint encode/decode of 1 to 10,000-byte varints, per-byte loop vs bulk codec.
+#            Also one-at-a-time vs the *_many batch functions (numpy backend used if numpy is importable).
+# Usage (from the repo root):  python -m benchmarks.bench_varint
+
+from __future__ import print_function
+import random, timeit
+
+from b3 import type_varint
+from b3.type_varint import encode_uvarint, decode_uvarint, encode_uvarint_bulk, decode_uvarint_bulk
+from b3.type_varint import encode_svarint, decode_svarint, encode_svarint_many, decode_svarint_many
+
+SIZES = (1, 2, 4, 8, 16, 24, 32, 64, 128, 1000, 10000)  # varint sizes in bytes
+
+
+def encode_uvarint_loop(num):
+    saved = type_varint.BULK_MIN_NUM
+    type_varint.BULK_MIN_NUM = float("inf")
+    try:
+        return encode_uvarint(num)
+    finally:
+        type_varint.BULK_MIN_NUM = saved
+
+
+def decode_uvarint_loop(data, index):
+    saved = type_varint.BULK_MIN_BITS
+    type_varint.BULK_MIN_BITS = -1
+    try:
+        return decode_uvarint(data, index)
+    finally:
+        type_varint.BULK_MIN_BITS = saved
+
+
+def bench(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    print(
+        "%8s %12s %12s %12s %12s"
+        % ("bytes", "enc loop us", "enc bulk us", "dec loop us", "dec bulk us")
+    )
+    for size in SIZES:
+        num = random.getrandbits(7 * size) | (1 << (7 * size - 1))
+        data = encode_uvarint_bulk(num)
+        assert len(data) == size and encode_uvarint_loop(num) == data
+        assert decode_uvarint_loop(data, 0) == decode_uvarint_bulk(data, 0) == (num, size)
+        number = max(3, 20000 // size)
+        print(
+            "%8d %12.2f %12.2f %12.2f %12.2f"
+            % (
+                size,
+                bench(lambda: encode_uvarint_loop(num), number),
+                bench(lambda: encode_uvarint_bulk(num), number),
+                bench(lambda: decode_uvarint_loop(data, 0), number),
+                bench(lambda: decode_uvarint_bulk(data, 0), number),
+            )
+        )
+
+    print()
+    print("batches of svarints, numpy %s" % ("on" if type_varint.numpy is not None else "off"))
+    print(
+        "%8s %12s %12s %12s %12s"
+        % ("count", "enc 1by1 us", "enc many us", "dec 1by1 us", "dec many us")
+    )
+    for count in (10, 100, 1000, 10000):
+        nums = [random.randint(-5000, 5000) for _ in range(count)]
+        data = encode_svarint_many(nums)
+        number = max(3, 100000 // count)
+        print(
+            "%8d %12.2f %12.2f %12.2f %12.2f"
+            % (
+                count,
+                bench(lambda: b"".join([encode_svarint(i) for i in nums]), number),
+                bench(lambda: encode_svarint_many(nums), number),
+                bench(lambda: decode_svarints_one_by_one(data, count), number),
+                bench(lambda: decode_svarint_many(data, 0, count), number),
+            )
+        )
+
+
+def decode_svarints_one_by_one(data, count):
+    index, out = 0, []
+    for _ in range(count):
+        num, index = decode_svarint(data, index)
+        out.append(num)
+    return out
+
+
+if __name__ == "__main__":
+    main()